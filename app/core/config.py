@@ -6,4 +6,40 @@ STORAGE_PATH = Path(os.getenv("STORAGE_PATH", BASE_DIR / "workspace")).resolve()
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 GITHUB_REPOSITORY = os.getenv("GITHUB_REPOSITORY", "owner/TestForge")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
+# Read sheet cells as Arrow-backed strings (string[pyarrow]) instead of one Python object per cell
+ARROW_STRINGS = os.getenv("ARROW_STRINGS", "false").lower() in ("1", "true", "yes")
+# Processes used to compile large sheets (0 = one per CPU, 1 = compile in-process)
+COMPILE_WORKERS = int(os.getenv("COMPILE_WORKERS", "0"))
+# Workbooks compiled at once by the bulk compile endpoint (0 = one per CPU)
+BULK_COMPILE_WORKERS = int(os.getenv("BULK_COMPILE_WORKERS", "0"))
+# Requests per second per target host, shared by all runs; halves on 429/503, recovers by RATE_LIMIT_STEP.
+# 0 (the default) turns pacing off: no waits, no 429/503 backoff or retries, and run summaries report limited: false
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "1"))
+RATE_LIMIT_MIN_RPS = float(os.getenv("RATE_LIMIT_MIN_RPS", "0.1"))
+RATE_LIMIT_STEP = float(os.getenv("RATE_LIMIT_STEP", "0.1"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+# Size limit for Parquet sidecars in workspace/.sheets; least recently used are deleted first (0 = no limit)
+SHEET_SIDECAR_MAX_MB = int(os.getenv("SHEET_SIDECAR_MAX_MB", "1024"))
+# Size limit for uploads kept in workspace/.uploads for bulk compiles; least recently used are deleted first (0 = no limit)
+UPLOAD_STORE_MAX_MB = int(os.getenv("UPLOAD_STORE_MAX_MB", "1024"))
+# Size limit for cached compile outputs in workspace/.compile_cache (0 = caching off)
+COMPILE_CACHE_MAX_MB = int(os.getenv("COMPILE_CACHE_MAX_MB", "512"))
+# Compile one test per distinct request and expectations; later identical rows map to it in generated/duplicates.json
+COMPILE_DEDUPE = os.getenv("COMPILE_DEDUPE", "false").lower() in ("1", "true", "yes")
+# Compile every case sheet from a read-only stream in batches of COMPILE_BATCH_ROWS rows instead of loading the first sheet whole
+COMPILE_STREAM = os.getenv("COMPILE_STREAM", "false").lower() in ("1", "true", "yes")
+COMPILE_BATCH_ROWS = int(os.getenv("COMPILE_BATCH_ROWS", "5000"))
+# Test names: "row" (TC_### by row number) or "content" (TC_ plus a short hash of the request and expectations, stable across row moves)
+COMPILE_TEST_IDS = os.getenv("COMPILE_TEST_IDS", "row").lower()
+# Cases per suite file in pipelined compile-and-run (suite/template modes), so the first suites can run while the rest compile
+PIPELINE_GROUP_SIZE = int(os.getenv("PIPELINE_GROUP_SIZE", "500"))
+# Robot processes of a parallel run (0 = from CPU count, RATE_LIMIT_RPS and recent test durations)
+RUN_WORKERS = int(os.getenv("RUN_WORKERS", "0"))
+# What generated tests log: none, failures, summary or full; logged bodies are cut to SUITE_LOG_MAX_CHARS (0 = no limit)
+SUITE_LOG_VERBOSITY = os.getenv("SUITE_LOG_VERBOSITY", "full").lower()
+SUITE_LOG_MAX_CHARS = int(os.getenv("SUITE_LOG_MAX_CHARS", "2000"))
+# Connection pool per target host in generated suites, and whether connections are kept alive between requests
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "10"))
+SESSION_KEEP_ALIVE = os.getenv("SESSION_KEEP_ALIVE", "true").lower() in ("1", "true", "yes")
 STORAGE_PATH.mkdir(parents=True, exist_ok=True)
@@ -1,8 +1,38 @@
-from typing import Any, Dict, List, Tuple
-import io, re, json
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from functools import lru_cache
+from pathlib import Path
+import io, re, json, os, hashlib, importlib.util, threading
 import pandas as pd
+from pandas.io.parsers import TextParser
+from app.core.config import STORAGE_PATH, ARROW_STRINGS, SHEET_SIDECAR_MAX_MB, UPLOAD_STORE_MAX_MB
 
-def read_table(content: bytes, filename: str, allow_different_lengths: bool = False) -> pd.DataFrame:
+ARROW_STRING_DTYPE = "string[pyarrow]"
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Parquet sidecars of uploaded workbooks, keyed by the SHA-256 of the upload bytes
+SHEET_SIDECAR_DIR = STORAGE_PATH / ".sheets"
+# Uploaded workbooks themselves, by the same key, so later requests can name an upload by its hash
+UPLOAD_DIR = STORAGE_PATH / ".uploads"
+
+def sheet_dtype(arrow_strings: Optional[bool] = None):
+    """
+    dtype used for sheet cells.
+
+    Arrow-backed strings keep each column in one contiguous buffer instead of a
+    Python object per cell, which cuts memory several-fold on large sheets.
+
+    Args:
+        arrow_strings: Force Arrow strings on/off; None uses the ARROW_STRINGS setting
+
+    Returns:
+        "string[pyarrow]" when enabled and pyarrow is installed, else str
+    """
+    if arrow_strings is None:
+        arrow_strings = ARROW_STRINGS
+    return ARROW_STRING_DTYPE if arrow_strings and HAS_PYARROW else str
+
+def read_table(content: bytes, filename: str, allow_different_lengths: bool = False,
+               arrow_strings: Optional[bool] = None) -> pd.DataFrame:
     """
     Read CSV or Excel file and return DataFrame.
     
@@ -18,6 +48,7 @@ def read_table(content: bytes, filename: str, allow_different_lengths: bool = Fa
         content: File content as bytes
         filename: Original filename (for format detection)
         allow_different_lengths: If True, skip validation for equal-length columns (for combination generation)
+        arrow_strings: Read cells as string[pyarrow] (None uses the ARROW_STRINGS setting)
     
     Returns:
         DataFrame with all cells as strings, empty cells as ""
@@ -26,6 +57,7 @@ def read_table(content: bytes, filename: str, allow_different_lengths: bool = Fa
         ValueError: If file format is unsupported or columns have unequal lengths
     """
     filename_lower = filename.lower()
+    dtype = sheet_dtype(arrow_strings)
     
     # Detect file type by magic bytes (more reliable than extension)
     is_excel = content[:4] == b'PK\x03\x04' or content[:4] == b'PK\x05\x06'  # ZIP signature
@@ -41,7 +73,7 @@ def read_table(content: bytes, filename: str, allow_different_lengths: bool = Fa
             df = pd.read_excel(
                 io.BytesIO(content), 
                 sheet_name=0,
-                dtype=str,
+                dtype=dtype,
                 engine='openpyxl'
             )
         except Exception as e:
@@ -52,7 +84,7 @@ def read_table(content: bytes, filename: str, allow_different_lengths: bool = Fa
         try:
             df = pd.read_csv(
                 io.BytesIO(content), 
-                dtype=str, 
+                dtype=dtype, 
                 encoding='utf-8-sig'  # Handle BOM
             )
         except Exception as e:
@@ -89,7 +121,8 @@ def read_table(content: bytes, filename: str, allow_different_lengths: bool = Fa
         
         for col in df.columns:
             col_str = str(col).strip()
-            count = df[col].astype(str).str.strip().ne('').sum()
+            # Cells are already strings; .str works on both object and Arrow columns without copying to object
+            count = df[col].str.strip().ne('').sum()
             non_empty_counts[col_str] = count
             
             # Check if this is a metadata column
@@ -122,6 +155,270 @@ def read_table(content: bytes, filename: str, allow_different_lengths: bool = Fa
     
     return df
 
+def content_digest(content: bytes) -> str:
+    """Return the SHA-256 hex digest used to key uploads and their sidecars."""
+    return hashlib.sha256(content).hexdigest()
+
+def touch_stored(path: Path) -> None:
+    """Mark a stored sidecar or upload as recently used (see evict_stored)."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def evict_stored(directory: Path, limit_mb: int, keep: Optional[Path] = None) -> None:
+    """
+    Delete least recently used files in a content-addressed store until it fits in limit_mb.
+
+    Files still being written (*.tmp) and keep, the file just stored, are never
+    deleted. limit_mb <= 0 means no limit.
+    """
+    if limit_mb <= 0 or not directory.is_dir():
+        return
+    entries = []
+    for entry in directory.iterdir():
+        if entry.suffix == ".tmp" or entry == keep:
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+    total = sum(size for _, size, _ in entries)
+    if keep is not None and keep.exists():
+        total += keep.stat().st_size
+    for _, size, entry in sorted(entries):
+        if total <= limit_mb * 1024 * 1024:
+            break
+        try:
+            entry.unlink()
+        except OSError:
+            continue  # removed by a concurrent eviction
+        total -= size
+
+def sheet_sidecar_path(digest: str) -> Path:
+    return SHEET_SIDECAR_DIR / f"{digest}.parquet"
+
+def stored_upload_path(digest: str) -> Path:
+    return UPLOAD_DIR / f"{digest}.xlsx"
+
+def store_upload(content: bytes) -> str:
+    """
+    Keep a copy of an upload under UPLOAD_DIR (once per content hash) and return its digest.
+
+    The store is trimmed to UPLOAD_STORE_MAX_MB, least recently stored or used first.
+    """
+    digest = content_digest(content)
+    path = stored_upload_path(digest)
+    if path.exists():
+        touch_stored(path)
+        return digest
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+    evict_stored(UPLOAD_DIR, UPLOAD_STORE_MAX_MB, keep=path)
+    return digest
+
+def _read_first_sheet(content: bytes, dtype=str) -> pd.DataFrame:
+    """Parse the first sheet of an Excel upload (or a CSV) with every cell as a string."""
+    if content[:4] in (b'PK\x03\x04', b'PK\x05\x06'):
+        df = pd.read_excel(io.BytesIO(content), sheet_name=0, dtype=dtype)
+    else:
+        df = pd.read_csv(io.BytesIO(content), dtype=dtype, encoding='utf-8-sig')
+    return df.fillna("")
+
+def write_sheet_sidecar(content: bytes, df: Optional[pd.DataFrame] = None) -> Optional[Path]:
+    """
+    Convert an uploaded workbook to a columnar Parquet sidecar, once per content hash.
+
+    Later stages (compile, validation, reruns) read the sidecar instead of
+    re-parsing the workbook, which turns a multi-second openpyxl parse into a
+    millisecond columnar read.
+
+    Args:
+        content: Raw upload bytes
+        df: Already-parsed first sheet, to avoid parsing the upload twice
+
+    Returns:
+        Path to the sidecar, or None if no Parquet engine (pyarrow) is installed
+    """
+    path = sheet_sidecar_path(content_digest(content))
+    if path.exists():
+        touch_stored(path)
+        return path
+    if df is None:
+        df = _read_first_sheet(content)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary name and rename so concurrent readers never see a partial file;
+    # the name is per thread, as request threads of one worker may store the same upload at once
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    # Drop the pandas schema metadata so readers choose the string dtype (see read_sheet_sidecar)
+    table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    evict_stored(SHEET_SIDECAR_DIR, SHEET_SIDECAR_MAX_MB, keep=path)
+    return path
+
+def read_sheet_sidecar(content: bytes, arrow_strings: Optional[bool] = None) -> Optional[pd.DataFrame]:
+    """Return the sidecar DataFrame for these upload bytes, or None if there is none."""
+    path = sheet_sidecar_path(content_digest(content))
+    if not path.exists():
+        return None
+    touch_stored(path)
+    try:
+        if sheet_dtype(arrow_strings) == ARROW_STRING_DTYPE:
+            # Map Parquet string columns straight to string[pyarrow], never materialising Python objects
+            with pd.option_context("mode.string_storage", "pyarrow"):
+                return pd.read_parquet(path, dtype_backend="numpy_nullable")
+        return pd.read_parquet(path)
+    except Exception:
+        # Missing engine or unreadable sidecar - callers fall back to the workbook
+        return None
+
+def load_sheet(path: Path, arrow_strings: Optional[bool] = None) -> pd.DataFrame:
+    """
+    Load the first sheet of a stored workbook as strings, empty cells as "".
+
+    Uses the Parquet sidecar when one exists; otherwise parses the workbook
+    and writes the sidecar so the next read is cheap.
+
+    Args:
+        path: Stored workbook (e.g. workspace/<testName>/rawData.xlsx)
+        arrow_strings: Return string[pyarrow] columns (None uses the ARROW_STRINGS setting)
+    """
+    content = Path(path).read_bytes()
+    df = read_sheet_sidecar(content, arrow_strings)
+    if df is not None:
+        return df
+    df = _read_first_sheet(content, sheet_dtype(arrow_strings))
+    try:
+        write_sheet_sidecar(content, df)
+    except OSError:
+        pass
+    return df
+
+def _is_zip(path: Path) -> bool:
+    with open(path, "rb") as fh:
+        return fh.read(4) in (b'PK\x03\x04', b'PK\x05\x06')
+
+def _excel_cell(cell) -> Any:
+    """An openpyxl cell as read_excel sees it: blank and error cells "", whole numbers as int."""
+    if cell.value is None or cell.data_type == "e":
+        return ""
+    if cell.data_type == "n" and not isinstance(cell.value, bool):
+        return int(cell.value) if int(cell.value) == cell.value else float(cell.value)
+    return cell.value
+
+def _excel_batches(path: Path, batch_rows: int) -> Iterator[Tuple[str, List[Any], List[List[Any]]]]:
+    """
+    Stream (sheet name, header, rows) batches from a workbook opened read-only.
+
+    The first sheet is always read; later sheets only when they have an
+    [API]endpoint column, so README/note sheets are skipped. Rows are cut or
+    padded to the header's width, and trailing blank rows are dropped, as read_excel does.
+    """
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for n, ws in enumerate(wb.worksheets):
+            ws.reset_dimensions()  # stored dimensions can be wrong; read until the last row
+            rows = ws.iter_rows()
+            header = [_excel_cell(c) for c in next(rows, ())]
+            while header and header[-1] == "":
+                header.pop()
+            if not header or (n > 0 and "[API]endpoint" not in header):
+                continue
+            width = len(header)
+            batch: List[List[Any]] = []
+            blanks: List[List[Any]] = []
+            for row in rows:
+                values = [_excel_cell(c) for c in row[:width]]
+                values += [""] * (width - len(values))
+                if all(v == "" for v in values):
+                    blanks.append(values)  # kept only if a filled row follows
+                    continue
+                batch.extend(blanks)
+                blanks = []
+                batch.append(values)
+                while len(batch) >= batch_rows:
+                    yield ws.title, header, batch[:batch_rows]
+                    batch = batch[batch_rows:]
+            if batch:
+                yield ws.title, header, batch
+    finally:
+        wb.close()
+
+def sheet_row_estimate(path: Path) -> Optional[int]:
+    """Data rows in a stored workbook from its sheet dimensions, without reading cells (None if unknown)."""
+    if not _is_zip(path):
+        return None
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = [ws.max_row for ws in wb.worksheets]
+    finally:
+        wb.close()
+    if any(r is None for r in rows):
+        return None
+    return sum(max(r - 1, 0) for r in rows)
+
+def iter_sheet_batches(path: Path, batch_rows: int,
+                       arrow_strings: Optional[bool] = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Read a stored workbook in batches of at most batch_rows rows, never holding a whole sheet.
+
+    Excel files are read with openpyxl in read-only mode across every sheet
+    that holds cases (see _excel_batches). A single-sheet workbook with a Parquet
+    sidecar is read from the sidecar in row groups instead, and CSV in chunks.
+    Cells are strings, empty as "", exactly as load_sheet returns them.
+
+    Yields:
+        (sheet name, DataFrame) in sheet order; the index counts data rows
+        across all sheets, so row i is the workbook's i-th case
+    """
+    path = Path(path)
+    dtype = sheet_dtype(arrow_strings)
+    offset = 0
+
+    def numbered(df: pd.DataFrame) -> pd.DataFrame:
+        nonlocal offset
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        return df
+
+    if not _is_zip(path):
+        for chunk in pd.read_csv(path, dtype=dtype, encoding='utf-8-sig', chunksize=batch_rows):
+            yield path.stem, numbered(chunk.fillna(""))
+        return
+
+    sidecar = sheet_sidecar_path(content_digest(path.read_bytes()))
+    if HAS_PYARROW and sidecar.exists():
+        touch_stored(sidecar)
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True)
+        single, title = len(wb.worksheets) == 1, wb.worksheets[0].title
+        wb.close()
+        if single:
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(sidecar).iter_batches(batch_size=batch_rows):
+                yield title, numbered(batch.to_pandas().astype(dtype))
+            return
+
+    for title, header, rows in _excel_batches(path, batch_rows):
+        # The parser read_excel uses, so column names and cell strings match load_sheet
+        df = TextParser([header] + rows, header=0, dtype=dtype).read().fillna("")
+        yield title, numbered(df)
+
 def normalize_cell(v: Any):
     """
     Normalize cell value with support for sentinel keywords.
@@ -171,23 +468,22 @@ def normalize_cell(v: Any):
     except: 
         return s
 
+# Body path tokens: names ("data", "items") and list indexes ("[0]")
+_PATH_TOKEN = re.compile(r"([^[.\]]+)|\[(\d+)\]")
+
+@lru_cache(maxsize=4096)
+def _path_tokens(path: str) -> Tuple[Union[str, int], ...]:
+    return tuple(m.group(1) if m.group(1) else int(m.group(2)) for m in _PATH_TOKEN.finditer(path))
+
 def tokenize_body_path(path: str):
-    parts = []
-    for m in re.finditer(r"([^[.\]]+)|\[(\d+)\]", path):
-        if m.group(1): parts.append(m.group(1))
-        else: parts.append(int(m.group(2)))
-    return parts
+    return list(_path_tokens(path))
 
 def assign_by_path(target: dict, path: str, value: Any):
-    import re
-    def tokens(p: str):
-        out = []
-        for m in re.finditer(r"([^[.\]]+)|\[(\d+)\]", p):
-            if m.group(1): out.append(m.group(1))
-            else: out.append(int(m.group(2)))
-        return out
+    assign_by_tokens(target, _path_tokens(path), value)
+
+def assign_by_tokens(target: dict, ts: Sequence[Union[str, int]], value: Any):
+    """assign_by_path for a path already split by tokenize_body_path."""
     obj = target
-    ts = tokens(path)
     for i, t in enumerate(ts):
         last = i == len(ts) - 1
         if isinstance(t, str):
@@ -0,0 +1,537 @@
+"""
+TestForge keyword library for generated Robot Framework suites.
+
+The compiler copies this file next to the generated .robot files and suites
+import it with `Library    TestForgeLibrary.py`, so a generated directory stays
+self-contained. Keep it free of `app.*` imports: it runs inside the robot
+process, not the API server.
+"""
+import atexit
+import copy
+import email.utils
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from jsonpath_ng.ext import parse as parse_jsonpath
+from requests.adapters import HTTPAdapter
+from robot.api import SuiteVisitor, logger
+from robot.libraries.BuiltIn import BuiltIn
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Manifest compile mode: a stub suite plus the cases it runs (msgpack when available)
+MANIFEST_SUITE = "TestForge_Manifest.robot"
+CASE_FILES = ("cases.msgpack", "cases.json")
+
+_loaded_cases = {}
+
+
+def load_cases(directory):
+    """Read the case manifest in a generated directory (cached per file and mtime)."""
+    for name in CASE_FILES:
+        path = Path(directory) / name
+        if path.exists():
+            break
+    else:
+        raise RuntimeError(f"No case manifest ({' or '.join(CASE_FILES)}) in {directory}")
+    key = (str(path), path.stat().st_mtime_ns)
+    if key not in _loaded_cases:
+        if path.suffix == ".msgpack":
+            import msgpack
+            data = msgpack.unpackb(path.read_bytes(), raw=False)
+        else:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        _loaded_cases[key] = data["cases"]
+    return _loaded_cases[key]
+
+
+# Throttle responses that lower the request rate and are retried
+THROTTLE_STATUSES = (429, 503)
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class RateLimiter:
+    """
+    Token bucket per target host, shared through a state file.
+
+    Every robot process pointed at the same state directory (RATE_LIMIT_DIR;
+    the run service uses workspace/.ratelimit) draws from the same bucket, so
+    the limit holds across tests, parallel workers and concurrent runs. The
+    rate drops by half on 429/503 and climbs back by RATE_LIMIT_STEP per
+    successful response, up to RATE_LIMIT_RPS (AIMD). A Retry-After header
+    pauses the host until it expires. RATE_LIMIT_RPS=0 (the default) disables
+    limiting, including the 429/503 backoff and retries.
+    """
+
+    def __init__(self):
+        self.max_rate = _env_float("RATE_LIMIT_RPS", 0.0)
+        self.burst = max(1.0, _env_float("RATE_LIMIT_BURST", 1.0))
+        self.min_rate = min(max(_env_float("RATE_LIMIT_MIN_RPS", 0.1), 0.01), self.max_rate) if self.max_rate > 0 else 0
+        self.step = _env_float("RATE_LIMIT_STEP", 0.1)
+        self.retries = int(_env_float("RATE_LIMIT_RETRIES", 3))
+        self.state_dir = Path(os.environ.get("RATE_LIMIT_DIR") or Path(tempfile.gettempdir()) / "testforge-ratelimit")
+        self.stats = {}
+
+    @staticmethod
+    def host_of(url):
+        parts = urlsplit(str(url))
+        return f"{parts.scheme}://{parts.netloc}" if parts.netloc else str(url)
+
+    def _path(self, host, suffix):
+        return self.state_dir / (re.sub(r"[^A-Za-z0-9_.-]+", "_", host) + suffix)
+
+    @contextmanager
+    def _locked(self, host):
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        with open(self._path(host, ".lock"), "a+b") as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                path = self._path(host, ".json")
+                try:
+                    state = json.loads(path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    state = {"rate": self.max_rate, "tokens": self.burst, "updated": time.time(), "blocked_until": 0}
+                # Never run faster than the configured rate, even if an earlier run allowed more
+                state["rate"] = min(max(state.get("rate", self.max_rate), self.min_rate), self.max_rate)
+                yield state
+                tmp = path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(state), encoding="utf-8")
+                os.replace(tmp, path)
+            finally:
+                if not fcntl:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _stats(self, host):
+        return self.stats.setdefault(host, {"requests": 0, "throttled": 0, "waited": 0.0,
+                                            "first": None, "last": None, "rate": self.max_rate})
+
+    def acquire(self, host):
+        """Block until the host's bucket has a token; returns seconds waited."""
+        waited = 0.0
+        if self.max_rate > 0:
+            while True:
+                with self._locked(host) as state:
+                    now = time.time()
+                    state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * state["rate"])
+                    state["updated"] = now
+                    if now < state.get("blocked_until", 0):
+                        delay = state["blocked_until"] - now
+                    elif state["tokens"] >= 1:
+                        state["tokens"] -= 1
+                        break
+                    else:
+                        delay = (1 - state["tokens"]) / state["rate"]
+                time.sleep(delay)
+                waited += delay
+        stats = self._stats(host)
+        now = time.time()
+        stats["requests"] += 1
+        stats["waited"] += waited
+        stats["first"] = stats["first"] or now
+        stats["last"] = now
+        return waited
+
+    def feedback(self, host, status, retry_after=None):
+        """Adjust the host's rate from a response; returns True when the request should be retried."""
+        throttled = status in THROTTLE_STATUSES
+        stats = self._stats(host)
+        if self.max_rate <= 0:
+            return False
+        with self._locked(host) as state:
+            if throttled:
+                state["rate"] = max(self.min_rate, state["rate"] / 2)
+                pause = _retry_after_seconds(retry_after)
+                if pause:
+                    state["blocked_until"] = max(state.get("blocked_until", 0), time.time() + pause)
+                stats["throttled"] += 1
+            else:
+                state["rate"] = min(self.max_rate, state["rate"] + self.step)
+            stats["rate"] = state["rate"]
+        return throttled
+
+    def summary(self):
+        """Per-host request counts and rates; the limiter's own fields only when limiting is on."""
+        out = {}
+        for host, s in self.stats.items():
+            span = (s["last"] - s["first"]) if s["first"] else 0
+            out[host] = {
+                "limited": self.max_rate > 0,
+                "requests": s["requests"],
+                "effectiveRps": round((s["requests"] - 1) / span, 2) if span > 0 else None,
+            }
+            if self.max_rate > 0:
+                out[host].update({
+                    "throttled": s["throttled"],
+                    "waitedSeconds": round(s["waited"], 2),
+                    "finalRps": round(s["rate"], 2),
+                })
+        return out
+
+
+def _retry_after_seconds(value):
+    """Retry-After as seconds: delta-seconds or an HTTP date."""
+    if not value:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0
+
+
+_limiter = None
+_stats_file = None
+
+
+def _write_rate_stats():
+    if _limiter and _stats_file and _limiter.stats:
+        Path(_stats_file).write_text(json.dumps(_limiter.summary(), indent=1), encoding="utf-8")
+
+
+def _cast(value, dtype):
+    """Mirror of compile_service.cast_value for values checked at runtime."""
+    if dtype is None or dtype == "string":
+        return value
+    if dtype in ("int", "integer"):
+        try:
+            return int(value)
+        except (ValueError, TypeError):
+            return value
+    if dtype in ("float", "double", "number"):
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return value
+    if dtype in ("bool", "boolean"):
+        return str(value).strip().lower() in ("1", "true", "yes", "y", "t")
+    return value
+
+
+def _values_equal(actual, expected, dtype=None) -> bool:
+    """Equality with the same typing rules as the generated Should Be Equal* keywords."""
+    if dtype in ("int", "integer"):
+        try:
+            # An int check never accepts a fractional value: 5.9 is not 5
+            return float(actual).is_integer() and float(actual) == float(expected)
+        except (ValueError, TypeError):
+            return False
+    if dtype in ("float", "double", "number"):
+        try:
+            return float(actual) == float(expected)
+        except (ValueError, TypeError):
+            return False
+    if dtype in ("bool", "boolean"):
+        return actual is _cast(expected, "bool") if isinstance(actual, bool) else False
+    # Untyped values compare strictly, as Should Be Equal did: a JSON 5 does not equal the cell text "5"
+    return actual == expected
+
+
+def _text(value) -> str:
+    if value is None:
+        return "None"
+    if isinstance(value, bool):
+        return "True" if value else "False"
+    return str(value)
+
+
+# Plain dotted field paths ("a.b.c") are walked directly instead of through JSONPath
+_PLAIN_PATH = re.compile(r"[A-Za-z_][A-Za-z0-9_-]*(?:\.[A-Za-z_][A-Za-z0-9_-]*)*")
+
+
+@lru_cache(maxsize=4096)
+def _compiled_path(field):
+    """Parse $.field once per process; returns a key tuple for plain paths, else a JSONPath."""
+    if _PLAIN_PATH.fullmatch(field):
+        return tuple(field.split("."))
+    return parse_jsonpath(f"$.{field}")
+
+
+def _truncate(text, max_chars):
+    """Cut text to max_chars characters (0 = no limit), noting how much was dropped."""
+    if max_chars and len(text) > max_chars:
+        return f"{text[:max_chars]}... [{len(text) - max_chars} more characters]"
+    return text
+
+
+class ManifestLoader(SuiteVisitor):
+    """
+    Pre-run modifier that creates the tests of a manifest suite.
+
+    Replaces the placeholder test in TestForge_Manifest.robot with one test per
+    case in the manifest next to it, each calling `Run Manifest Case`. Use with
+    `--pythonpath <generated> --prerunmodifier TestForgeLibrary.ManifestLoader`.
+    """
+
+    def start_suite(self, suite):
+        if not suite.source or Path(suite.source).name != MANIFEST_SUITE:
+            return
+        cases = load_cases(Path(suite.source).parent)
+        suite.tests.clear()
+        for name, case in cases.items():
+            suite.tests.create(name=name, tags=case.get("tags", ())).body.create_keyword(name="Run Manifest Case")
+
+
+class TestForgeLibrary:
+    """Keywords used by the generated suites of every compile mode."""
+
+    ROBOT_LIBRARY_SCOPE = "GLOBAL"
+
+    def __init__(self):
+        # (test name, response) of the latest Rate Limited Request, for Log Exchange
+        self._last = None
+
+    def open_host_sessions(self, headers=None, **hosts):
+        """
+        Create one RequestsLibrary session per target host, e.g.
+        ``Open Host Sessions    api=https://a.example.com    api_https_b_example_com=https://b.example.com``.
+
+        Each session keeps a pool of up to SESSION_POOL_SIZE connections (default 10)
+        to its host. With SESSION_KEEP_ALIVE=false requests ask the server to close
+        the connection after each response. ``headers`` (dict or JSON string) are
+        sent by every session.
+        """
+        if isinstance(headers, str):
+            headers = json.loads(headers) if headers.strip() else None
+        headers = dict(headers or {})
+        if os.environ.get("SESSION_KEEP_ALIVE", "true").lower() in ("0", "false", "no"):
+            headers["Connection"] = "close"
+        pool_size = max(1, int(_env_float("SESSION_POOL_SIZE", 10)))
+        requests_lib = BuiltIn().get_library_instance("RequestsLibrary")
+        for alias, url in hosts.items():
+            requests_lib.create_session(alias, url, headers=headers)
+            session = requests_lib._cache.get_connection(alias)
+            # Same retry policy as Create Session, larger pool
+            retries = session.get_adapter(url).max_retries
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+    def rate_limited_request(self, method, alias, *args, **kwargs):
+        """
+        Send ``<method> On Session`` through the per-host rate limiter.
+
+        Waits for the host's token bucket, sends the request with RequestsLibrary
+        and feeds the status back to the limiter. 429/503 responses are retried
+        (after any Retry-After) up to RATE_LIMIT_RETRIES times. Arguments are the
+        same as the RequestsLibrary keyword, e.g.
+        ``Rate Limited Request    POST    api    url=/path    data=${body}``.
+        """
+        global _limiter, _stats_file
+        if _limiter is None:
+            _limiter = RateLimiter()
+            output_dir = BuiltIn().get_variable_value("${OUTPUT DIR}")
+            if output_dir:
+                _stats_file = Path(output_dir) / "rate_limit.json"
+                atexit.register(_write_rate_stats)
+        requests_lib = BuiltIn().get_library_instance("RequestsLibrary")
+        send = getattr(requests_lib, f"{method.lower()}_on_session")
+        host = _limiter.host_of(requests_lib._cache.get_connection(alias).url)
+        for attempt in range(_limiter.retries + 1):
+            _limiter.acquire(host)
+            resp = send(alias, *args, **kwargs)
+            self._last = (BuiltIn().get_variable_value("${TEST NAME}"), resp)
+            retry = _limiter.feedback(host, resp.status_code, resp.headers.get("Retry-After"))
+            if not retry or attempt == _limiter.retries:
+                return resp
+            logger.info(f"{host} answered {resp.status_code}; retrying ({attempt + 1}/{_limiter.retries})")
+        return resp
+
+    def log_exchange(self, verbosity="full", max_chars=2000):
+        """
+        Log the current test's request and response as one message (log and console).
+
+        ``summary`` logs a single line: method, URL, status and elapsed time.
+        ``full`` adds the request and response headers and bodies, each body cut
+        to ``max_chars`` characters (0 = no limit).
+        """
+        test, resp = self._last or (None, None)
+        if resp is None or test != BuiltIn().get_variable_value("${TEST NAME}"):
+            logger.info("No response recorded for this test")
+            return
+        req = resp.request
+        elapsed = f"{resp.elapsed.total_seconds() * 1000:.0f} ms"
+        if verbosity != "full":
+            logger.info(f"{req.method} {req.url} -> {resp.status_code} ({elapsed})", also_console=True)
+            return
+        max_chars = int(max_chars)
+        body = req.body.decode("utf-8", "replace") if isinstance(req.body, bytes) else req.body
+        lines = [
+            "========== REQUEST ==========",
+            f"Method: {req.method}",
+            f"Endpoint: {req.url}",
+            f"Headers: {dict(req.headers)}",
+        ]
+        if body:
+            lines.append(f"Body: {_truncate(body, max_chars)}")
+        lines += [
+            "========== RESPONSE ==========",
+            f"Status Code: {resp.status_code} ({elapsed})",
+            f"Response Headers: {dict(resp.headers)}",
+            f"Response Body: {_truncate(resp.text, max_chars)}",
+        ]
+        logger.info("\n".join(lines), also_console=True)
+
+    def load_payload(self, path):
+        """Return a request body the compiler stored as a sidecar JSON file (bodies too large to inline)."""
+        return Path(path).read_text(encoding="utf-8")
+
+    def get_manifest_case(self, directory, name):
+        """Return a copy of case ``name`` from the manifest in ``directory``."""
+        return copy.deepcopy(load_cases(directory)[name])
+
+    def response_should_match_expectations(self, resp, status, expectations):
+        """
+        Check a response against compiled expectations in a single call.
+
+        ``status`` is the expected HTTP status (empty to skip). ``expectations``
+        is a JSON string: ``{"headers": [[name, op, expected, dtype], ...],
+        "body": [[field, op, expected, dtype], ...]}``. All checks run and every
+        failure is reported together.
+        """
+        if isinstance(expectations, str):
+            expectations = json.loads(expectations) if expectations.strip() else {}
+        expectations = expectations or {}
+        failures = []
+
+        if str(status).strip():
+            if resp.status_code != int(str(status).strip()):
+                failures.append(f"status: Expected: {status}, but got: {resp.status_code}")
+
+        for name, op, expected, dtype in expectations.get("headers", []):
+            actual = resp.headers.get(name)
+            error = self._check(actual, op, expected, dtype, present=actual is not None)
+            if error:
+                failures.append(f"header '{name}' ({op}): {error}")
+
+        body_checks = expectations.get("body", [])
+        if body_checks:
+            try:
+                doc = resp.json()
+            except ValueError:
+                failures.append(f"body: response is not JSON: {resp.text[:200]}")
+                body_checks = []
+            for field, op, expected, dtype in body_checks:
+                if "[]" in field:
+                    error = self._check_array(doc, field, expected, dtype)
+                else:
+                    found, actual = self._lookup(doc, field)
+                    error = self._check(actual, op, expected, dtype, present=found)
+                if error:
+                    failures.append(f"field '{field}' ({op}): {error}")
+
+        if failures:
+            raise AssertionError("\n".join(failures))
+
+    def _lookup(self, doc, field):
+        """Return (found, value) for the first JSONPath match of $.field."""
+        path = _compiled_path(field)
+        if isinstance(path, tuple):
+            for key in path:
+                if not isinstance(doc, dict) or key not in doc:
+                    return False, None
+                doc = doc[key]
+            return True, doc
+        matches = path.find(doc)
+        if not matches:
+            return False, None
+        return True, matches[0].value
+
+    def _check_array(self, doc, field, expected, dtype):
+        """Array search: 'items[].name' passes when any item's name equals expected."""
+        parts = field.split("[]")
+        array_path = parts[0].rstrip(".")
+        search_field = parts[1].lstrip(".") if len(parts) > 1 and parts[1] else ""
+        found, array = self._lookup(doc, array_path)
+        if not found or not isinstance(array, list):
+            return f"Expected: array at {array_path}, but got: {array!r}"
+        for item in array:
+            value = item
+            if search_field:
+                for part in search_field.split("."):
+                    value = value.get(part) if isinstance(value, dict) else None
+            if _values_equal(value, expected, dtype):
+                return None
+        return f"Value '{_text(expected)}' not found in array {field}"
+
+    def _check(self, actual, op, expected, dtype, present=True):
+        """Evaluate one operator; return an error message or None when it passes."""
+        if op == "is_null":
+            return None if present and actual is None else f"Expected: null, but got: {actual!r}"
+        if op == "is_not_null":
+            return None if present and actual is not None else "Expected: not null, but got: None"
+        if not present:
+            return f"Expected: {_text(expected)}, but got: field not found"
+        if op == "is_empty":
+            return None if isinstance(actual, (str, list, dict)) and len(actual) == 0 else f"Expected: empty, but got: {actual!r}"
+        if op == "is_not_empty":
+            return None if isinstance(actual, (str, list, dict)) and len(actual) > 0 else f"Expected: not empty, but got: {actual!r}"
+        type_checks = {
+            "is_array": (list,),
+            "is_object": (dict,),
+            "is_string": (str,),
+            "is_bool": (bool,),
+        }
+        if op in type_checks:
+            ok = isinstance(actual, type_checks[op])
+            return None if ok else f"Expected: {op[3:]}, but got: {type(actual).__name__}"
+        if op == "is_number":
+            ok = isinstance(actual, (int, float)) and not isinstance(actual, bool)
+            return None if ok else f"Expected: number, but got: {type(actual).__name__}"
+        if op in ("gt", "lt", "between"):
+            try:
+                num = float(actual)
+                if op == "between":
+                    low, high = (float(b) for b in expected)
+                    ok = low <= num <= high
+                else:
+                    bound = float(expected)
+                    ok = num > bound if op == "gt" else num < bound
+            except (ValueError, TypeError):
+                return f"Expected: a number {op} {_text(expected)}, but got: {actual!r}"
+            return None if ok else f"Expected: {op} {_text(expected)}, but got: {_text(actual)}"
+        if op == "ne":
+            return None if not _values_equal(actual, expected, dtype) else f"Expected different values, but both were: {_text(actual)}"
+        if op == "contains":
+            if isinstance(actual, (list, dict)):
+                ok = any(_values_equal(item, expected) for item in actual)
+            else:
+                ok = _text(expected) in _text(actual)
+            return None if ok else f"Expected: {_text(actual)} to contain {_text(expected)}"
+        if op == "regex":
+            return None if re.search(str(expected), _text(actual)) else f"Expected: match /{expected}/, but got: {_text(actual)}"
+        # eq (default), including sentinel values [EMPTY_ARRAY], [EMPTY_OBJECT], [NULL], [EMPTY]
+        if expected == [] or expected == {} or expected == "":
+            ok = type(actual) is type(expected) and len(actual) == 0
+        elif expected is None:
+            ok = actual is None
+        else:
+            ok = _values_equal(actual, expected, dtype)
+        if not ok and _text(actual) == _text(expected):
+            return (f"Expected: {_text(expected)} ({type(expected).__name__}), "
+                    f"but got: {_text(actual)} ({type(actual).__name__})")
+        return None if ok else f"Expected: {_text(expected)}, but got: {_text(actual)}"
@@ -4,28 +4,388 @@ from app.core.config import STORAGE_PATH
 from pathlib import Path
 import shutil
 from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Request
-from app.services.compile_service import setup_workspace, generate_robot_cases_from_excel
-from app.core.config import STORAGE_PATH
-from pathlib import Path
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.services.compile_service import setup_workspace, compile_version, compile_versions, safe_name
+from app.core.config import STORAGE_PATH, COMPILE_STREAM, PIPELINE_GROUP_SIZE
+from app.core.utils_io import write_sheet_sidecar, store_upload, stored_upload_path, touch_stored
+from app.core.utils_sse import sse_event
+from app.services.run_service import compile_and_run_streaming
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
 import shutil
+import asyncio
+import aiofiles
+import io
+import re
+import time
+import zipfile
+from urllib.parse import urljoin
 
 router = APIRouter(prefix="/api/v1", tags=["compile"])
 
 
 @router.post("/compile-test-case")
-async def compile_test_case(request: Request, testName: str = Body(..., embed=True), file: UploadFile = File(...)):
+async def compile_test_case(request: Request, testName: str = Body(..., embed=True), file: UploadFile = File(...),
+                            mode: str = Body("case", embed=True), groupSize: int = Body(0, embed=True),
+                            verbosity: Optional[str] = Body(None, embed=True),
+                            logMaxChars: Optional[int] = Body(None, embed=True),
+                            dedupe: Optional[bool] = Body(None, embed=True),
+                            shards: int = Body(0, embed=True),
+                            stream: Optional[bool] = Body(None, embed=True),
+                            testIds: Optional[str] = Body(None, embed=True),
+                            rowTags: bool = Body(False, embed=True)):
+    """
+    Compile a filled workbook into Robot Framework suites under workspace/{testName}/versions/<version>/generated.
+
+    **Modes:**
+    - `case` (default) — one `TC_###.robot` file per row, each opening its own session
+    - `suite` — all cases in `TestForge_Suite.robot` with one shared keep-alive session,
+      or `TestForge_Part_###.robot` files of `groupSize` cases each
+    - `template` — like `suite`, but each case is one data row for a shared
+      `Run API Case` keyword (`Test Template`), with checks done by the bundled
+      `TestForgeLibrary.py`; much smaller output for large sheets
+    - `manifest` — cases go to one `cases.json` (`cases.msgpack` when msgpack is
+      installed) next to a stub `TestForge_Manifest.robot`; the bundled library
+      creates the tests when the suite runs, so reruns need no regeneration
+
+    **Logging:** `verbosity` sets what each test logs: `none`, `failures` (full
+    request/response of failed tests only), `summary` (one line per request) or
+    `full`. `logMaxChars` cuts logged bodies. Defaults come from
+    `SUITE_LOG_VERBOSITY` and `SUITE_LOG_MAX_CHARS`.
+
+    **Duplicates:** with `dedupe` (default `COMPILE_DEDUPE`), rows whose request
+    and expectations are identical compile to one test; the dropped `TC_###`
+    names map to the kept one in `generated/duplicates.json`, and run streams
+    report them alongside it.
+
+    **Shards:** `shards` splits the tests into that many groups of roughly equal
+    run time, using per-test durations from recent runs under `Report/`, and
+    writes `generated/shards.json` for parallel runs. In `suite`/`template` mode
+    each shard is its own `TestForge_Shard_###.robot` (`groupSize` is ignored).
+
+    **Streaming read:** `stream` (default `COMPILE_STREAM`) reads the workbook
+    read-only in `COMPILE_BATCH_ROWS`-row batches instead of loading it whole, and
+    compiles every sheet that has an `[API]endpoint` column (test numbers continue
+    across sheets). Use it for workbooks too large to hold in memory.
+
+    **Test IDs:** `testIds` (default `COMPILE_TEST_IDS`) is `row` for positional
+    `TC_###` names, or `content` for `TC_<12 hex digits>` names derived from the
+    request and expectations, which stay the same when rows are inserted, moved or
+    deleted (identical rows compile once, as with `dedupe`). `rowTags` tags each
+    test `row:<n>` with its row in the sheet.
+
+    Recompiling rewrites only suites whose cases changed since the last compile
+    (see `compile_manifest.json` next to each version's `generated/`). The response reports
+    `added`/`changed`/`unchanged`/`removed` test counts, plus `bytesWritten` and
+    `compileMs` for the compile step. Re-posting a workbook already compiled with the
+    same mode is served from the compile cache (`cached: true`).
+
+    Each compile writes a new version and switches to it when done, so runs in
+    progress keep reading the version they started with. The response names the
+    new `version`.
+    """
     try:
         root, gen, rep = setup_workspace(testName)
-        raw_path = root / "rawData.xlsx"
         content = await file.read()
         if not content:
             raise HTTPException(status_code=400, detail="empty file")
-        raw_path.write_bytes(content)
-        tests = generate_robot_cases_from_excel(raw_path, gen)
+        stream = COMPILE_STREAM if stream is None else stream
+        raw_path, digest = await _store_upload(root, content, sidecar=not stream)
+        # Compiling blocks (big sheets fan out to a process pool), so keep it off the event loop
+        result = await run_in_threadpool(compile_version, root, raw_path, mode=mode, group_size=groupSize,
+                                         verbosity=verbosity, log_max_chars=logMaxChars, dedupe=dedupe,
+                                         shards=shards, stream=stream, test_ids=testIds, row_tags=rowTags)
+        return _compile_summary(request, testName, mode, {**result, "upload": digest})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"compile error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"compile error: {e}")
+
+
+@router.post("/compile-test-case/bulk")
+async def compile_test_cases_bulk(request: Request, file: Optional[UploadFile] = File(None),
+                                  uploads: Optional[str] = Body(None, embed=True),
+                                  workers: Optional[int] = Body(None, embed=True),
+                                  mode: str = Body("case", embed=True), groupSize: int = Body(0, embed=True),
+                                  verbosity: Optional[str] = Body(None, embed=True),
+                                  logMaxChars: Optional[int] = Body(None, embed=True),
+                                  dedupe: Optional[bool] = Body(None, embed=True),
+                                  shards: int = Body(0, embed=True),
+                                  stream: Optional[bool] = Body(None, embed=True),
+                                  testIds: Optional[str] = Body(None, embed=True),
+                                  rowTags: bool = Body(False, embed=True)):
+    """
+    Compile many workbooks in one request, each into its own workspace, in parallel.
+
+    **Inputs** (either or both):
+    - `file` — a zip of `.xlsx` workbooks; each compiles into the workspace named
+      after its file name (`orders.xlsx` → `orders`)
+    - `uploads` — workbooks uploaded before, as `testName=uploadHash` pairs
+      separated by commas or new lines; `uploadHash` is the `uploadHash` of an
+      earlier compile response
+
+    Every workbook is compiled with the same options as `/compile-test-case`.
+    `workers` (default `BULK_COMPILE_WORKERS`, one per CPU) workbooks compile at
+    once, each in its own process. A workbook that fails does not stop the others.
+
+    **Returns:** `suites`, one compile summary per workbook in input order (or
+    `status: error` with `detail`), each with `uploadHash` and `totalMs` (time from
+    the start of the batch until it finished), plus `compiled`/`failed` counts and
+    `elapsedMs` for the whole request.
+    """
+    started = time.perf_counter()
+    workbooks: List[Tuple[str, Optional[bytes], str]] = []
+    if file is not None:
+        content = await file.read()
+        try:
+            # Unzipping, hashing and storing every workbook is slow; keep it off the event loop
+            workbooks.extend(await run_in_threadpool(_unzip_workbooks, content))
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="file must be a zip of .xlsx workbooks")
+    for item in re.split(r"[,\n]", uploads or ""):
+        if not item.strip():
+            continue
+        name, _, digest = item.strip().partition("=")
+        digest = digest.strip().lower()
+        if not name.strip() or not re.fullmatch(r"[0-9a-f]{64}", digest):
+            raise HTTPException(status_code=400, detail=f"uploads entry '{item.strip()}' is not testName=uploadHash")
+        if not await run_in_threadpool(_stored_upload_exists, digest):
+            raise HTTPException(status_code=404, detail=f"no stored upload {digest}")
+        workbooks.append((name.strip(), None, digest))
+    if not workbooks:
+        raise HTTPException(status_code=400, detail="no workbooks: send a zip of .xlsx files or uploads")
+    names = [safe_name(name) for name, _, _ in workbooks]
+    clashes = sorted({n for n in names if names.count(n) > 1})
+    if clashes:
+        raise HTTPException(status_code=400, detail=f"more than one workbook for: {', '.join(clashes)}")
 
-        # include full base URL so clients get an absolute run URL
-        run_url = f"{request.base_url}api/v1/run-test-case/{testName}/stream"
-        return {"status": "compiled", "testName": testName, "cases": len(tests),
-                "run_url": run_url}
+    jobs = []
+    for name, data, digest in workbooks:
+        root, _, _ = setup_workspace(name)
+        raw_path = root / "rawData.xlsx"
+        if data is None:
+            await run_in_threadpool(shutil.copyfile, stored_upload_path(digest), raw_path)
+        else:
+            async with aiofiles.open(raw_path, "wb") as fh:
+                await fh.write(data)
+        jobs.append((root, raw_path))
+    try:
+        # Sidecars are built by the compile workers, in parallel
+        results = await run_in_threadpool(compile_versions, jobs, workers, mode=mode, group_size=groupSize,
+                                          verbosity=verbosity, log_max_chars=logMaxChars, dedupe=dedupe,
+                                          shards=shards, stream=stream, test_ids=testIds, row_tags=rowTags)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"compile error: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"compile error: {e}")
+
+    suites = []
+    for (name, _, digest), result in zip(workbooks, results):
+        if "error" in result:
+            summary = {"status": "error", "testName": name, "detail": f"compile error: {result['error']}"}
+        else:
+            summary = _compile_summary(request, name, mode, {**result, "upload": digest})
+        summary["uploadHash"] = digest
+        summary["totalMs"] = result["total_ms"]
+        suites.append(summary)
+    failed = sum(1 for s in suites if s["status"] == "error")
+    return {"status": "compiled" if not failed else "partial" if failed < len(suites) else "failed",
+            "compiled": len(suites) - failed, "failed": failed, "suites": suites,
+            "elapsedMs": round((time.perf_counter() - started) * 1000, 1)}
+
+
+@router.post("/compile-test-case/stream")
+async def compile_test_case_stream(request: Request, testName: str = Body(..., embed=True), file: UploadFile = File(...),
+                                   mode: str = Body("case", embed=True), groupSize: int = Body(0, embed=True),
+                                   verbosity: Optional[str] = Body(None, embed=True),
+                                   logMaxChars: Optional[int] = Body(None, embed=True),
+                                   dedupe: Optional[bool] = Body(None, embed=True),
+                                   shards: int = Body(0, embed=True),
+                                   stream: Optional[bool] = Body(None, embed=True),
+                                   testIds: Optional[str] = Body(None, embed=True),
+                                   rowTags: bool = Body(False, embed=True)):
+    """
+    Compile like `/compile-test-case`, streaming progress as Server-Sent Events.
+
+    The compile runs in a worker thread, so other requests and live run streams
+    keep being served.
+
+    SSE Events:
+        - connect: Upload received, compile starting
+        - progress: {rows, total, files} after each chunk of rows
+        - row_error: {case, row, error} for a row that could not be compiled (it is skipped)
+        - files: {written, total} as shared suite files are written
+        - done: Same JSON summary as `/compile-test-case`
+        - error: Compile failed ({status, message})
+    """
+    root, gen, rep = setup_workspace(testName)
+    content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="empty file")
+
+    use_stream = COMPILE_STREAM if stream is None else stream
+
+    async def event_gen():
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def on_progress(event: str, data: Dict[str, Any]):
+            # Called from the compile thread; hand the event to the loop
+            loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+        async def compile_upload():
+            try:
+                raw_path, digest = await _store_upload(root, content, sidecar=not use_stream)
+                result = await run_in_threadpool(compile_version, root, raw_path, mode=mode,
+                                                 group_size=groupSize, verbosity=verbosity,
+                                                 log_max_chars=logMaxChars, dedupe=dedupe, shards=shards,
+                                                 stream=use_stream, test_ids=testIds, row_tags=rowTags,
+                                                 progress=on_progress)
+                return {**result, "upload": digest}
+            finally:
+                # Queued behind the compile thread's last progress event
+                events.put_nowait(None)
+
+        task = asyncio.create_task(compile_upload())
+        yield sse_event("connect", {"status": "compiling", "testName": testName, "mode": mode})
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            yield sse_event(*item)
+
+        try:
+            result = await task
+        except Exception as e:
+            yield sse_event("error", {"status": "error", "message": f"compile error: {e}"})
+            return
+        yield sse_event("done", _compile_summary(request, testName, mode, result))
+
+    return StreamingResponse(
+        event_gen(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+        }
+    )
+
+
+@router.post("/compile-and-run/stream")
+async def compile_and_run_stream(request: Request, testName: str = Body(..., embed=True), file: UploadFile = File(...),
+                                 mode: str = Body("template", embed=True), groupSize: int = Body(0, embed=True),
+                                 verbosity: Optional[str] = Body(None, embed=True),
+                                 logMaxChars: Optional[int] = Body(None, embed=True),
+                                 dedupe: Optional[bool] = Body(None, embed=True),
+                                 stream: Optional[bool] = Body(None, embed=True),
+                                 testIds: Optional[str] = Body(None, embed=True),
+                                 rowTags: bool = Body(False, embed=True)):
+    """
+    Compile a workbook and run it in one request, starting the first tests while later rows are still compiling.
+
+    Takes the form fields of `/compile-test-case` (except `shards`; `manifest` mode
+    is not supported). In `suite`/`template` mode (default `template`) the cases are
+    written in suites of `groupSize` cases (default `PIPELINE_GROUP_SIZE`). Each
+    suite is handed to the runner as soon as it is written. Whenever robot is idle
+    it starts on every suite handed over so far, writing to `part_###` under the
+    run's report directory. The parts are merged with `rebot` into one
+    `output.xml`/`log.html`/`report.html` at the end.
+
+    SSE Events:
+        - connect: Compile started (with the new version)
+        - progress / row_error: Compile progress, as in `/compile-test-case/stream`
+        - compiled: Compile summary (the version is now current)
+        - batch: A robot process started on newly compiled suites
+        - process / pass / fail / skip: Test events, as in `/run-test-case/{testName}/stream`
+        - error: Compile or run failed
+        - done: Merged run summary with download URL
+    """
+    if mode == "manifest":
+        raise HTTPException(status_code=400, detail="compile error: manifest mode cannot be pipelined")
+    root, gen, rep = setup_workspace(testName)
+    content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="empty file")
+    use_stream = COMPILE_STREAM if stream is None else stream
+    raw_path, _ = await _store_upload(root, content, sidecar=not use_stream)
+    base_url = str(request.base_url).rstrip("/")
+
+    async def event_gen():
+        try:
+            async for event in compile_and_run_streaming(root, raw_path, rep, mode=mode,
+                                                         group_size=groupSize or PIPELINE_GROUP_SIZE,
+                                                         verbosity=verbosity, log_max_chars=logMaxChars,
+                                                         dedupe=dedupe, stream=use_stream, test_ids=testIds,
+                                                         row_tags=rowTags):
+                data = event['data']
+                if event['type'] == 'done':
+                    data = {**data, "download_url": urljoin(base_url + "/", f"api/v1/download/{testName}/{data['timestamp']}")}
+                yield sse_event(event['type'], data)
+                await asyncio.sleep(0)
+        except Exception as e:
+            yield sse_event("error", {"status": "error", "message": f"run error: {e}"})
+
+    return StreamingResponse(
+        event_gen(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+        }
+    )
+
+
+def _unzip_workbooks(content: bytes) -> List[Tuple[str, bytes, str]]:
+    """(name, bytes, upload hash) of each .xlsx workbook in a zip, each kept by hash (see store_upload)."""
+    workbooks = []
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        for info in archive.infolist():
+            member = PurePosixPath(info.filename)
+            if info.is_dir() or member.suffix.lower() != ".xlsx" or member.name.startswith((".", "~$")) \
+                    or "__MACOSX" in member.parts:
+                continue
+            data = archive.read(info)
+            workbooks.append((member.stem, data, store_upload(data)))
+    return workbooks
+
+
+def _stored_upload_exists(digest: str) -> bool:
+    """Whether an upload is still kept; marks it recently used so eviction leaves it for this request."""
+    path = stored_upload_path(digest)
+    if not path.exists():
+        return False
+    touch_stored(path)
+    return True
+
+
+async def _store_upload(root: Path, content: bytes, sidecar: bool = True) -> Tuple[Path, str]:
+    """
+    Save the upload as rawData.xlsx and parse it once into the Parquet sidecar every later stage reuses.
+
+    Streaming compiles pass sidecar=False: building the sidecar loads the whole sheet.
+    The upload is also kept by content hash, so bulk compiles can name it later.
+
+    Returns:
+        (rawData.xlsx path, upload hash)
+    """
+    raw_path = root / "rawData.xlsx"
+    async with aiofiles.open(raw_path, "wb") as fh:
+        await fh.write(content)
+    digest = await run_in_threadpool(store_upload, content)
+    if sidecar:
+        await run_in_threadpool(write_sheet_sidecar, content)
+    return raw_path, digest
+
+
+def _compile_summary(request: Request, testName: str, mode: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    # include full base URL so clients get an absolute run URL
+    run_url = f"{request.base_url}api/v1/run-test-case/{testName}/stream"
+    return {"status": "compiled", "testName": testName, "version": result["version"], "uploadHash": result["upload"],
+            "cases": len(result["tests"]),
+            "duplicates": len(result["duplicates"]), "mode": mode, "added": result["added"], "changed": result["changed"],
+            "unchanged": result["unchanged"], "removed": result["removed"], "files": result["files"],
+            "bytesWritten": result["bytes_written"], "compileMs": result["compile_ms"],
+            "shards": result["shards"], "errors": result["errors"], "cached": result["cached"], "run_url": run_url}
@@ -1,18 +1,44 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from app.services.compile_service import setup_workspace
-from app.services.run_service import run_robot_streaming
+from app.services.run_service import run_robot_streaming, run_robot_parallel_streaming
+from app.services.validate_service import validate_streaming
+from app.services.version_service import pin_current
 from app.core.utils_sse import sse_event
+from contextlib import ExitStack, asynccontextmanager
 from urllib.parse import urljoin
 from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
 import asyncio
+import anyio
 
 router = APIRouter(prefix="/api/v1", tags=["run"])
 
+@asynccontextmanager
+async def _pinned_current(root: Path) -> AsyncIterator[Tuple[Optional[str], Path]]:
+    """
+    pin_current for a stream, with its lock-file work in the threadpool instead of on the event loop.
+
+    Pinning and releasing are shielded from cancellation: a client that
+    disconnects cancels the stream, and its pin must still be released.
+    """
+    stack = ExitStack()
+    with anyio.CancelScope(shield=True):
+        version, gen = await run_in_threadpool(stack.enter_context, pin_current(root))
+    try:
+        yield version, gen
+    finally:
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(stack.close)
+
 @router.get("/run-test-case/{testName}/stream")
 async def run_stream(request: Request, testName: str):
     """
     Stream Robot Framework test execution in real-time.
+
+    Runs the current compiled version and keeps it pinned until the run ends,
+    so a recompile during the run does not change its files.
     
     SSE Events:
         - connect: Initial connection established
@@ -32,45 +58,47 @@ async def run_stream(request: Request, testName: str):
         """SSE generator with explicit flushing for real-time streaming."""
         timestamp = None
         
-        async for event in run_robot_streaming(gen, rep):
-            event_type = event['type']
-            data = event['data']
+        async with _pinned_current(root) as (version, pinned_gen):
+            async for event in run_robot_streaming(pinned_gen, rep):
+                event_type = event['type']
+                data = event['data']
             
-            if event_type == 'connect':
-                # Initial connection
-                yield sse_event("connect", data)
+                if event_type == 'connect':
+                    # Initial connection
+                    yield sse_event("connect", {**data, "version": version})
                 
-            elif event_type == 'process':
-                # Test case started running
-                yield sse_event("process", data)
-                await asyncio.sleep(0.01)
+                elif event_type == 'process':
+                    # Test case started running
+                    yield sse_event("process", data)
+                    await asyncio.sleep(0.01)
                 
-            elif event_type == 'pass':
-                # Test case passed
-                yield sse_event("pass", data)
-                await asyncio.sleep(0.01)
+                elif event_type == 'pass':
+                    # Test case passed
+                    yield sse_event("pass", data)
+                    await asyncio.sleep(0.01)
                 
-            elif event_type == 'fail':
-                # Test case failed with message
-                yield sse_event("fail", data)
-                await asyncio.sleep(0.01)
+                elif event_type == 'fail':
+                    # Test case failed with message
+                    yield sse_event("fail", data)
+                    await asyncio.sleep(0.01)
                 
-            elif event_type == 'skip':
-                # Test case skipped
-                yield sse_event("skip", data)
-                await asyncio.sleep(0.01)
+                elif event_type == 'skip':
+                    # Test case skipped
+                    yield sse_event("skip", data)
+                    await asyncio.sleep(0.01)
                 
-            elif event_type == 'done':
-                # Final summary with download URL
-                timestamp = data.get('timestamp')
-                summary = data.get('summary', {})
-                download_url = urljoin(base_url + "/", f"api/v1/download/{testName}/{timestamp}")
-                yield sse_event("done", {
-                    "status": "completed",
-                    "summary": summary,
-                    "message": data.get('message', 'Execution completed'),
-                    "download_url": download_url
-                })
+                elif event_type == 'done':
+                    # Final summary with download URL
+                    timestamp = data.get('timestamp')
+                    summary = data.get('summary', {})
+                    download_url = urljoin(base_url + "/", f"api/v1/download/{testName}/{timestamp}")
+                    yield sse_event("done", {
+                        "status": "completed",
+                        "version": version,
+                        "summary": summary,
+                        "message": data.get('message', 'Execution completed'),
+                        "download_url": download_url
+                    })
 
     return StreamingResponse(
         event_gen(), 
@@ -81,3 +109,88 @@ async def run_stream(request: Request, testName: str):
             "X-Accel-Buffering": "no",  # Disable nginx buffering
         }
     )
+
+@router.get("/run-test-case/{testName}/parallel/stream")
+async def run_parallel_stream(request: Request, testName: str, workers: Optional[int] = None):
+    """
+    Stream a run split over parallel Robot Framework processes.
+
+    Runs the shards of a compile with `shards` (or, without them, the suite files
+    split `workers` ways; one suite file is split by test). `workers` defaults to
+    `RUN_WORKERS`, else one per CPU, fewer when `RATE_LIMIT_RPS` and recent test
+    durations show the extra processes would only wait for the rate limiter.
+    Each shard writes to its own directory under the run's report folder, and
+    the results are merged with `rebot` into one `output.xml`/`log.html`/`report.html`
+    there, so downloads work as for a serial run.
+
+    SSE Events: as `/run-test-case/{testName}/stream` (test events carry their
+    `shard`), plus `shard` when a process finishes.
+    """
+    root, gen, rep = setup_workspace(testName)
+    if not gen.exists() or not any(gen.glob("*.robot")):
+        raise HTTPException(status_code=404, detail="no generated tests found")
+    if workers is not None and workers < 0:
+        raise HTTPException(status_code=400, detail="workers must be 0 or more")
+
+    base_url = str(request.base_url).rstrip("/")
+
+    async def event_gen():
+        async with _pinned_current(root) as (version, pinned_gen):
+            async for event in run_robot_parallel_streaming(pinned_gen, rep, workers):
+                data = event['data']
+                if event['type'] == 'connect':
+                    data = {**data, "version": version}
+                elif event['type'] == 'done':
+                    download_url = urljoin(base_url + "/", f"api/v1/download/{testName}/{data['timestamp']}")
+                    data = {"status": "completed", "version": version, "summary": data.get('summary', {}),
+                            "message": data.get('message', 'Execution completed'), "download_url": download_url}
+                yield sse_event(event['type'], data)
+                await asyncio.sleep(0)
+
+    return StreamingResponse(
+        event_gen(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+        }
+    )
+
+@router.get("/validate-test-case/{testName}/stream")
+async def validate_stream(testName: str):
+    """
+    Check a compiled workspace without sending any requests.
+
+    Lints the uploaded workbook (unknown operators, bad [Type:] tags, cells that
+    will not parse for their operator or type), then runs `robot --dryrun` over
+    generated/ in parallel shards. Results stream as each shard finishes.
+
+    SSE Events:
+        - connect: Validation started
+        - lint: Workbook issue (case/row are null for column-level issues)
+        - fail: Test case failed the dry run (with error message)
+        - error: Generated file robot could not parse
+        - shard: Dry-run shard finished
+        - done: Summary with valid flag
+    """
+    root, gen, rep = setup_workspace(testName)
+    if not gen.exists() or not any(gen.glob("*.robot")):
+        raise HTTPException(status_code=404, detail="no generated tests found")
+
+    async def event_gen():
+        async with _pinned_current(root) as (version, pinned_gen):
+            yield sse_event("connect", {"status": "validating", "test_name": testName, "version": version})
+            async for event in validate_streaming(root, pinned_gen):
+                yield sse_event(event['type'], event['data'])
+                await asyncio.sleep(0)
+
+    return StreamingResponse(
+        event_gen(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+        }
+    )
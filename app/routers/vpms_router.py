@@ -8,6 +8,7 @@ All endpoints use hardcoded VPMS authentication and headers.
 from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Request
 from app.services.vpms.vpms_compile_service import setup_workspace, generate_robot_cases_from_excel
 from app.services.vpms import get_auth_token, get_auth_header, clear_token_cache
+from app.core.utils_io import write_sheet_sidecar
 
 router = APIRouter(prefix="/api/v1/vpms", tags=["VPMS"])
 
@@ -51,6 +52,7 @@ async def vpms_compile_test_case(
             raise HTTPException(status_code=400, detail="Empty file uploaded")
 
         raw_path.write_bytes(content)
+        write_sheet_sidecar(content)
         tests = generate_robot_cases_from_excel(raw_path, gen)
 
         # Include full base URL so clients get an absolute run URL
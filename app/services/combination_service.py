@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 import io
 import pandas as pd
 from app.core import utils_io as U
@@ -96,8 +96,8 @@ def expand_array_columns(df: pd.DataFrame) -> pd.DataFrame:
     new_df = pd.DataFrame(new_data, columns=new_columns)
     return new_df
 
-def build_combination_excel(content: bytes, filename: str) -> bytes:
-    df = U.read_table(content, filename, allow_different_lengths=True)
+def build_combination_excel(content: bytes, filename: str, arrow_strings: Optional[bool] = None) -> bytes:
+    df = U.read_table(content, filename, allow_different_lengths=True, arrow_strings=arrow_strings)
     headers = [str(h).strip() for h in list(df.columns)]
     rows = df.values.tolist()
 
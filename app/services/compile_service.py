@@ -1,31 +1,153 @@
 from pathlib import Path
-from typing import Tuple
-import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import re, json, time, shutil, hashlib, os, math, heapq, datetime, itertools, importlib.util
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from functools import lru_cache
 import pandas as pd
-from app.core.config import STORAGE_PATH
-from app.core.utils_io import normalize_cell, assign_by_path
+from app.core.config import (STORAGE_PATH, COMPILE_WORKERS, COMPILE_CACHE_MAX_MB, SUITE_LOG_VERBOSITY, SUITE_LOG_MAX_CHARS,
+                             COMPILE_DEDUPE, COMPILE_STREAM, COMPILE_BATCH_ROWS, COMPILE_TEST_IDS, BULK_COMPILE_WORKERS)
+from app.core.utils_io import (normalize_cell, assign_by_tokens, tokenize_body_path, load_sheet, content_digest,
+                               iter_sheet_batches, sheet_row_estimate, write_sheet_sidecar)
+from app.services.version_service import current_generated, new_version, publish_version, workspace_root
 
 def safe_name(name: str) -> str:
     return re.sub(r"[^A-Za-z0-9_\-]+", "_", name).strip("_") or "TestForgeSuite"
 
 def setup_workspace(test_name: str) -> Tuple[Path, Path, Path]:
+    """(workspace root, current version's generated/ directory, Report/); generated/ may not exist yet."""
     root = STORAGE_PATH / safe_name(test_name)
-    gen = root / "generated"
     rep = root / "Report"
-    gen.mkdir(parents=True, exist_ok=True)
     rep.mkdir(parents=True, exist_ok=True)
-    return root, gen, rep
+    return root, current_generated(root), rep
 
 ROBOT_HEADER = """*** Settings ***
 Library    RequestsLibrary
 Library    JSONLibrary
 Library    Collections
 Library    BuiltIn
-Suite Setup    Create Session    api    {base_url}
+Library    TestForgeLibrary.py
+Suite Setup    Open Host Sessions    {sessions}
+{test_teardown}
+*** Test Cases ***
+"""
 
+# Shared-suite header: one session per target host for every case in the file, reused with HTTP keep-alive
+SUITE_HEADER = """*** Settings ***
+Library    RequestsLibrary
+Library    JSONLibrary
+Library    Collections
+Library    BuiltIn
+Library    TestForgeLibrary.py
+Suite Setup    Open Host Sessions    {sessions}    headers={{"Connection": "keep-alive"}}
+Suite Teardown    Delete All Sessions
+{test_teardown}
 *** Test Cases ***
 """
 
+# Data-driven suite: one reusable keyword plus a [Template] table with one row of arguments per case
+TEMPLATE_HEADER = """*** Settings ***
+Library    RequestsLibrary
+Library    JSONLibrary
+Library    Collections
+Library    BuiltIn
+Library    TestForgeLibrary.py
+Suite Setup    Open Host Sessions    {sessions}    headers={session_headers}
+Suite Teardown    Delete All Sessions
+Test Template    Run API Case
+{test_teardown}
+*** Keywords ***
+Run API Case
+    [Arguments]    ${{method}}    ${{session}}    ${{endpoint}}    ${{headers}}    ${{params}}    ${{query}}    ${{body}}    ${{status}}    ${{expect}}
+    ${{headers}}=    Convert String To Json    ${{headers}}
+    ${{query}}=    IF    $query    Convert String To Json    ${{query}}    ELSE    Set Variable    ${{None}}
+    IF    $body
+        Set To Dictionary    ${{headers}}    Content-Type=application/json
+    ELSE
+        ${{body}}=    Set Variable    ${{None}}
+    END
+    ${{resp}}=    Rate Limited Request    ${{method}}    ${{session}}    url=${{endpoint}}    params=${{query}}    headers=${{headers}}    data=${{body}}    expected_status=any
+{log_steps}    Response Should Match Expectations    ${{resp}}    ${{status}}    ${{expect}}
+
+*** Test Cases ***    METHOD    SESSION    ENDPOINT    HEADERS    PARAMS    QUERY    BODY    STATUS    EXPECT
+"""
+
+# Manifest mode: cases live in cases.json/cases.msgpack; TestForgeLibrary.ManifestLoader
+# (a pre-run modifier) replaces the placeholder test with one test per case
+MANIFEST_SUITE = "TestForge_Manifest.robot"
+MANIFEST_HEADER = """*** Settings ***
+Library    RequestsLibrary
+Library    JSONLibrary
+Library    Collections
+Library    BuiltIn
+Library    TestForgeLibrary.py
+Suite Setup    Open Host Sessions    {sessions}    headers={session_headers}
+Suite Teardown    Delete All Sessions
+{test_teardown}
+*** Keywords ***
+Run Manifest Case
+    ${{case}}=    Get Manifest Case    ${{CURDIR}}    ${{TEST NAME}}
+    IF    $case['body']
+        Set To Dictionary    ${{case}}[headers]    Content-Type=application/json
+    END
+    ${{resp}}=    Rate Limited Request    ${{case}}[method]    ${{case}}[session]    url=${{case}}[endpoint]    params=${{case}}[query]    headers=${{case}}[headers]    data=${{case}}[body]    expected_status=any
+{log_steps}    Response Should Match Expectations    ${{resp}}    ${{case}}[status]    ${{case}}[expect]
+
+*** Test Cases ***
+Manifest Not Loaded
+    Fail    Cases are in {cases_file}; run with --pythonpath <this directory> --prerunmodifier TestForgeLibrary.ManifestLoader
+"""
+HAS_MSGPACK = importlib.util.find_spec("msgpack") is not None
+CASE_FILES = ("cases.msgpack", "cases.json")
+
+# Keyword library copied into generated/ and imported by every generated suite (see app/robot_libs)
+LIBRARY_FILE = Path(__file__).resolve().parents[1] / "robot_libs" / "TestForgeLibrary.py"
+
+# Changes whenever the compiler or bundled library changes, so stale output is never reused
+COMPILER_VERSION = hashlib.sha256(Path(__file__).read_bytes() + LIBRARY_FILE.read_bytes()).hexdigest()[:12]
+
+# Per-test content hashes from the last compile, kept in workspace/{testName}/
+MANIFEST_NAME = "compile_manifest.json"
+
+# Dropped duplicate tests mapped to the test that runs in their place ({"TC_007": "TC_002"}), in generated/
+DUPLICATES_FILE = "duplicates.json"
+
+# Shard manifest for parallel runs, in generated/ (see _shard_manifest)
+SHARDS_FILE = "shards.json"
+# Most recent runs under Report/ whose test timings feed shard balancing
+SHARD_HISTORY_RUNS = 5
+
+# Compiled outputs keyed by (upload hash, mode, group size, compiler version); see compile_workbook_cached
+COMPILE_CACHE_DIR = STORAGE_PATH / ".compile_cache"
+
+# Sheets smaller than this compile in-process; process start-up costs more than it saves
+PARALLEL_MIN_ROWS = 2000
+
+# Stands in for the Open Host Sessions arguments in a formatted suite header until each file's hosts are known
+SESSIONS_SLOT = "{sessions}"
+
+# Request bodies longer than this (as JSON) go to generated/_data/<hash>.json and are read when
+# the test runs; shorter ones are written into the .robot file. Robot skips "_" directories.
+PAYLOAD_INLINE_MAX = 2048
+PAYLOAD_DIR = "_data"
+# Smallest chunk of rows handed to one worker task
+MIN_CHUNK_ROWS = 500
+
+# "case": one TC_###.robot per row; "suite": cases share suite files and a session;
+# "template": shared suites with one keyword and a data row per case;
+# "manifest": one case data file run by the bundled library
+COMPILE_MODES = ("case", "suite", "template", "manifest")
+
+# How tests are named: "row": TC_### from the row number; "content": TC_ plus the first
+# TEST_ID_CHARS hex digits of the case's content hash, unchanged when rows move
+TEST_ID_MODES = ("row", "content")
+TEST_ID_CHARS = 12
+
+# How much each generated test logs (see TestForgeLibrary's Log Exchange):
+# "none"; "failures": full exchange of failed tests only; "summary": one line per request;
+# "full": request and response headers and bodies, bodies cut to the max chars setting
+LOG_VERBOSITIES = ("none", "failures", "summary", "full")
+
 # Assertion operators for dynamic validation
 ASSERTION_OPERATORS = {
     "eq": "eq",           # Equal (default)
@@ -47,6 +169,24 @@ ASSERTION_OPERATORS = {
     "is_bool": "is_bool",         # Field is boolean
 }
 
+# Added to every request unless the sheet sets them, to avoid bot blocking by Cloudflare/WAF.
+# Cloudflare checks multiple headers to detect bots, not just User-Agent
+DEFAULT_BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "sec-ch-ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-origin",
+}
+
+TYPE_TAG_PATTERN = re.compile(r'\[Type:([^]]+)\]\s*$', flags=re.IGNORECASE)
+
+@lru_cache(maxsize=4096)
 def parse_field_meta(raw: str):
     """
     Parse field with operator and type tag.
@@ -64,11 +204,11 @@ def parse_field_meta(raw: str):
         tuple: (field_name, operator, data_type)
     """
     # Extract type tag if present: [Type:int], [Type:float], etc.
-    type_match = re.search(r'\[Type:([^]]+)\]\s*$', raw, flags=re.IGNORECASE)
+    type_match = TYPE_TAG_PATTERN.search(raw)
     dtype = type_match.group(1).strip().lower() if type_match else None
     
     # Remove type tag from string
-    core = re.sub(r'\[Type:[^]]+\]\s*$', '', raw, flags=re.IGNORECASE).strip()
+    core = TYPE_TAG_PATTERN.sub('', raw).strip()
     
     # Parse operator from remaining string
     if ":" in core:
@@ -123,428 +263,1201 @@ def parse_assertion(field_key: str, expected_raw: str):
     field, op, _ = parse_field_meta(field_key)
     return field, op, expected_raw
 
-def python_repr_for_robot(value):
+def _compile_plan(columns, base_url: str) -> Dict[str, Any]:
     """
-    Convert Python value to a repr string that can be used in Robot's Evaluate keyword.
-    This creates a Python expression that will be evaluated to create proper JSON.
+    Work out once per sheet what each column contributes to a case.
+
+    Column prefixes, [Type:] tags, operators and body paths are parsed here so
+    _build_case only reads cell values by position. base_url is the sheet's
+    default host, used by rows whose endpoint is a relative path.
+
+    Returns:
+        dict with base_url, column positions for endpoint/method/status and, per
+        section, lists of (position, ...) entries with the parsed field meta and path tokens
+    """
+    columns = list(columns)
+    plan: Dict[str, Any] = {
+        "base_url": base_url,
+        "endpoint": columns.index("[API]endpoint") if "[API]endpoint" in columns else None,
+        "method": columns.index("[API]Method") if "[API]Method" in columns else None,
+        "status": columns.index("[Response][API]status") if "[Response][API]status" in columns else None,
+        "expected_body": [], "expected_header": [],
+        "body": [], "array": [], "headers": [], "params": [], "query": [],
+    }
+    for pos, k in enumerate(columns):
+        for prefix, section in (("[Response][Body]", "expected_body"), ("[Response][Header]", "expected_header")):
+            if k.startswith(prefix):
+                field_name, op, dtype = parse_field_meta(k.replace(prefix, "", 1))
+                key = field_name + (":" + op if op != "eq" else "")
+                plan[section].append((pos, key, dtype))
+        if k.startswith("[Request][Body]"):
+            # Strip type markers from field name: [Type:bool], [Type:int], etc.
+            field_clean = re.sub(r'\[Type:[^\]]+\]', '', k.replace("[Request][Body]", ""))
+            if "[]" in field_clean:
+                # Array expansion notation, e.g. data.clientProfiles[].clientType
+                array_path = field_clean.split("[]")[0].rstrip(".")
+                field_name = field_clean.split("[]")[1].lstrip(".") if len(field_clean.split("[]")) > 1 else ""
+                item_tokens = tuple(tokenize_body_path(field_name)) if "." in field_name else None
+                plan["array"].append((pos, array_path, tuple(tokenize_body_path(array_path)), field_name, item_tokens))
+            else:
+                plan["body"].append((pos, field_clean, tuple(tokenize_body_path(field_clean))))
+        for prefix, section in (("[Request][Header]", "headers"), ("[Request][Params]", "params"), ("[Request][Query]", "query")):
+            if k.startswith(prefix):
+                plan[section].append((pos, tuple(tokenize_body_path(k.replace(prefix, "")))))
+    return plan
+
+def _session_alias(base_url: str, default_base_url: str) -> str:
+    """RequestsLibrary session alias for a host: "api" for the sheet's default host, else api_<scheme>_<host>."""
+    if base_url == default_base_url:
+        return "api"
+    return "api_" + re.sub(r"[^A-Za-z0-9]+", "_", base_url).strip("_")
+
+def _sessions_cell(sessions) -> str:
+    """Open Host Sessions arguments (alias=url) for (alias, base_url) pairs, each host once in first-use order."""
+    return "    ".join(f"{alias}={url}" for alias, url in dict.fromkeys(sessions))
+
+def _build_case(values, plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the request and expectations of one sheet row.
 
     Args:
-        value: Python value (None, bool, int, float, str, list, dict)
+        values: Row cells in column order (e.g. from itertuples)
+        plan: Column plan for the sheet from _compile_plan
 
     Returns:
-        str: Python repr string
-    """
-    if value is None:
-        return "None"
-    if isinstance(value, bool):
-        return "True" if value else "False"
-    if isinstance(value, (int, float)):
-        return str(value)
-    if isinstance(value, str):
-        # Escape backslashes and quotes
-        escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
-        return f'"{escaped}"'
-    if isinstance(value, list):
-        items = ', '.join([python_repr_for_robot(item) for item in value])
-        return f'[{items}]'
-    if isinstance(value, dict):
-        items = ', '.join([f'"{k}": {python_repr_for_robot(v)}' for k, v in value.items()])
-        return f'{{{items}}}'
-    # Fallback
-    return repr(value)
-
-def generate_robot_cases_from_excel(excel_path: Path, gen_dir: Path):
-    df = pd.read_excel(excel_path, sheet_name=0, dtype=str).fillna("")
-    tests = []
+        dict with method, endpoint (host stripped), base_url (the row's scheme://host,
+        else the sheet default), session (its alias, see _session_alias), resp_code,
+        headers (user-specified only), params, query, body, expected_header and
+        expected_body ({"field[:op]": (normalized_value, dtype)})
+    """
+    endpoint = values[plan["endpoint"]] if plan["endpoint"] is not None else ""
+    method = ((values[plan["method"]] if plan["method"] is not None else "POST") or "POST").upper()
+    resp_code = values[plan["status"]] if plan["status"] is not None else ""
+    
+    # Convert full URL to relative path if needed; its scheme://host picks the session
+    base_url = plan["base_url"]
+    if endpoint.startswith("http"):
+        parts = endpoint.split("/")
+        base_url = "/".join(parts[:3])
+        endpoint = "/" + "/".join(parts[3:])
+    
+    # Extract expected response data
+    # Normalize expected values to handle sentinel values like [EMPTY_ARRAY], [NULL], etc.
+    # Stored as tuple: (value, data_type)
+    expected_body = {}
+    expected_header = {}
+    for pos, key, dtype in plan["expected_body"]:
+        v = values[pos]
+        if v:
+            expected_body[key] = (normalize_cell(v), dtype)
+    for pos, key, dtype in plan["expected_header"]:
+        v = values[pos]
+        if v:
+            expected_header[key] = (normalize_cell(v), dtype)
     
-    # Extract base URL from first row's endpoint
-    base_url = "http://localhost"
-    if len(df) > 0:
+    # Extract request data with array expansion support
+    # Support sentinel values: [EMPTY], [NULL], [EMPTY_ARRAY], [EMPTY_OBJECT]
+    # normalize_cell() converts these to "", None, [], {}
+    # Support array expansion: data.clientProfiles[].field with comma-separated values
+    # Example: data.clientProfiles[].clientType = "ML,O" creates 2 array items
+
+    # First pass: collect all body fields and detect array expansion patterns
+    body_fields = {}
+    array_expansion_map = {}  # Track which arrays need expansion
+
+    for pos, field_clean, tokens in plan["body"]:
+        v = values[pos]
+        normalized = normalize_cell(v)
+        if normalized is not None or str(v).strip().upper() == "[NULL]":
+            body_fields[field_clean] = (tokens, normalized)
+
+    for pos, array_path, array_tokens, field_name, item_tokens in plan["array"]:
+        v = values[pos]
+        normalized = normalize_cell(v)
+        if normalized is None and str(v).strip().upper() != "[NULL]":
+            continue
+        if array_path not in array_expansion_map:
+            array_expansion_map[array_path] = {"count": 1, "fields": {}, "tokens": array_tokens}
+        # Check if value contains comma (expansion trigger)
+        if isinstance(normalized, str) and "," in normalized:
+            # Split comma-separated values; the array is as long as its longest field
+            split = [val.strip() for val in normalized.split(",")]
+            entry = array_expansion_map[array_path]
+            entry["count"] = max(entry["count"], len(split))
+            entry["fields"][field_name] = (item_tokens, split)
+        else:
+            # Single value - will be duplicated across all array items
+            array_expansion_map[array_path]["fields"][field_name] = (item_tokens, normalized)
+
+    # Second pass: build the body with expanded arrays
+    body = {}
+
+    # First, process regular fields
+    for tokens, value in body_fields.values():
+        assign_by_tokens(body, tokens, value)
+
+    # Then, process array expansions
+    for expansion_info in array_expansion_map.values():
+        count = expansion_info["count"]
+
+        # Create array items
+        array_items = []
+        for idx in range(count):
+            item = {}
+            for field_name, (item_tokens, value) in expansion_info["fields"].items():
+                if isinstance(value, list):
+                    # Use the corresponding value from the split list
+                    item_value = value[idx] if idx < len(value) else value[-1]
+                else:
+                    # Duplicate the single value across all items
+                    item_value = value
+
+                # Build nested structure within the array item
+                if item_tokens is not None:
+                    assign_by_tokens(item, item_tokens, item_value)
+                else:
+                    item[field_name] = item_value
+
+            array_items.append(item)
+
+        # Assign the expanded array to the body
+        assign_by_tokens(body, expansion_info["tokens"], array_items)
+
+    # Keep original types (int, bool, str) for headers, params and query
+    # This preserves: 200 as int, "200" as str, true as bool
+    sections = {"headers": {}, "params": {}, "query": {}}
+    for section, target in sections.items():
+        for pos, tokens in plan[section]:
+            v = values[pos]
+            normalized = normalize_cell(v)
+            if normalized is not None or str(v).strip().upper() == "[NULL]":
+                assign_by_tokens(target, tokens, normalized)
+
+    return {
+        "method": method,
+        "endpoint": endpoint,
+        "base_url": base_url,
+        "session": _session_alias(base_url, plan["base_url"]),
+        "resp_code": resp_code,
+        "headers": sections["headers"],
+        "params": sections["params"],
+        "query": sections["query"],
+        "body": body,
+        "expected_header": expected_header,
+        "expected_body": expected_body,
+    }
+
+def _log_settings(verbosity: str, max_chars: int) -> Tuple[Tuple[str, ...], str]:
+    """
+    Robot lines that log each test's request and response at the given verbosity.
+
+    Returns:
+        (steps to run right after the request, Test Teardown setting for the suite header or "")
+    """
+    if verbosity == "full":
+        return (f"    Log Exchange    full    {max_chars}",), ""
+    if verbosity == "summary":
+        return ("    Log Exchange    summary",), ""
+    if verbosity == "failures":
+        return (), f"Test Teardown    Run Keyword If Test Failed    Log Exchange    full    {max_chars}\n"
+    return (), ""
+
+def _body_sidecar(case: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """(file name, JSON) for a request body too large to inline (see PAYLOAD_INLINE_MAX), else None."""
+    if not case["body"]:
+        return None
+    data = _to_json(case["body"])
+    if len(data) <= PAYLOAD_INLINE_MAX:
+        return None
+    return f"{hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]}.json", data
+
+def _render_test_case(tc_name: str, case: Dict[str, Any], log_steps: Tuple[str, ...] = (),
+                      body_file: Optional[str] = None, tags: Tuple[str, ...] = ()) -> List[str]:
+    """
+    Render one case (see _build_case) as the lines of a Robot Framework test case.
+
+    The first line is the test name; the rest are the indented steps. Callers
+    add the *** Settings *** header, so the same case can go into its own file
+    or share a suite with other cases. log_steps (see _log_settings) are placed
+    right after the request.
+
+    Params, query and body are serialized to JSON here, not evaluated at run
+    time. A body stored as a sidecar (see _body_sidecar) is passed as body_file
+    and loaded by the test when it runs. tags become the test's [Tags].
+    """
+    method = case["method"]
+    endpoint = case["endpoint"]
+    resp_code = case["resp_code"]
+    params = case["params"]
+    query = case["query"]
+    body = case["body"]
+
+    # Apply default headers only if not already specified by user
+    headers = dict(case["headers"])
+    for key, value in DEFAULT_BROWSER_HEADERS.items():
+        if key not in headers:
+            headers[key] = value
+
+    lines = [f"{tc_name}"]
+    if tags:
+        lines.append("    [Tags]    " + "    ".join(tags))
+
+    # Build request parameters
+    # For headers: use Create Dictionary with proper string formatting
+    # HTTP headers MUST be strings per HTTP spec and urllib3 validation
+    # For params, query and body: JSON from the compiler (None → null, True/False → true/false)
+    if headers:
+        # Build Create Dictionary line with key=value pairs
+        # All values are formatted as their literal representation for Robot
+        dict_items = []
+        for k, v in headers.items():
+            # Escape special characters in key
+            key_escaped = k.replace('=', '\\=').replace(' ', '\\ ')
+            # Format value as string representation
+            value_str = str(v)
+            dict_items.append(f"{key_escaped}={value_str}")
+
+        lines.append(f"    ${'{'}headers{'}'}=    Create Dictionary    {'    '.join(dict_items)}")
+    if params:
+        lines.append(f"    ${'{'}params{'}'}=    Convert String To Json    {robot_escape(_to_json(params))}")
+    if query:
+        lines.append(f"    ${'{'}query{'}'}=    Convert String To Json    {robot_escape(_to_json(query))}")
+    if body_file:
+        # Large body: read from the sidecar only when this test runs
+        lines.append(f"    ${'{'}payload{'}'}=    Load Payload    ${'{'}CURDIR{'}'}/{PAYLOAD_DIR}/{body_file}")
+
+    # Ensure Content-Type header is set when sending JSON
+    if body and headers:
+        lines.append(f"    Set To Dictionary    ${'{'}headers{'}'}    Content-Type=application/json")
+    elif body:
+        lines.append(f"    ${'{'}headers{'}'}=    Create Dictionary    Content-Type=application/json")
+
+    # Build API call with only the parameters that exist
+    # Paced per host by TestForgeLibrary's shared rate limiter (see RATE_LIMIT_RPS)
+    call_parts = [f"${'{'}resp{'}'}=", "Rate Limited Request", method, case["session"], endpoint]
+    if query:
+        call_parts.append(f"params=${'{'}query{'}'}")
+    if headers or body:
+        call_parts.append(f"headers=${'{'}headers{'}'}")
+    if body_file:
+        call_parts.append(f"data=${'{'}payload{'}'}")
+    elif body:
+        # Small body: the JSON text itself, escaped as one literal cell
+        call_parts.append(f"data={robot_escape(_to_json(body))}")
+    
+    # Always add expected_status=any to prevent RequestsLibrary from raising HTTPError
+    # This allows the test to validate the actual status code instead
+    call_parts.append("expected_status=any")
+    
+    lines.append("    " + "    ".join(call_parts))
+    lines.extend(log_steps)
+    
+    # Status, header and body checks all run in one TestForgeLibrary call (see _expectations)
+    expectations = _expectations(case)
+    expect = _to_json(expectations) if expectations["headers"] or expectations["body"] else ""
+    lines.append(f"    Response Should Match Expectations    ${'{'}resp{'}'}    "
+                 f"{robot_escape(str(resp_code).strip())}    {robot_escape(expect)}")
+
+    return lines
+
+def robot_escape(value: str) -> str:
+    """
+    Escape text so Robot Framework reads it back as one literal cell.
+
+    Handles backslashes, variable syntax (${, @{, &{, %{), line breaks, leading
+    '#', and runs of spaces that Robot would otherwise treat as a separator.
+    """
+    if value == "":
+        return "${EMPTY}"
+    s = value.replace("\\", "\\\\")
+    s = re.sub(r"([$@&%])\{", r"\\\1{", s)
+    s = s.replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+    s = re.sub(r"(?<= ) ", r"\\ ", s)
+    if s.startswith(" "):
+        s = "\\" + s
+    if s.endswith(" "):
+        s = s[:-1] + "${SPACE}"
+    if s.startswith("#"):
+        s = "\\" + s
+    return s
+
+def _to_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def _expectations(case: Dict[str, Any]) -> Dict[str, list]:
+    """
+    Compile a case's response checks into the JSON form read by TestForgeLibrary.
+
+    Returns:
+        {"headers": [[name, op, expected, dtype], ...], "body": [[field, op, expected, dtype], ...]}
+        where between bounds are pre-split into [low, high]
+    """
+    out: Dict[str, list] = {"headers": [], "body": []}
+    for section, key in (("headers", "expected_header"), ("body", "expected_body")):
+        for raw_key, (value_raw, dtype) in case[key].items():
+            field_name, op, _ = parse_field_meta(raw_key)
+            if op == "between":
+                bounds = [b.strip() for b in re.split(r'[,;:]', str(value_raw)) if b.strip()]
+                low = cast_value(bounds[0], dtype) if len(bounds) > 0 else 0
+                high = cast_value(bounds[1], dtype) if len(bounds) > 1 else low
+                expected = [low, high]
+            else:
+                expected = cast_value(value_raw, dtype)
+            out[section].append([field_name, op, expected, dtype])
+    return out
+
+def _render_template_row(tc_name: str, case: Dict[str, Any], tags: Tuple[str, ...] = ()) -> str:
+    """Render one case as a data row for the Run API Case template (tags go on a line of their own)."""
+    expectations = _expectations(case)
+    cells = [
+        tc_name,
+        case["method"],
+        case["session"],
+        case["endpoint"],
+        _to_json({k: str(v) for k, v in case["headers"].items()}),
+        _to_json(case["params"]) if case["params"] else "",
+        _to_json(case["query"]) if case["query"] else "",
+        _to_json(case["body"]) if case["body"] else "",
+        str(case["resp_code"]).strip(),
+        _to_json(expectations) if expectations["headers"] or expectations["body"] else "",
+    ]
+    if tags:
+        return f"{tc_name}    [Tags]    " + "    ".join(tags) + "\n    " + "    ".join(robot_escape(c) for c in cells[1:]) + "\n"
+    return "    ".join([cells[0]] + [robot_escape(c) for c in cells[1:]]) + "\n"
+
+def _manifest_case(case: Dict[str, Any], tags: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """Compile one case into the entry Run Manifest Case reads (see TestForgeLibrary)."""
+    entry = {
+        "method": case["method"],
+        "session": case["session"],
+        "endpoint": case["endpoint"],
+        "headers": {k: str(v) for k, v in case["headers"].items()},
+        "params": case["params"],
+        "query": case["query"] or None,
+        "body": _to_json(case["body"]) if case["body"] else None,
+        "status": str(case["resp_code"]).strip(),
+        "expect": _expectations(case),
+    }
+    if tags:
+        entry["tags"] = list(tags)
+    return entry
+
+def _encode_cases(cases: Dict[str, Any]) -> Tuple[str, bytes]:
+    """Serialize manifest cases as msgpack when installed, else compact JSON; returns (file name, data)."""
+    doc = {"version": 1, "cases": cases}
+    if HAS_MSGPACK:
+        import msgpack
+        return CASE_FILES[0], msgpack.packb(doc, use_bin_type=True)
+    return CASE_FILES[1], _to_json(doc).encode("utf-8")
+
+def _write_text(path: Path, content: Union[str, bytes]) -> int:
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    # Unlink first: the file may be a hard link into the compile cache, which must not change
+    path.unlink(missing_ok=True)
+    path.write_bytes(data)
+    return len(data)
+
+def _case_hash(case: Dict[str, Any], fingerprint: str) -> str:
+    """
+    Hash of a case's normalized request and expectations plus the compile settings.
+
+    Keys are sorted, so two rows that send the same request and check the same
+    response hash alike whatever order their columns were filled in.
+    """
+    payload = json.dumps(case, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(f"{fingerprint}\n{payload}".encode("utf-8")).hexdigest()
+
+def _case_key(case: Dict[str, Any]) -> str:
+    """Hash of a case's request and expectations alone: equal for identical rows, whatever the compile settings."""
+    return hashlib.sha256(json.dumps(case, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _test_name(row: int, key: Optional[str], test_ids: str) -> str:
+    """Name of the test compiled from a row (0-based) whose case has content key (see TEST_ID_MODES)."""
+    if test_ids == "content" and key is not None:
+        return f"TC_{key[:TEST_ID_CHARS]}"
+    return f"TC_{row+1:03d}"
+
+def case_namer(columns, base_url: str, test_ids: str) -> Callable[[int, Any], str]:
+    """
+    Name rows of a sheet as compile names their tests: returns namer(row, values) for 0-based rows.
+
+    A row whose case cannot be built keeps its row name, as in compile errors.
+    """
+    plan = _compile_plan(columns, base_url) if test_ids == "content" else None
+
+    def namer(row: int, values) -> str:
+        if plan is None:
+            return _test_name(row, None, test_ids)
+        try:
+            return _test_name(row, _case_key(_build_case(values, plan)), test_ids)
+        except Exception:
+            return _test_name(row, None, test_ids)
+    return namer
+
+def sheet_base_url(df: Optional[pd.DataFrame]) -> str:
+    """Default host of a sheet: scheme and host of the first row's endpoint, for rows with relative paths."""
+    if df is not None and len(df) > 0:
         first_endpoint = df.iloc[0].get("[API]endpoint", "")
         if first_endpoint.startswith("http"):
             # Parse base URL (e.g., http://mockoon.ariyanaragroup.com)
             parts = first_endpoint.split("/")
             if len(parts) >= 3:
-                base_url = f"{parts[0]}//{parts[2]}"
-    
-    for i, row in df.iterrows():
-        tc_name = f"TC_{i+1:03d}"
-        endpoint = row.get("[API]endpoint", "")
-        method = (row.get("[API]Method", "POST") or "POST").upper()
-        resp_code = row.get("[Response][API]status", "")
-        
-        # Convert full URL to relative path if needed
-        if endpoint.startswith("http"):
-            endpoint = "/" + "/".join(endpoint.split("/")[3:])
-        
-        # Extract expected response data
-        expected_body = {}
-        expected_header = {}
-        
-        for k, v in row.items():
-            if not v:
-                continue
-            if k.startswith("[Response][Body]"):
-                raw = k.replace("[Response][Body]", "", 1)
-                field_name, op, dtype = parse_field_meta(raw)
-                # Normalize expected value to handle sentinel values like [EMPTY_ARRAY], [NULL], etc.
-                normalized_v = normalize_cell(v)
-                # Store as tuple: (value, data_type)
-                key = field_name + (":" + op if op != "eq" else "")
-                expected_body[key] = (normalized_v, dtype)
-            elif k.startswith("[Response][Header]"):
-                raw = k.replace("[Response][Header]", "", 1)
-                field_name, op, dtype = parse_field_meta(raw)
-                # Normalize expected value to handle sentinel values
-                normalized_v = normalize_cell(v)
-                key = field_name + (":" + op if op != "eq" else "")
-                expected_header[key] = (normalized_v, dtype)
-        
-        # Extract request data with array expansion support
-        # Support sentinel values: [EMPTY], [NULL], [EMPTY_ARRAY], [EMPTY_OBJECT]
-        # normalize_cell() converts these to "", None, [], {}
-        # Support array expansion: data.clientProfiles[].field with comma-separated values
-        # Example: data.clientProfiles[].clientType = "ML,O" creates 2 array items
-
-        # First pass: collect all body fields and detect array expansion patterns
-        body_fields = {}
-        array_expansion_map = {}  # Track which arrays need expansion
-
-        for k, v in row.items():
-            if k.startswith("[Request][Body]"):
-                field = k.replace("[Request][Body]", "")
-                # Strip type markers from field name: [Type:bool], [Type:int], etc.
-                # Extract the clean field name without type information
-                field_clean = re.sub(r'\[Type:[^\]]+\]', '', field)
-
-                normalized = normalize_cell(v)
-
-                if normalized is not None or str(v).strip().upper() == "[NULL]":
-                    # Check if this field uses array expansion notation []
-                    if "[]" in field_clean:
-                        # Extract the array path (e.g., "data.clientProfiles")
-                        array_path = field_clean.split("[]")[0].rstrip(".")
-                        field_name = field_clean.split("[]")[1].lstrip(".") if "[]" in field_clean and len(field_clean.split("[]")) > 1 else ""
-
-                        # Check if value contains comma (expansion trigger)
-                        if isinstance(normalized, str) and "," in normalized:
-                            # Split comma-separated values
-                            values = [val.strip() for val in normalized.split(",")]
-                            if array_path not in array_expansion_map:
-                                array_expansion_map[array_path] = {"count": len(values), "fields": {}}
-                            else:
-                                # Update count if this field has more items
-                                array_expansion_map[array_path]["count"] = max(
-                                    array_expansion_map[array_path]["count"],
-                                    len(values)
-                                )
-                            # Store the split values for this field
-                            array_expansion_map[array_path]["fields"][field_name] = values
-                        else:
-                            # Single value - will be duplicated across all array items
-                            if array_path not in array_expansion_map:
-                                array_expansion_map[array_path] = {"count": 1, "fields": {}}
-                            array_expansion_map[array_path]["fields"][field_name] = normalized
-                    else:
-                        # Regular field without array expansion
-                        body_fields[field_clean] = normalized
-
-        # Second pass: build the body with expanded arrays
-        body = {}
-
-        # First, process regular fields
-        for field, value in body_fields.items():
-            assign_by_path(body, field, value)
-
-        # Then, process array expansions
-        for array_path, expansion_info in array_expansion_map.items():
-            count = expansion_info["count"]
-            fields = expansion_info["fields"]
-
-            # Create array items
-            array_items = []
-            for idx in range(count):
-                item = {}
-                for field_name, value in fields.items():
-                    if isinstance(value, list):
-                        # Use the corresponding value from the split list
-                        item_value = value[idx] if idx < len(value) else value[-1]
-                    else:
-                        # Duplicate the single value across all items
-                        item_value = value
-
-                    # Build nested structure within the array item
-                    if "." in field_name:
-                        assign_by_path(item, field_name, item_value)
-                    else:
-                        item[field_name] = item_value
-
-                array_items.append(item)
-
-            # Assign the expanded array to the body
-            assign_by_path(body, array_path, array_items)
-
-        headers = {}
-        for k, v in row.items():
-            if k.startswith("[Request][Header]"):
-                field = k.replace("[Request][Header]", "")
-                normalized = normalize_cell(v)
-                if normalized is not None or str(v).strip().upper() == "[NULL]":
-                    # Keep original type (int, bool, str) for headers
-                    # This preserves: 200 as int, "200" as str, true as bool
-                    assign_by_path(headers, field, normalized)
-
-        # Add default browser headers if not specified to avoid bot blocking by Cloudflare/WAF
-        # Cloudflare checks multiple headers to detect bots, not just User-Agent
-        default_browser_headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate, br",
-            "sec-ch-ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": '"Windows"',
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-origin",
-        }
+                return f"{parts[0]}//{parts[2]}"
+    return "http://localhost"
+
+def _file_hash(members) -> str:
+    """Hash of a generated file's cases, from (name, digest, ...) entries."""
+    return hashlib.sha256("\n".join(f"{m[0]}:{m[1]}" for m in members).encode("utf-8")).hexdigest()
 
-        # Apply default headers only if not already specified by user
-        for key, value in default_browser_headers.items():
-            if key not in headers:
-                headers[key] = value
-
-        params = {}
-        for k, v in row.items():
-            if k.startswith("[Request][Params]"):
-                field = k.replace("[Request][Params]", "")
-                normalized = normalize_cell(v)
-                if normalized is not None or str(v).strip().upper() == "[NULL]":
-                    assign_by_path(params, field, normalized)
-
-        query = {}
-        for k, v in row.items():
-            if k.startswith("[Request][Query]"):
-                field = k.replace("[Request][Query]", "")
-                normalized = normalize_cell(v)
-                if normalized is not None or str(v).strip().upper() == "[NULL]":
-                    assign_by_path(query, field, normalized)
-
-
-        lines = [ROBOT_HEADER.format(base_url=base_url)]
-        lines.append(f"{tc_name}")
-
-        # Add delay to prevent rate limiting and bot detection
-        # This makes execution pattern look more human-like and avoids triggering Cloudflare
-        lines.append(f"    Sleep    0.5s")
-
-        # Log API request details
-        lines.append(f"    Log    ========== REQUEST ==========    console=yes")
-        lines.append(f"    Log    Method: {method}    console=yes")
-        lines.append(f"    Log    Endpoint: {endpoint}    console=yes")
-        
-        # Build request parameters
-        # For headers: use Create Dictionary with proper string formatting
-        # HTTP headers MUST be strings per HTTP spec and urllib3 validation
-        # For body: use json.dumps() for proper JSON serialization (None → null, True/False → true/false)
-        if headers:
-            # Build Create Dictionary line with key=value pairs
-            # All values are formatted as their literal representation for Robot
-            dict_items = []
-            for k, v in headers.items():
-                # Escape special characters in key
-                key_escaped = k.replace('=', '\\=').replace(' ', '\\ ')
-                # Format value as string representation
-                value_str = str(v)
-                dict_items.append(f"{key_escaped}={value_str}")
-
-            lines.append(f"    ${'{'}headers{'}'}=    Create Dictionary    {'    '.join(dict_items)}")
-            lines.append(f"    Log    Headers: ${'{'}headers{'}'}    console=yes")
-        if params:
-            py_dict = python_repr_for_robot(params)
-            lines.append(f"    ${'{'}params{'}'}=    Evaluate    {py_dict}")
-            lines.append(f"    Log    Params: ${'{'}params{'}'}    console=yes")
-        if query:
-            py_dict = python_repr_for_robot(query)
-            lines.append(f"    ${'{'}query{'}'}=    Evaluate    {py_dict}")
-            lines.append(f"    Log    Query: ${'{'}query{'}'}    console=yes")
-        if body:
-            py_dict = python_repr_for_robot(body)
-            # Use json.dumps() to properly serialize Python dict to JSON string
-            # This converts: True → true, False → false, None → null
-            lines.append(f"    ${'{'}payload{'}'}=    Evaluate    json.dumps({py_dict})    modules=json")
-            lines.append(f"    Log    Body: ${'{'}payload{'}'}    console=yes")
-
-        # Ensure Content-Type header is set when sending JSON
-        if body and headers:
-            lines.append(f"    Set To Dictionary    ${'{'}headers{'}'}    Content-Type=application/json")
-        elif body:
-            lines.append(f"    ${'{'}headers{'}'}=    Create Dictionary    Content-Type=application/json")
-
-        # Build API call with only the parameters that exist
-        call_parts = [f"${'{'}resp{'}'}=", f"{method} On Session", "api", endpoint]
-        if query:
-            call_parts.append(f"params=${'{'}query{'}'}")
-        if headers or body:
-            call_parts.append(f"headers=${'{'}headers{'}'}")
-        if body:
-            # Use data= parameter with JSON string for proper serialization
-            call_parts.append(f"data=${'{'}payload{'}'}")
-        
-        # Always add expected_status=any to prevent RequestsLibrary from raising HTTPError
-        # This allows the test to validate the actual status code instead
-        call_parts.append("expected_status=any")
-        
-        lines.append("    " + "    ".join(call_parts))
-        
-        # Log API response details
-        lines.append(f"    Log    ========== RESPONSE ==========    console=yes")
-        lines.append(f"    Log    Status Code: ${'{'}resp.status_code{'}'}    console=yes")
-        lines.append(f"    Log    Response Headers: ${'{'}resp.headers{'}'}    console=yes")
-        lines.append(f"    Log    Response Body: ${'{'}resp.text{'}'}    console=yes")
-        
-        # Validate status code
-        if str(resp_code).strip():
-            lines.append(f"    Should Be Equal As Integers    ${'{'}resp.status_code{'}'}    {resp_code}")
-        
-        # Validate response headers
-        if expected_header:
-            for raw_key, (header_value_raw, dtype) in expected_header.items():
-                field_name, op, _ = parse_field_meta(raw_key)
-                header_value = cast_value(header_value_raw, dtype)
-                
-                # Headers support: eq, ne, contains, regex
-                if op == "ne":
-                    lines.append(f"    Should Not Be Equal    ${'{'}resp.headers['{field_name}']{'}'}    {header_value}")
-                elif op == "contains":
-                    lines.append(f"    Should Contain    ${'{'}resp.headers['{field_name}']{'}'}    {header_value}")
-                elif op == "regex":
-                    lines.append(f"    Should Match Regexp    ${'{'}resp.headers['{field_name}']{'}'}    {header_value}")
-                else:  # eq (default)
-                    lines.append(f"    Should Be Equal    ${'{'}resp.headers['{field_name}']{'}'}    {header_value}")
-        
-        # Validate response body
-        if expected_body:
-            lines.append(f"    ${'{'}json{'}'}=    Set Variable    ${'{'}resp.json(){'}'}")
-            for raw_key, (expected_value_raw, dtype) in expected_body.items():
-                field_name, op, _ = parse_field_meta(raw_key)
-                expected_value = cast_value(expected_value_raw, dtype)
-
-                # Check if this uses array search notation []
-                if "[]" in field_name:
-                    # Array search: data.eligibleProducts[].prodCode
-                    # Split into array_path and search_field
-                    parts = field_name.split("[]")
-                    array_path = parts[0].rstrip(".")
-                    search_field = parts[1].lstrip(".") if len(parts) > 1 and parts[1] else ""
-
-                    # Generate code to search through array
-                    lines.append(f"    # Search array: {field_name}")
-                    lines.append(f"    ${'{'}array{'}'}=    Get Value From Json    ${'{'}json{'}'}    $.{array_path}")
-                    lines.append(f"    ${'{'}found{'}'}=    Set Variable    ${{False}}")
-                    lines.append(f"    FOR    ${'{'}item{'}'}    IN    @{'{'}array[0]{'}'}")
-
-                    if search_field:
-                        # Search for specific field in array items
-                        if "." in search_field:
-                            # Nested field: use Evaluate to access
-                            search_expr = ".".join([f"$item['{part}']" for part in search_field.split(".")])
-                            lines.append(f"        ${'{'}item_value{'}'}=    Evaluate    {search_expr}")
-                        else:
-                            # Simple field
-                            lines.append(f"        ${'{'}item_value{'}'}=    Set Variable    ${'{'}item[{repr(search_field)}]{'}'}")
-
-                        # Check if value matches
-                        # Use Robot's Run Keyword And Return Status for safe comparison
-                        lines.append(f"        ${'{'}matches{'}'}=    Run Keyword And Return Status    Should Be Equal    ${'{'}item_value{'}'}    {expected_value}")
-                        lines.append(f"        IF    ${'{'}matches{'}'}")
-                        lines.append(f"            ${'{'}found{'}'}=    Set Variable    ${{True}}")
-                        lines.append(f"            Exit For Loop")
-                        lines.append(f"        END")
-                    else:
-                        # Search for value directly in array (no field specified)
-                        # Use Robot's Run Keyword And Return Status for safe comparison
-                        lines.append(f"        ${'{'}matches{'}'}=    Run Keyword And Return Status    Should Be Equal    ${'{'}item{'}'}    {expected_value}")
-                        lines.append(f"        IF    ${'{'}matches{'}'}")
-                        lines.append(f"            ${'{'}found{'}'}=    Set Variable    ${{True}}")
-                        lines.append(f"            Exit For Loop")
-                        lines.append(f"        END")
-
-                    lines.append(f"    END")
-                    lines.append(f"    Should Be True    ${'{'}found{'}'}    msg=Value '{expected_value}' not found in array {field_name}")
+def _load_manifest(path: Path) -> Dict[str, Dict[str, str]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return {"tests": dict(data.get("tests", {})), "files": dict(data.get("files", {}))}
+    except (OSError, ValueError, AttributeError):
+        return {"tests": {}, "files": {}}
+
+def read_compile_settings(gen_dir: Path) -> Dict[str, Any]:
+    """test_ids and stream of the compile that wrote gen_dir (row IDs and first sheet only if not recorded)."""
+    try:
+        data = json.loads((gen_dir.parent / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        data = {}
+    return {"test_ids": data.get("test_ids", "row"), "stream": bool(data.get("stream", False))}
+
+def _save_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _compile_chunk(chunk: pd.DataFrame, plan: Dict[str, Any], fingerprint: str, mode: str, header: str,
+                   log_steps: Tuple[str, ...], gen_dir: Path, previous_files: Dict[str, str], dedupe: bool = False,
+                   test_ids: str = "row", row_tags: bool = False):
+    """
+    Build, hash and render the cases of one slice of the sheet.
+
+    Runs in a worker process for large sheets. Test names come from the row
+    index (or the case content, see TEST_ID_MODES), so they are the same
+    however the sheet is chunked; row_tags tags each test row:<n>. In "case"
+    mode with row IDs the worker writes its own TC_###.robot files (skipping
+    unchanged ones); otherwise it returns rendered blocks for the parent to
+    write, as content IDs may repeat across chunks.
+
+    A row that fails to compile is skipped and reported instead of aborting the sheet.
+    With dedupe, a case whose content already appeared in the chunk is neither
+    rendered nor written (its entry has block None); the parent drops it.
+    Large request bodies ("case"/"suite" mode) are written to content-addressed
+    files in gen_dir/PAYLOAD_DIR unless an identical one is already there.
+
+    Returns:
+        (entries, files_written, bytes_written, errors, body_files) where entries are
+        (tc_name, digest, block, (session alias, base_url), row name TC_###, content key)
+        tuples in sheet order (block is None for files already written),
+        errors are {"case", "row", "error"} dicts and body_files are the sidecar
+        names the chunk's cases use
+    """
+    entries = []
+    errors = []
+    body_files = set()
+    seen = set()
+    files_written = 0
+    bytes_written = 0
+    for i, values in zip(chunk.index, chunk.itertuples(index=False, name=None)):
+        row_name = tc_name = _test_name(i, None, test_ids)
+        try:
+            case = _build_case(values, plan)
+            key = _case_key(case)
+            tc_name = _test_name(i, key, test_ids)
+            tags = (f"row:{i+1}",) if row_tags else ()
+            # Tags are part of the rendered test, so a moved row rewrites its file
+            digest = _case_hash({**case, "tags": tags} if tags else case, fingerprint)
+            session = (case["session"], case["base_url"])
+            if dedupe:
+                if key in seen:
+                    entries.append((tc_name, digest, None, session, row_name, key))
                     continue
+                seen.add(key)
+            sidecar = _body_sidecar(case) if mode in ("case", "suite") else None
+            body_file = None
+            if sidecar:
+                body_file, data = sidecar
+                body_files.add(body_file)
+                target = gen_dir / PAYLOAD_DIR / body_file
+                if not target.exists():
+                    target.parent.mkdir(exist_ok=True)
+                    bytes_written += _write_text(target, data)
+                    files_written += 1
+            if mode == "case" and test_ids == "row":
+                file_name = f"{tc_name}.robot"
+                target = gen_dir / file_name
+                if previous_files.get(file_name) != _file_hash([(tc_name, digest)]) or not target.exists():
+                    file_header = header.replace(SESSIONS_SLOT, _sessions_cell([session]))
+                    bytes_written += _write_text(target, "\n".join([file_header] + _render_test_case(tc_name, case, log_steps, body_file, tags)) + "\n")
+                    files_written += 1
+                block = None
+            elif mode == "template":
+                block = _render_template_row(tc_name, case, tags)
+            elif mode == "manifest":
+                block = _manifest_case(case, tags)
+            else:
+                block = "\n".join(_render_test_case(tc_name, case, log_steps, body_file, tags)) + "\n"
+            entries.append((tc_name, digest, block, session, row_name, key))
+        except Exception as e:
+            errors.append({"case": row_name, "row": int(i) + 1, "error": f"{type(e).__name__}: {e}"})
+    return entries, files_written, bytes_written, errors, body_files
 
-                # Regular field validation (no array search)
-                lines.append(f"    ${'{'}value{'}'}=    Get Value From Json    ${'{'}json{'}'}    $.{field_name}")
-                
-                # Type and structure validation operators
-                if op == "is_null":
-                    lines.append(f"    Should Be Equal    ${'{'}value[0]{'}'}    ${'{'}None{'}'}")
-                elif op == "is_not_null":
-                    lines.append(f"    Should Not Be Equal    ${'{'}value[0]{'}'}    ${'{'}None{'}'}")
-                elif op == "is_empty":
-                    # Works for strings, arrays, objects
-                    lines.append(f"    Should Be Empty    ${'{'}value[0]{'}'}")
-                elif op == "is_not_empty":
-                    lines.append(f"    Should Not Be Empty    ${'{'}value[0]{'}'}")
-                elif op == "is_array":
-                    lines.append(f"    Should Be True    isinstance(${'{'}value[0]{'}'}, list)")
-                elif op == "is_object":
-                    lines.append(f"    Should Be True    isinstance(${'{'}value[0]{'}'}, dict)")
-                elif op == "is_string":
-                    lines.append(f"    Should Be True    isinstance(${'{'}value[0]{'}'}, str)")
-                elif op == "is_number":
-                    lines.append(f"    Should Be True    isinstance(${'{'}value[0]{'}'}, (int, float))")
-                elif op == "is_bool":
-                    lines.append(f"    Should Be True    isinstance(${'{'}value[0]{'}'}, bool)")
-                # Numeric comparison operators
-                elif op in ("gt", "lt", "between"):
-                    lines.append(f"    ${'{'}num{'}'}=    Convert To Number    ${'{'}value[0]{'}'}")
-                    if op == "gt":
-                        lines.append(f"    Should Be True    ${'{'}num{'}'} > {expected_value}")
-                    elif op == "lt":
-                        lines.append(f"    Should Be True    ${'{'}num{'}'} < {expected_value}")
-                    elif op == "between":
-                        # Expected format: "low,high" or "low:high" or "low;high"
-                        bounds = [b.strip() for b in re.split(r'[,;:]', str(expected_value_raw)) if b.strip()]
-                        low = cast_value(bounds[0], dtype) if len(bounds) > 0 else 0
-                        high = cast_value(bounds[1], dtype) if len(bounds) > 1 else low
-                        lines.append(f"    Should Be True    ${'{'}num{'}'} >= {low} and ${'{'}num{'}'} <= {high}")
-                # Value comparison operators
-                elif op == "eq":
-                    # Handle normalized sentinel values
-                    if expected_value == []:  # Empty array from [EMPTY_ARRAY]
-                        lines.append(f"    Should Be Empty    ${'{'}value[0]{'}'}")
-                        lines.append(f"    Should Be True    isinstance(${'{'}value[0]{'}'}, list)")
-                    elif expected_value == {}:  # Empty object from [EMPTY_OBJECT]
-                        lines.append(f"    Should Be Empty    ${'{'}value[0]{'}'}")
-                        lines.append(f"    Should Be True    isinstance(${'{'}value[0]{'}'}, dict)")
-                    elif expected_value is None:  # Null from [NULL]
-                        lines.append(f"    Should Be Equal    ${'{'}value[0]{'}'}    ${'{'}None{'}'}")
-                    elif expected_value == "":  # Empty string from [EMPTY] or [EMPTY_STRING]
-                        lines.append(f"    Should Be Empty    ${'{'}value[0]{'}'}")
-                        lines.append(f"    Should Be True    isinstance(${'{'}value[0]{'}'}, str)")
-                    elif dtype in ("int", "integer"):
-                        lines.append(f"    Should Be Equal As Integers    ${'{'}value[0]{'}'}    {expected_value}")
-                    elif dtype in ("float", "double", "number"):
-                        lines.append(f"    Should Be Equal As Numbers    ${'{'}value[0]{'}'}    {expected_value}")
-                    elif dtype in ("bool", "boolean"):
-                        # Use Robot Framework's built-in boolean variables ${True} and ${False}
-                        bool_var = "${True}" if expected_value else "${False}"
-                        lines.append(f"    Should Be Equal    ${'{'}value[0]{'}'}    {bool_var}")
-                    else:
-                        lines.append(f"    Should Be Equal    ${'{'}value[0]{'}'}    {expected_value}")
-                elif op == "ne":
-                    lines.append(f"    Should Not Be Equal    ${'{'}value[0]{'}'}    {expected_value}")
-                elif op == "contains":
-                    lines.append(f"    Should Contain    ${'{'}value[0]{'}'}    {expected_value}")
-                elif op == "regex":
-                    lines.append(f"    Should Match Regexp    ${'{'}value[0]{'}'}    {expected_value}")
-                else:
-                    # Fallback to equality
-                    lines.append(f"    Should Be Equal    ${'{'}value[0]{'}'}    {expected_value}")
+def _compile_workers(rows: int) -> int:
+    if rows < PARALLEL_MIN_ROWS:
+        return 1
+    return max(1, COMPILE_WORKERS or os.cpu_count() or 1)
+
+def _status_seconds(status) -> Optional[float]:
+    """Elapsed seconds of an output.xml <status> (RF 7 "elapsed", or RF 6 "starttime"/"endtime")."""
+    if status.get("elapsed") is not None:
+        return float(status.get("elapsed"))
+    try:
+        start, end = (datetime.datetime.strptime(status.get(k), "%Y%m%d %H:%M:%S.%f") for k in ("starttime", "endtime"))
+    except (TypeError, ValueError):
+        return None
+    return (end - start).total_seconds()
+
+def _history_runs(report_dir: Path, runs: int = SHARD_HISTORY_RUNS) -> List[Path]:
+    """output.xml files of the most recent runs, newest first (run directories are named by timestamp)."""
+    if not report_dir.is_dir():
+        return []
+    outputs = [d / "output.xml" for d in sorted(report_dir.iterdir(), reverse=True) if (d / "output.xml").is_file()]
+    return outputs[:runs]
+
+def read_test_durations(report_dir: Path, runs: int = SHARD_HISTORY_RUNS) -> Dict[str, float]:
+    """
+    Per-test run time in seconds from previous runs' output.xml files under report_dir.
+
+    The newest run that timed a test wins. Files are streamed, so large outputs
+    are not held in memory; unreadable or partial files are skipped.
+    """
+    durations: Dict[str, float] = {}
+    for output in _history_runs(report_dir, runs):
+        found: Dict[str, float] = {}
+        try:
+            for _, elem in ET.iterparse(output, events=("end",)):
+                if elem.tag != "test":
+                    continue
+                status = elem.find("status")
+                seconds = _status_seconds(status) if status is not None else None
+                if seconds is not None:
+                    found[elem.get("name", "").replace(" ", "_")] = seconds
+                elem.clear()
+        except (OSError, ET.ParseError):
+            continue
+        for name, seconds in found.items():
+            durations.setdefault(name, seconds)
+    return durations
+
+def _shard_entries(entries, shards: int, durations: Dict[str, float]) -> List[Tuple[float, list]]:
+    """
+    Split compiled entries into at most `shards` groups of roughly equal run time.
+
+    Longest-processing-time first: tests are taken slowest first and each goes to
+    the shard with the least estimated time so far. Tests without history count
+    as the median known duration (1s when there is none). Each shard keeps
+    sheet order.
+
+    Returns:
+        [(estimated seconds, entries), ...], without empty shards
+    """
+    known = sorted(durations[e[0]] for e in entries if e[0] in durations)
+    default = known[len(known) // 2] if known else 1.0
+    estimate = {e[0]: durations.get(e[0], default) for e in entries}
+    heap = [(0.0, n) for n in range(min(shards, len(entries)))]
+    assigned: List[list] = [[] for _ in heap]
+    loads = [0.0] * len(heap)
+    for pos in sorted(range(len(entries)), key=lambda p: (-estimate[entries[p][0]], p)):
+        load, n = heapq.heappop(heap)
+        assigned[n].append(pos)
+        loads[n] = load + estimate[entries[pos][0]]
+        heapq.heappush(heap, (loads[n], n))
+    return [(loads[n], [entries[p] for p in sorted(positions)]) for n, positions in enumerate(assigned)]
+
+def _shard_file(n: int) -> str:
+    return f"TestForge_Shard_{n:03d}.robot"
+
+def _shard_manifest(shard_groups, mode: str) -> Dict[str, Any]:
+    """
+    Shard manifest written to SHARDS_FILE: per shard, the generated files to run and its test names.
+
+    Every shard lists its own suite files, except in "manifest" mode where all
+    shards share the one stub suite and select their tests by name (--test).
+    """
+    def files_of(n: int, group) -> List[str]:
+        if mode == "case":
+            return [f"{e[0]}.robot" for e in group]
+        if mode == "manifest":
+            return [MANIFEST_SUITE]
+        return [_shard_file(n)]
+
+    return {
+        "version": 1,
+        "mode": mode,
+        "shards": [
+            {"shard": n, "files": files_of(n, group), "tests": [e[0] for e in group],
+             "estimated_seconds": round(seconds, 3)}
+            for n, (seconds, group) in enumerate(shard_groups, start=1)
+        ],
+    }
+
+def _plan_files(entries, mode: str, group_size: int, shard_groups=None):
+    """
+    Assign compiled entries to output files.
+
+    "case" mode gives each case its own TC_###.robot and "manifest" mode lists
+    every case under the one stub suite. Other modes put every case
+    in TestForge_Suite.robot, or split them into TestForge_Part_001.robot,
+    TestForge_Part_002.robot, ... with group_size cases each. Given shard_groups
+    (see _shard_entries), "suite" and "template" modes write one
+    TestForge_Shard_###.robot per shard instead. Test names are unchanged, so
+    run streaming still reports TC_### per case.
+    """
+    if mode == "case":
+        return [(f"{e[0]}.robot", [e]) for e in entries]
+    if mode == "manifest":
+        return [(MANIFEST_SUITE, entries)]
+    if shard_groups:
+        return [(_shard_file(n), group) for n, (_, group) in enumerate(shard_groups, start=1)]
+    size = group_size if group_size > 0 else max(len(entries), 1)
+    groups = [entries[i:i + size] for i in range(0, len(entries), size)]
+    return [
+        ("TestForge_Suite.robot" if len(groups) == 1 else f"TestForge_Part_{n:03d}.robot", group)
+        for n, group in enumerate(groups, start=1)
+    ]
+
+def _bundle_library(gen_dir: Path, stats: Dict[str, Any]) -> None:
+    """Copy TestForgeLibrary.py next to the suites that import it (skipped when already current)."""
+    target = gen_dir / LIBRARY_FILE.name
+    data = LIBRARY_FILE.read_bytes()
+    if target.exists() and target.read_bytes() == data:
+        return
+    target.unlink(missing_ok=True)
+    shutil.copyfile(LIBRARY_FILE, target)
+    stats["files"] += 1
+    stats["bytes_written"] += len(data)
+
+def _resolve_compile_options(**options) -> Dict[str, Any]:
+    """
+    Apply the config defaults to compile settings and check them, for every compile entry point.
+
+    options are compile_workbook's keyword arguments; mode, verbosity, log_max_chars,
+    dedupe, shards, stream and test_ids that are missing or None follow their
+    defaults (see compile_workbook), and content test IDs turn dedupe on. Other
+    options pass through. Resolving a resolved dict again leaves it unchanged.
+
+    Raises:
+        ValueError: for an unknown mode, verbosity or test ID mode, or negative shards
+    """
+    resolved = dict(options)
+    resolved["mode"] = mode = options.get("mode") or "case"
+    if mode not in COMPILE_MODES:
+        raise ValueError(f"Unknown compile mode '{mode}'. Use one of: {', '.join(COMPILE_MODES)}")
+    resolved["verbosity"] = verbosity = options.get("verbosity") or SUITE_LOG_VERBOSITY
+    if verbosity not in LOG_VERBOSITIES:
+        raise ValueError(f"Unknown log verbosity '{verbosity}'. Use one of: {', '.join(LOG_VERBOSITIES)}")
+    log_max_chars = options.get("log_max_chars")
+    resolved["log_max_chars"] = SUITE_LOG_MAX_CHARS if log_max_chars is None else max(0, log_max_chars)
+    resolved["shards"] = shards = options.get("shards") or 0
+    if shards < 0:
+        raise ValueError("shards must be 0 or more")
+    resolved["stream"] = COMPILE_STREAM if options.get("stream") is None else options["stream"]
+    resolved["test_ids"] = test_ids = options.get("test_ids") or COMPILE_TEST_IDS
+    if test_ids not in TEST_ID_MODES:
+        raise ValueError(f"Unknown test ID mode '{test_ids}'. Use one of: {', '.join(TEST_ID_MODES)}")
+    # Content IDs imply dedupe, since identical cases would share a name
+    dedupe = COMPILE_DEDUPE if options.get("dedupe") is None else options["dedupe"]
+    resolved["dedupe"] = dedupe or test_ids == "content"
+    return resolved
+
+def compile_workbook(excel_path: Path, gen_dir: Path, arrow_strings: Optional[bool] = None,
+                     mode: str = "case", group_size: int = 0, verbosity: Optional[str] = None,
+                     log_max_chars: Optional[int] = None, dedupe: Optional[bool] = None, shards: int = 0,
+                     stream: Optional[bool] = None, test_ids: Optional[str] = None, row_tags: bool = False,
+                     progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                     ready: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Compile the first sheet of a workbook (every case sheet when streaming) into Robot Framework suites.
+
+    Compilation is incremental: each case is hashed (normalized request and
+    expectations plus compile settings) and compared with the manifest from the
+    previous compile, so only files containing a new or changed case are
+    rewritten. Suites no longer produced are deleted.
+
+    Args:
+        excel_path: Stored workbook (rawData.xlsx)
+        gen_dir: Output directory for .robot files; the manifest is kept in its parent
+        arrow_strings: Read cells as string[pyarrow] (None follows the ARROW_STRINGS setting)
+        mode: "case" writes one TC_###.robot per row, each with its own session;
+              "suite" writes all cases into shared suites with one keep-alive session each;
+              "template" writes shared suites with one Run API Case keyword and a
+              [Template] data row per case;
+              "manifest" writes the cases to one data file plus a stub suite, and the
+              bundled library creates the tests at run time
+        group_size: In "suite"/"template" mode, number of cases per suite file (0 = one suite)
+        verbosity: What each test logs, one of LOG_VERBOSITIES (None follows SUITE_LOG_VERBOSITY)
+        log_max_chars: Logged bodies are cut to this many characters (None follows
+                       SUITE_LOG_MAX_CHARS, 0 = no limit)
+        dedupe: Compile one test per distinct case (same method, host, endpoint, headers,
+                params, query, body, status and checks); later rows with an identical case
+                are dropped and mapped to the kept test in generated/DUPLICATES_FILE
+                (None follows COMPILE_DEDUPE)
+        shards: Split the tests into this many shards of roughly equal run time, using
+                per-test durations from the last SHARD_HISTORY_RUNS runs under Report/,
+                and write generated/SHARDS_FILE for parallel runs (0 = no shards).
+                In "suite"/"template" mode each shard is one TestForge_Shard_###.robot
+                and group_size is ignored
+        stream: Read the workbook in COMPILE_BATCH_ROWS-row batches (see iter_sheet_batches)
+                instead of loading the first sheet whole, and compile every sheet with an
+                [API]endpoint column, numbering tests on across sheets. Memory for the sheet
+                is bounded by the batch size (None follows COMPILE_STREAM)
+        test_ids: How tests are named, one of TEST_ID_MODES (None follows COMPILE_TEST_IDS).
+                  "row" names tests TC_### from the row number; "content" names them
+                  TC_<first TEST_ID_CHARS hex digits of the case hash>, so a test keeps its
+                  name (and its history, manifest entry and cache hits) when rows are
+                  inserted or moved. Content IDs imply dedupe, since identical cases
+                  would share a name
+        row_tags: Tag each test row:<n> with its row number in the sheet
+        progress: Optional callback(event, data), called from the compiling thread with
+                  "progress" ({rows, total, files}; total is estimated when streaming) after
+                  each chunk of rows, "row_error"
+                  ({case, row, error}) for rows that could not be compiled, and "files"
+                  ({written, total}) as suite files are written
+        ready: Optional callback({files, tests, duplicates}) for pipelined runs, called from
+               the compiling thread each time suite files are final, in sheet order:
+               "suite"/"template" groups of group_size cases and "case" files are written
+               and handed over as soon as their rows are compiled (the last ones when the
+               compile ends), along with rows newly dropped as duplicates ({dropped: kept}).
+               Not available with shards or in "manifest" mode
+
+    Returns:
+        dict with tests (names in sheet order), duplicates ({dropped: kept}, empty
+        unless dedupe), shards ([{shard, tests, estimated_seconds}], empty unless
+        shards), added/changed/unchanged/removed test counts, files and
+        bytes_written (this compile only), errors (rows skipped) and compile_ms
+
+    Sheets of PARALLEL_MIN_ROWS or more are compiled in chunks on a process
+    pool (COMPILE_WORKERS processes, default one per CPU).
+    """
+    options = _resolve_compile_options(mode=mode, verbosity=verbosity, log_max_chars=log_max_chars, dedupe=dedupe,
+                                       shards=shards, stream=stream, test_ids=test_ids)
+    mode, verbosity, log_max_chars = options["mode"], options["verbosity"], options["log_max_chars"]
+    dedupe, shards, stream, test_ids = options["dedupe"], options["shards"], options["stream"], options["test_ids"]
+    if ready and (shards or mode == "manifest"):
+        raise ValueError("suites cannot be handed over while compiling with shards or in manifest mode")
+    log_steps, test_teardown = _log_settings(verbosity, log_max_chars)
+
+    started = time.perf_counter()
+    stats: Dict[str, Any] = {"files": 0, "bytes_written": 0}
+
+    if stream:
+        # Batches of every case sheet, read ahead only as far as the workers need
+        total = sheet_row_estimate(excel_path)
+        workers = _compile_workers(PARALLEL_MIN_ROWS if total is None else total)
+        batches = iter_sheet_batches(excel_path, COMPILE_BATCH_ROWS, arrow_strings)
+        first = next(batches, None)
+        first_df = first[1] if first is not None else None
+        batches = itertools.chain([first] if first is not None else [], batches)
+    else:
+        # Parquet sidecar when available (see write_sheet_sidecar), else the workbook itself
+        df = load_sheet(excel_path, arrow_strings)
+        total = len(df)
+        workers = _compile_workers(total)
+        size = MIN_CHUNK_ROWS if workers == 1 else max(MIN_CHUNK_ROWS, math.ceil(len(df) / (workers * 4)))
+        batches = (("", df.iloc[start:start + size]) for start in range(0, len(df), size))
+        first_df = df
+
+    base_url = sheet_base_url(first_df)
+
+    # Each suite file opens a session per host its cases use; SESSIONS_SLOT is filled per file
+    if mode == "suite":
+        header = SUITE_HEADER.format(sessions=SESSIONS_SLOT, test_teardown=test_teardown)
+    elif mode in ("template", "manifest"):
+        # Browser headers go on the session once instead of into every case
+        session_headers = robot_escape(_to_json({**DEFAULT_BROWSER_HEADERS, "Connection": "keep-alive"}))
+        if mode == "template":
+            header = TEMPLATE_HEADER.format(sessions=SESSIONS_SLOT, session_headers=session_headers,
+                                            test_teardown=test_teardown, log_steps="".join(l + "\n" for l in log_steps))
+        else:
+            cases_file = CASE_FILES[0] if HAS_MSGPACK else CASE_FILES[1]
+            header = MANIFEST_HEADER.format(sessions=SESSIONS_SLOT, session_headers=session_headers, cases_file=cases_file,
+                                            test_teardown=test_teardown, log_steps="".join(l + "\n" for l in log_steps))
+    else:
+        header = ROBOT_HEADER.format(sessions=SESSIONS_SLOT, test_teardown=test_teardown)
+
+    fingerprint = f"{COMPILER_VERSION}|{mode}|{base_url}|{verbosity}|{log_max_chars}"
+    manifest_path = gen_dir.parent / MANIFEST_NAME
+    previous = _load_manifest(manifest_path)
 
-        content = "\n".join(lines) + "\n"
-        (gen_dir / f"{tc_name}.robot").write_text(content, encoding="utf-8")
-        tests.append(tc_name)
-    return tests
+    def report(event: str, data: Dict[str, Any]) -> None:
+        if progress:
+            progress(event, data)
+
+    # Build, hash and render rows in chunks; large sheets spread the chunks over a process pool.
+    # Column plans are per header, since streamed sheets may differ.
+    plans: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+
+    def plan_for(columns) -> Dict[str, Any]:
+        key = tuple(columns)
+        if key not in plans:
+            plans[key] = _compile_plan(columns, base_url)
+        return plans[key]
+
+    def suite_writes(file_name: str, group, file_hash: str) -> List[Tuple[Path, Union[str, bytes]]]:
+        """(path, content) pairs to write for one suite file; none if it is unchanged or already written."""
+        if mode == "case" and group[0][2] is None:
+            return []  # written by _compile_chunk
+        target = gen_dir / file_name
+        if previous["files"].get(file_name) == file_hash and target.exists() \
+                and (mode != "manifest" or any((gen_dir / name).exists() for name in CASE_FILES)):
+            return []
+        file_header = header.replace(SESSIONS_SLOT, _sessions_cell(e[3] for e in group))
+        if mode == "manifest":
+            cases_file, data = _encode_cases({e[0]: e[2] for e in group})
+            for stale in CASE_FILES:
+                if stale != cases_file and (gen_dir / stale).exists():
+                    (gen_dir / stale).unlink()
+            return [(gen_dir / cases_file, data), (target, file_header)]
+        if mode == "template":
+            return [(target, file_header + "".join(e[2] for e in group))]
+        return [(target, file_header + "\n" + "\n".join(e[2] for e in group))]
+
+    results: Dict[int, Any] = {}
+    stats["errors"] = []
+    rows_done = 0
+    # Pipelined compiles (see ready): chunks handed over so far, their entries without duplicates,
+    # how many of those are in handed-over files, and those files with their hashes
+    handed_chunks = 0
+    handed: List[Any] = []
+    handed_tests = 0
+    handed_keys: Dict[str, str] = {}
+    handed_duplicates: set = set()
+    early_files: Dict[str, str] = {}
+    if ready:
+        _bundle_library(gen_dir, stats)
+
+    def hand_over() -> None:
+        """Write and hand over the suite files whose cases are all compiled, in sheet order."""
+        nonlocal handed_chunks, handed_tests
+        duplicates: Dict[str, str] = {}
+        while handed_chunks in results:
+            for e in results[handed_chunks][0]:
+                if dedupe and e[5] in handed_keys:
+                    duplicates[e[4]] = handed_keys[e[5]]
+                    continue
+                handed_keys[e[5]] = e[0]
+                handed.append(e)
+            handed_chunks += 1
+        handed_duplicates.update(duplicates)
+        size = 1 if mode == "case" else group_size
+        files, tests = [], []
+        # A shared group is only final once a later case exists (a sheet of one group is TestForge_Suite.robot)
+        while size > 0 and len(handed) - handed_tests >= size + (mode != "case"):
+            group = handed[handed_tests:handed_tests + size]
+            file_name = f"{group[0][0]}.robot" if mode == "case" else f"TestForge_Part_{handed_tests // size + 1:03d}.robot"
+            early_files[file_name] = _file_hash(group)
+            for target, data in suite_writes(file_name, group, early_files[file_name]):
+                stats["bytes_written"] += _write_text(target, data)
+                stats["files"] += 1
+            files.append(file_name)
+            tests.extend(e[0] for e in group)
+            handed_tests += size
+        if files or duplicates:
+            ready({"files": files, "tests": tests, "duplicates": duplicates})
+
+    def collect(n: int, rows: int, result) -> None:
+        nonlocal rows_done
+        results[n] = result
+        rows_done += rows
+        stats["files"] += result[1]
+        stats["bytes_written"] += result[2]
+        for error in result[3]:
+            stats["errors"].append(error)
+            report("row_error", error)
+        report("progress", {"rows": rows_done, "total": total, "files": stats["files"]})
+        if ready:
+            hand_over()
+
+    if workers == 1:
+        for n, (_, chunk) in enumerate(batches):
+            collect(n, len(chunk), _compile_chunk(chunk, plan_for(chunk.columns), fingerprint, mode, header,
+                                                  log_steps, gen_dir, previous["files"], dedupe, test_ids, row_tags))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for n, (_, chunk) in enumerate(batches):
+                futures[pool.submit(_compile_chunk, chunk, plan_for(chunk.columns), fingerprint, mode, header,
+                                    log_steps, gen_dir, previous["files"], dedupe, test_ids, row_tags)] = (n, len(chunk))
+                # At most two chunks per worker in flight, so a streamed workbook is never read far ahead
+                if len(futures) >= workers * 2:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(*futures.pop(future), future.result())
+            for future in as_completed(list(futures)):
+                collect(*futures.pop(future), future.result())
+    entries = []
+    body_files = set()
+    for n in sorted(results):
+        entries.extend(results[n][0])
+        body_files.update(results[n][4])
+    stats["errors"].sort(key=lambda e: e["row"])
+
+    # Keep the first test of each distinct case; the rest run as that test (see DUPLICATES_FILE).
+    # Dropped rows are listed by row name, which stays unique when content IDs do not.
+    duplicates: Dict[str, str] = {}
+    if dedupe:
+        kept: Dict[str, str] = {}
+        unique = []
+        for e in entries:
+            if e[5] in kept:
+                duplicates[e[4]] = kept[e[5]]
+            else:
+                kept[e[5]] = e[0]
+                unique.append(e)
+        entries = unique
+    tests = [e[0] for e in entries]
+
+    current = {e[0]: e[1] for e in entries}
+    stats["added"] = sum(1 for name in current if name not in previous["tests"])
+    stats["changed"] = sum(1 for name, d in current.items() if name in previous["tests"] and previous["tests"][name] != d)
+    stats["unchanged"] = sum(1 for name, d in current.items() if previous["tests"].get(name) == d)
+    stats["removed"] = sum(1 for name in previous["tests"] if name not in current)
+
+    shard_groups = _shard_entries(entries, shards, read_test_durations(workspace_root(gen_dir) / "Report")) if shards else None
+
+    files: Dict[str, str] = {}
+    pending = []
+    planned = _plan_files(entries, mode, group_size, shard_groups)
+    for file_name, group in planned:
+        files[file_name] = _file_hash(group)
+        if file_name not in early_files:
+            pending.extend(suite_writes(file_name, group, files[file_name]))
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(len(pending), max(workers, 4))) as pool:
+            for n, written in enumerate(pool.map(lambda item: _write_text(*item), pending), start=1):
+                stats["files"] += 1
+                stats["bytes_written"] += written
+                report("files", {"written": n, "total": len(pending)})
+
+    # Drop suites from a previous compile so stale or differently-grouped files are not run
+    for old in gen_dir.glob("*.robot"):
+        if old.name not in files:
+            old.unlink()
+    if mode != "manifest":
+        for name in CASE_FILES:
+            (gen_dir / name).unlink(missing_ok=True)
+    for old in (gen_dir / PAYLOAD_DIR).glob("*.json"):
+        if old.name not in body_files:
+            old.unlink()
+    if duplicates:
+        stats["bytes_written"] += _write_text(gen_dir / DUPLICATES_FILE, json.dumps(duplicates, indent=1))
+        stats["files"] += 1
+    else:
+        (gen_dir / DUPLICATES_FILE).unlink(missing_ok=True)
+    if shard_groups:
+        stats["bytes_written"] += _write_text(gen_dir / SHARDS_FILE, json.dumps(_shard_manifest(shard_groups, mode), indent=1))
+        stats["files"] += 1
+    else:
+        (gen_dir / SHARDS_FILE).unlink(missing_ok=True)
+    _bundle_library(gen_dir, stats)
+
+    # test_ids and stream let validation name lint issues after the tests they belong to
+    _save_manifest(manifest_path, {"compiler": COMPILER_VERSION, "mode": mode, "test_ids": test_ids, "stream": stream,
+                                   "tests": current, "files": files})
+    if ready:
+        rest = [(file_name, group) for file_name, group in planned if file_name not in early_files]
+        ready({"files": [file_name for file_name, _ in rest], "tests": [e[0] for _, group in rest for e in group],
+               "duplicates": {k: v for k, v in duplicates.items() if k not in handed_duplicates}})
+
+    stats["tests"] = tests
+    stats["duplicates"] = duplicates
+    stats["shards"] = [{"shard": n, "tests": len(group), "estimated_seconds": round(seconds, 3)}
+                       for n, (seconds, group) in enumerate(shard_groups or (), start=1)]
+    stats["compile_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return stats
+
+def _generated_files(gen_dir: Path) -> List[Path]:
+    """Files in gen_dir and its sub-directories, without Python bytecode caches."""
+    return [p for p in gen_dir.rglob("*") if p.is_file() and "__pycache__" not in p.parts]
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _evict_compile_cache(limit_bytes: int) -> None:
+    """Delete least recently used cache entries until the cache fits in limit_bytes."""
+    entries = []
+    for entry in COMPILE_CACHE_DIR.iterdir():
+        try:
+            size = json.loads((entry / "result.json").read_text(encoding="utf-8"))["cache_bytes"]
+            entries.append((entry.stat().st_mtime, size, entry))
+        except (OSError, ValueError, KeyError):
+            continue
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= limit_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+def compile_workbook_cached(excel_path: Path, gen_dir: Path, arrow_strings: Optional[bool] = None,
+                            mode: str = "case", group_size: int = 0, verbosity: Optional[str] = None,
+                            log_max_chars: Optional[int] = None, dedupe: Optional[bool] = None, shards: int = 0,
+                            stream: Optional[bool] = None, test_ids: Optional[str] = None, row_tags: bool = False,
+                            progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    compile_workbook with a result cache shared by all workspaces.
+
+    Outputs are cached under workspace/.compile_cache by (upload hash, mode,
+    group size, log settings, dedupe, shards, stream, test IDs, COMPILER_VERSION); with shards, the
+    run history used for balancing is part of the key. A hit hard-links (or copies) the cached files
+    into gen_dir instead of compiling. Entries are evicted least recently used
+    first once the cache exceeds COMPILE_CACHE_MAX_MB.
+
+    Returns:
+        compile_workbook's result plus cached (True when served from the cache)
+    """
+    options = _resolve_compile_options(arrow_strings=arrow_strings, mode=mode, group_size=group_size,
+                                       verbosity=verbosity, log_max_chars=log_max_chars, dedupe=dedupe,
+                                       shards=shards, stream=stream, test_ids=test_ids, row_tags=row_tags)
+    if COMPILE_CACHE_MAX_MB <= 0:
+        return {**compile_workbook(excel_path, gen_dir, progress=progress, **options), "cached": False}
+
+    started = time.perf_counter()
+    settings = "|".join(str(options[k]) for k in ("mode", "group_size", "verbosity", "log_max_chars", "dedupe",
+                                                  "shards", "stream", "test_ids", "row_tags"))
+    settings += f"|{COMPILER_VERSION}"
+    if options["shards"]:
+        settings += "|" + ",".join(p.parent.name for p in _history_runs(workspace_root(gen_dir) / "Report"))
+    key = hashlib.sha256(f"{content_digest(excel_path.read_bytes())}|{settings}".encode("utf-8")).hexdigest()[:32]
+    entry = COMPILE_CACHE_DIR / key
+    manifest_path = gen_dir.parent / MANIFEST_NAME
+
+    try:
+        cached = json.loads((entry / "result.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cached = None
+    if cached is not None:
+        names = set(cached["files_cached"])
+        for old in _generated_files(gen_dir):
+            if old.relative_to(gen_dir).as_posix() not in names:
+                old.unlink()
+        for name in cached["files_cached"]:
+            (gen_dir / name).parent.mkdir(parents=True, exist_ok=True)
+            _link_or_copy(entry / "generated" / name, gen_dir / name)
+        previous = _load_manifest(manifest_path)["tests"]
+        current = json.loads((entry / MANIFEST_NAME).read_text(encoding="utf-8"))
+        shutil.copy2(entry / MANIFEST_NAME, manifest_path)
+        os.utime(entry)  # mark as recently used
+        return {
+            **cached["result"],
+            "added": sum(1 for name in current["tests"] if name not in previous),
+            "changed": sum(1 for name, d in current["tests"].items() if name in previous and previous[name] != d),
+            "unchanged": sum(1 for name, d in current["tests"].items() if previous.get(name) == d),
+            "removed": sum(1 for name in previous if name not in current["tests"]),
+            "files": 0,
+            "bytes_written": 0,
+            "compile_ms": round((time.perf_counter() - started) * 1000, 1),
+            "cached": True,
+        }
+
+    result = compile_workbook(excel_path, gen_dir, progress=progress, **options)
+
+    # Store via a temporary directory so concurrent compiles never see a partial entry
+    COMPILE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = COMPILE_CACHE_DIR / f".{key}.{os.getpid()}.{time.monotonic_ns()}"
+    try:
+        (tmp / "generated").mkdir(parents=True)
+        files = _generated_files(gen_dir)
+        for p in files:
+            target = tmp / "generated" / p.relative_to(gen_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _link_or_copy(p, target)
+        shutil.copy2(manifest_path, tmp / MANIFEST_NAME)
+        (tmp / "result.json").write_text(json.dumps({
+            "files_cached": [p.relative_to(gen_dir).as_posix() for p in files],
+            "cache_bytes": sum(p.stat().st_size for p in files),
+            "result": {k: v for k, v in result.items() if k in ("tests", "duplicates", "shards", "errors")},
+        }), encoding="utf-8")
+        os.rename(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # another compile stored it first, or the disk is full
+    _evict_compile_cache(COMPILE_CACHE_MAX_MB * 1024 * 1024)
+    return {**result, "cached": False}
+
+def compile_version(root: Path, excel_path: Path, **options) -> Dict[str, Any]:
+    """
+    Compile into a new version of the workspace and make it current (see version_service).
+
+    Runs already going keep the version they started with. options are
+    compile_workbook_cached's keyword arguments.
+
+    Returns:
+        compile_workbook_cached's result plus version
+    """
+    with new_version(root, MANIFEST_NAME) as (version, gen_dir):
+        result = compile_workbook_cached(excel_path, gen_dir, **options)
+        publish_version(root, version)
+    return {**result, "version": version}
+
+def _compile_upload(excel_path: Path, gen_dir: Path, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bulk compile job run in a worker process: build the Parquet sidecar (unless streaming), then compile.
+
+    options are resolved (see _resolve_compile_options).
+    """
+    if not options["stream"]:
+        write_sheet_sidecar(excel_path.read_bytes())
+    return compile_workbook_cached(excel_path, gen_dir, **options)
+
+def compile_versions(jobs: List[Tuple[Path, Path]], workers: Optional[int] = None,
+                     **options) -> List[Dict[str, Any]]:
+    """
+    Compile several workspaces at once, each into a new version (see compile_version).
+
+    Each job is (workspace root, stored workbook). Parsing and compiling run in
+    a pool of worker processes, so workbooks compile in parallel; versions are
+    created, pinned and published in this process, where runs look for them.
+    A workbook that fails to compile does not stop the others.
+
+    Args:
+        jobs: (root, excel_path) per workbook
+        workers: Workbooks compiled at once (None follows BULK_COMPILE_WORKERS, 0 = one per CPU)
+        options: compile_workbook_cached's keyword arguments, the same for every job
+
+    Returns:
+        One dict per job, in order: compile_version's result, or error; both with
+        total_ms (from the start of the batch until the job finished)
+    """
+    # Settings errors would fail every job the same way; report them once instead
+    options = _resolve_compile_options(**{k: v for k, v in options.items() if k != "progress"})
+    workers = BULK_COMPILE_WORKERS if workers is None else workers
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    started = time.perf_counter()
+
+    def compile_one(pool: ProcessPoolExecutor, root: Path, excel_path: Path) -> Dict[str, Any]:
+        try:
+            with new_version(root, MANIFEST_NAME) as (version, gen_dir):
+                result = pool.submit(_compile_upload, excel_path, gen_dir, options).result()
+                publish_version(root, version)
+            result = {**result, "version": version}
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        result["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=workers) as threads:
+        return list(threads.map(lambda job: compile_one(pool, *job), jobs))
+
+def generate_robot_cases_from_excel(excel_path: Path, gen_dir: Path, arrow_strings: Optional[bool] = None,
+                                    mode: str = "case", group_size: int = 0, verbosity: Optional[str] = None):
+    """
+    Compile a workbook (see compile_workbook) and return the test case names in sheet order.
+    """
+    return compile_workbook(excel_path, gen_dir, arrow_strings, mode, group_size, verbosity)["tests"]
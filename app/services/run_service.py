@@ -1,11 +1,175 @@
 from pathlib import Path
-import subprocess, datetime, re, asyncio, os, sys
-from typing import Tuple, List, Dict, Any, AsyncGenerator
+import subprocess, datetime, re, asyncio, os, sys, json, math, statistics
+from typing import Tuple, List, Dict, Any, AsyncGenerator, Callable, Optional
 import xml.etree.ElementTree as ET
 import time
 from concurrent.futures import ThreadPoolExecutor
-import queue
+from contextlib import ExitStack
 import threading
+from app.services.compile_service import (MANIFEST_SUITE, MANIFEST_NAME, DUPLICATES_FILE, SHARDS_FILE, compile_workbook,
+                                          read_test_durations)
+from app.services.version_service import new_version, pin_generated, publish_version
+from app.core.config import (STORAGE_PATH, RATE_LIMIT_RPS, RATE_LIMIT_BURST, RATE_LIMIT_MIN_RPS,
+                             RATE_LIMIT_STEP, RATE_LIMIT_RETRIES, SESSION_POOL_SIZE, SESSION_KEEP_ALIVE, RUN_WORKERS)
+
+# Shared token-bucket state for TestForgeLibrary's rate limiter (one file per host)
+RATE_LIMIT_DIR = STORAGE_PATH / ".ratelimit"
+
+def robot_options(gen_dir: Path) -> List[str]:
+    """Extra robot options a generated directory needs (manifest suites load their cases via a pre-run modifier)."""
+    if (gen_dir / MANIFEST_SUITE).exists():
+        return ["--pythonpath", str(gen_dir), "--prerunmodifier", "TestForgeLibrary.ManifestLoader"]
+    return []
+
+def robot_env() -> Dict[str, str]:
+    """Environment for robot processes: rate limiter and session settings, and the limiter's shared state directory."""
+    return {
+        **os.environ,
+        "RATE_LIMIT_DIR": str(RATE_LIMIT_DIR),
+        "RATE_LIMIT_RPS": str(RATE_LIMIT_RPS),
+        "RATE_LIMIT_BURST": str(RATE_LIMIT_BURST),
+        "RATE_LIMIT_MIN_RPS": str(RATE_LIMIT_MIN_RPS),
+        "RATE_LIMIT_STEP": str(RATE_LIMIT_STEP),
+        "RATE_LIMIT_RETRIES": str(RATE_LIMIT_RETRIES),
+        "SESSION_POOL_SIZE": str(SESSION_POOL_SIZE),
+        "SESSION_KEEP_ALIVE": "true" if SESSION_KEEP_ALIVE else "false",
+    }
+
+def read_shards(gen_dir: Path) -> List[Dict[str, Any]]:
+    """Shards written by a compile with shards > 0 (see SHARDS_FILE), or [] if it was not sharded."""
+    try:
+        return json.loads((gen_dir / SHARDS_FILE).read_text(encoding="utf-8"))["shards"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+def shard_arguments(gen_dir: Path, shard: Dict[str, Any]) -> List[str]:
+    """
+    Robot arguments that run one shard: its files, plus --test filters when shards share
+    the manifest suite or the shard selects tests from a shared file (see plan_run_shards).
+    """
+    args = [str(gen_dir / name) for name in shard["files"]]
+    if shard["files"] == [MANIFEST_SUITE] or shard.get("select"):
+        args = [arg for name in shard["tests"] for arg in ("--test", name)] + args
+    return args
+
+def plan_run_shards(gen_dir: Path, workers: int) -> List[Dict[str, Any]]:
+    """
+    Shards for a parallel run, as {shard, files, tests} like the entries of SHARDS_FILE.
+
+    A compile with shards > 0 decides the shards (balanced by run time). Otherwise
+    the suite files are dealt round-robin to `workers` shards, and a single suite
+    file (manifest mode, or one shared suite) is split by test instead, with
+    "select" set so each shard runs only its own tests.
+    """
+    shards = read_shards(gen_dir)
+    if shards:
+        return shards
+    files = sorted(p.name for p in gen_dir.glob("*.robot"))
+    if len(files) == 1 and workers > 1:
+        try:
+            tests = list(json.loads((gen_dir.parent / MANIFEST_NAME).read_text(encoding="utf-8"))["tests"])
+        except (OSError, ValueError, KeyError):
+            tests = []
+        if len(tests) > 1:
+            return [{"shard": n, "files": files, "tests": tests[n - 1::workers], "select": True}
+                    for n in range(1, min(workers, len(tests)) + 1)]
+    return [{"shard": n, "files": files[n - 1::workers], "tests": []}
+            for n in range(1, min(workers, len(files)) + 1)] if files else []
+
+def default_run_workers(report_dir: Path) -> int:
+    """
+    Robot processes for a parallel run when none are asked for (RUN_WORKERS, else estimated).
+
+    Each process sends one request at a time, so keeping a host busy at
+    RATE_LIMIT_RPS takes about RATE_LIMIT_RPS x seconds-per-test processes
+    (median over recent runs, 1s without history); more would only wait for
+    the shared rate limiter. Capped at one per CPU.
+    """
+    cpus = os.cpu_count() or 1
+    if RUN_WORKERS > 0:
+        return RUN_WORKERS
+    if RATE_LIMIT_RPS <= 0:
+        return cpus
+    durations = list(read_test_durations(report_dir).values())
+    seconds = statistics.median(durations) if durations else 1.0
+    return max(1, min(cpus, math.ceil(RATE_LIMIT_RPS * seconds)))
+
+def _argument_file(path: Path, args: List[str]) -> Path:
+    """Write robot arguments to an argument file (one option or path per line), keeping long shard command lines short."""
+    lines, i = [], 0
+    while i < len(args):
+        if args[i].startswith("--"):
+            lines.append(f"{args[i]} {args[i + 1]}")
+            i += 2
+        else:
+            lines.append(args[i])
+            i += 1
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+def read_duplicates(gen_dir: Path) -> Dict[str, List[str]]:
+    """Tests dropped as duplicates at compile time, grouped by the test that runs for them ({} if none)."""
+    try:
+        dropped = json.loads((gen_dir / DUPLICATES_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    aliases: Dict[str, List[str]] = {}
+    for name, kept in dropped.items():
+        aliases.setdefault(kept, []).append(name)
+    return aliases
+
+def read_rate_stats(out_dir: Path) -> Dict[str, Any]:
+    """Per-host request rates written by TestForgeLibrary at the end of a run ({} if none)."""
+    try:
+        return json.loads((out_dir / "rate_limit.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def merge_rate_stats(out_dirs: List[Path], concurrent: bool = False) -> Dict[str, Any]:
+    """
+    Per-host request rates of several runs combined: counts summed, rates averaged by
+    request count, or summed for runs that were sending at the same time (concurrent).
+    The limiter's fields (throttled, waitedSeconds, finalRps) are kept only for hosts
+    some run limited, as in each run's summary.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for stats in map(read_rate_stats, out_dirs):
+        for host, part in stats.items():
+            m = merged.setdefault(host, {"limited": False, "requests": 0, "effectiveRps": None, "throttled": 0,
+                                         "waitedSeconds": 0.0, "finalRps": None, "_weighted": 0.0, "_weight": 0})
+            m["requests"] += part["requests"]
+            if part.get("limited", True):
+                m["limited"] = True
+                m["throttled"] += part["throttled"]
+                m["waitedSeconds"] = round(m["waitedSeconds"] + part["waitedSeconds"], 2)
+                m["finalRps"] = part["finalRps"]
+            if part["effectiveRps"] is not None:
+                m["_weighted"] += part["effectiveRps"] * part["requests"]
+                m["_weight"] += part["requests"]
+            if concurrent and part["effectiveRps"] is not None:
+                m["effectiveRps"] = round((m["effectiveRps"] or 0) + part["effectiveRps"], 2)
+    for m in merged.values():
+        weighted, weight = m.pop("_weighted"), m.pop("_weight")
+        if not concurrent:
+            m["effectiveRps"] = round(weighted / weight, 2) if weight else None
+        if not m["limited"]:
+            for key in ("throttled", "waitedSeconds", "finalRps"):
+                del m[key]
+    return merged
+
+def merge_outputs(out_dir: Path, part_dirs: List[Path]) -> None:
+    """
+    Combine the output.xml of several robot runs into output.xml, log.html and report.html in out_dir (rebot).
+
+    The top-level suite is named Generated, as in a run over the whole generated/ directory.
+    """
+    outputs = [str(d / "output.xml") for d in part_dirs if (d / "output.xml").is_file()]
+    if not outputs:
+        return
+    # rebot exits non-zero when tests failed; the merged files are written either way
+    subprocess.run(["rebot", "--name", "Generated", "--outputdir", str(out_dir), "--output", "output.xml", *outputs],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT, env=robot_env())
 
 def run_robot_and_get_report(gen_dir: Path, report_dir: Path) -> Tuple[Path, List[str], str]:
     """
@@ -18,8 +182,8 @@ def run_robot_and_get_report(gen_dir: Path, report_dir: Path) -> Tuple[Path, Lis
     out_dir = report_dir / ts
     out_dir.mkdir(parents=True, exist_ok=True)
     # Run Robot Framework on generated dir
-    cmd = ["robot", "--outputdir", str(out_dir), str(gen_dir)]
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    cmd = ["robot", *robot_options(gen_dir), "--outputdir", str(out_dir), str(gen_dir)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=robot_env())
     logs = []
     if proc.stdout:
         for line in proc.stdout:
@@ -28,28 +192,223 @@ def run_robot_and_get_report(gen_dir: Path, report_dir: Path) -> Tuple[Path, Lis
     return out_dir, logs, ts
 
 
-def _read_process_output(proc: subprocess.Popen, output_queue: queue.Queue):
+# Longest console line read whole; robot lines beyond this (huge logged bodies) are skipped
+STREAM_LINE_LIMIT = 1024 * 1024
+# Events a merged run stream holds for a slow client; beyond this, robot output waits in its pipe
+EVENT_QUEUE_SIZE = 256
+
+
+async def discard_queue(queue: asyncio.Queue):
+    """Empty a stream's queue for good, so producers blocked on it can finish after the client has gone."""
+    while True:
+        await queue.get()
+
+
+async def _drain(proc: asyncio.subprocess.Process, on_exit: Callable[[], None]):
+    """Read and discard the rest of a process's output so it can finish (its stream was abandoned), then call on_exit."""
+    try:
+        while await proc.stdout.read(65536):
+            pass
+        await proc.wait()
+    finally:
+        on_exit()
+
+
+async def _thread_lines(cmd: List[str], env: Dict[str, str], on_exit: Callable[[], None]) -> AsyncGenerator[bytes, None]:
+    """_process_lines for event loops without subprocess support: a thread reads and hands lines to the loop."""
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue()
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    except Exception:
+        on_exit()
+        raise
+
+    def read():
+        # Reads to the end even if the consumer has gone, so the process can finish
+        try:
+            for line in iter(proc.stdout.readline, b''):
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            proc.stdout.close()
+            proc.wait()
+        finally:
+            on_exit()
+        loop.call_soon_threadsafe(lines.put_nowait, None)
+
+    threading.Thread(target=read, daemon=True).start()
+    while True:
+        line = await lines.get()
+        if line is None:
+            return
+        yield line
+
+
+async def _process_lines(cmd: List[str], env: Dict[str, str],
+                         hold: Optional[Path] = None) -> AsyncGenerator[bytes, None]:
+    """
+    Run a command and yield its output lines (stdout and stderr) as they are written.
+
+    Lines come from asyncio's StreamReader, so nothing polls and no executor
+    thread is held for the run; a consumer that falls behind makes the process
+    wait on its pipe instead of lines piling up in memory. Event loops without
+    subprocess support (the selector loop on Windows) fall back to a reader
+    thread. If the consumer stops early, the rest of the output is drained in
+    the background so the process still finishes.
+
+    Args:
+        hold: generated/ directory the process reads; it stays pinned (see
+              pin_generated) until the process exits, even if the consumer stops first
     """
-    Read subprocess output in a separate thread and put lines in a queue.
-    This function runs in a background thread.
+    on_exit = pin_generated(hold) if hold is not None else (lambda: None)
+    try:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                                    env=env, limit=STREAM_LINE_LIMIT)
+    except NotImplementedError:
+        async for line in _thread_lines(cmd, env, on_exit):
+            yield line
+        return
+    except BaseException:
+        on_exit()
+        raise
+    try:
+        while True:
+            try:
+                line = await proc.stdout.readline()
+            except ValueError:
+                continue  # longer than STREAM_LINE_LIMIT; the reader has dropped it
+            if not line:
+                break
+            yield line
+        await proc.wait()
+    finally:
+        if proc.returncode is None:
+            asyncio.get_running_loop().create_task(_drain(proc, on_exit))
+        else:
+            on_exit()
+
+
+def _robot_command(gen_dir: Path, out_dir: Path, targets: Optional[List[str]] = None) -> List[str]:
+    """robot command line for a streamed run of targets (default: all of gen_dir) into out_dir."""
+    # --console verbose prints each test as it starts and ends, which the stream parses
+    return ["robot", "--console", "verbose", *robot_options(gen_dir), "--outputdir", str(out_dir),
+            *(targets or [str(gen_dir)])]
+
+
+async def _robot_events(cmd: List[str], gen_dir: Optional[Path] = None) -> AsyncGenerator[Dict[str, Any], None]:
     """
-    if proc.stdout:
-        for line in iter(proc.stdout.readline, b''):
-            output_queue.put(('line', line))
-    proc.stdout.close()
-    proc.wait()
-    output_queue.put(('done', proc.returncode))
+    Run one robot process and yield 'process', 'pass', 'fail' and 'skip' events as its console reports them.
+
+    gen_dir, the snapshot the process runs, stays pinned until the process exits.
+    """
+    env = {
+        **robot_env(),
+        "PYTHONUNBUFFERED": "1",
+        "PYTHONIOENCODING": "utf-8"  # Force UTF-8 encoding on all platforms
+    }
+
+    # Regex patterns for Robot Framework --console verbose output:
+    # 1. Test header line: "TC 001" or "Generated.TC 001"
+    # 2. Test result: "Generated.TC 077 | PASS |" or "Generated.TC 077 | FAIL | Error message"
+    # 3. Skip detection: "SKIP" keyword in result line
+    # 4. Test start inside a shared suite, followed by its console logs: "TC_001      ========== REQUEST =========="
+    # 5. Bare result after console logs: "| PASS |" (belongs to the test started in 4)
+    # Names are TC_### by row, or TC_<12 hex digits> with content IDs (see TEST_ID_MODES)
+    test_name = r"\w+[_\s](?:\d+|[0-9a-f]{12})"
+    test_header_pattern = re.compile(rf"^(?:Generated\.)?({test_name})\s*$")
+    test_result_pattern = re.compile(rf"^(?:Generated\.)?({test_name})\s+\|\s+(PASS|FAIL|SKIP)\s+\|(.*)$")
+    test_start_inline_pattern = re.compile(rf"^({test_name})\s{{2,}}\S")
+    bare_result_pattern = re.compile(r"^\|\s+(PASS|FAIL|SKIP)\s+\|(.*)$")
+
+    # A case can be announced twice (its one-test suite and the test itself), so report each once
+    started: set = set()
+    finished: set = set()
+    current_case = None
+
+    def _start_event(case_name: str):
+        return {
+            'type': 'process',
+            'data': {
+                'case': case_name,
+                'status': 'running',
+                'message': f'Running {case_name}'
+            }
+        }
+
+    async for raw in _process_lines(cmd, env, hold=gen_dir):
+        # Use errors='replace' to handle non-UTF-8 bytes gracefully
+        # On Windows, subprocess output may contain characters from different encodings
+        line = raw.decode('utf-8', errors='replace').rstrip()
+
+        # Check for test result first (has priority)
+        result_match = test_result_pattern.match(line)
+        bare_match = bare_result_pattern.match(line) if not result_match else None
+        if result_match or (bare_match and current_case):
+            if result_match:
+                # Normalize: "TC 089" → "TC_089"
+                case_name = result_match.group(1).strip().replace(' ', '_')
+                status = result_match.group(2).upper()  # 'PASS', 'FAIL', or 'SKIP'
+                console_message = result_match.group(3).strip()
+            else:
+                case_name = current_case
+                status = bare_match.group(1).upper()
+                console_message = bare_match.group(2).strip()
+            current_case = None
+            if case_name not in finished:
+                finished.add(case_name)
+                yield _result_event(case_name, status, console_message)
+            continue
+
+        # Check for test start (process state)
+        start_match = test_header_pattern.match(line) or test_start_inline_pattern.match(line)
+        if start_match:
+            # Normalize: "TC 089" → "TC_089"
+            case_name = start_match.group(1).strip().replace(' ', '_')
+            current_case = case_name
+            if case_name not in started:
+                started.add(case_name)
+                yield _start_event(case_name)
+
+
+def _result_event(case_name: str, status: str, console_message: str) -> Dict[str, Any]:
+    # Use console message directly during streaming
+    # Note: Don't try to parse output.xml here - it's incomplete while robot is running
+    message = console_message if console_message else f'Test {status.lower()}'
+    return {
+        'type': status.lower(),  # 'pass', 'fail', or 'skip'
+        'data': {
+            'case': case_name,
+            'status': status.lower(),
+            'message': message
+        }
+    }
+
+
+def _duplicate_event(result: Dict[str, Any], duplicate: str) -> Dict[str, Any]:
+    """The result event of a test, repeated for a row dropped as its duplicate (see DUPLICATES_FILE)."""
+    return {'type': result['type'], 'data': {**result['data'], 'case': duplicate, 'duplicate_of': result['data']['case']}}
+
+
+def _run_summary(out_dir: Path, rates: Dict[str, Any], duplicates: int) -> Dict[str, Any]:
+    """Final run summary: counts from output.xml, request rates, output.xml size and duplicate rows reported."""
+    output_xml_path = out_dir / "output.xml"
+    summary = parse_output_xml(output_xml_path)
+    summary['rates'] = rates
+    summary['output_xml_bytes'] = output_xml_path.stat().st_size if output_xml_path.exists() else 0
+    summary['duplicates'] = duplicates
+    return summary
 
 
 async def run_robot_streaming(gen_dir: Path, report_dir: Path) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Run Robot Framework tests with real-time streaming of test case results.
-    Cross-platform implementation using threading (works on Windows and Linux).
 
     Yields:
         Dict with keys:
             - 'type': 'connect' | 'process' | 'pass' | 'fail' | 'skip' | 'done'
             - 'data': {'case': str, 'status': str, 'message': str (optional)}
+
+    Tests dropped as duplicates at compile time (see DUPLICATES_FILE) get the
+    result of the test they map to, with 'duplicate_of' naming it.
     """
     ts = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     out_dir = report_dir / ts
@@ -61,116 +420,99 @@ async def run_robot_streaming(gen_dir: Path, report_dir: Path) -> AsyncGenerator
         'data': {'status': 'connected', 'message': 'Test execution started'}
     }
 
-    # Run Robot Framework with --console verbose for real-time output
-    # Use subprocess.Popen with threading for cross-platform compatibility
-    cmd = ["robot", "--console", "verbose", "--outputdir", str(out_dir), str(gen_dir)]
-    env = {
-        **os.environ,
-        "PYTHONUNBUFFERED": "1",
-        "PYTHONIOENCODING": "utf-8"  # Force UTF-8 encoding on all platforms
+    duplicates = read_duplicates(gen_dir)
+    async for event in _robot_events(_robot_command(gen_dir, out_dir), gen_dir):
+        yield event
+        if event['type'] != 'process':
+            for duplicate in duplicates.get(event['data']['case'], ()):
+                yield _duplicate_event(event, duplicate)
+    
+    # Parse output.xml for final summary
+    summary = _run_summary(out_dir, read_rate_stats(out_dir), sum(len(names) for names in duplicates.values()))
+    yield {
+        'type': 'done',
+        'data': {
+            'status': 'completed',
+            'summary': summary,
+            'timestamp': ts,
+            'message': f"Completed: {summary['passed']} passed, {summary['failed']} failed, {summary['skipped']} skipped"
+        }
     }
 
-    # Start subprocess
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        env=env,
-        bufsize=1  # Line buffered
-    )
-
-    # Create queue for communication between threads
-    output_queue: queue.Queue = queue.Queue()
-
-    # Start reader thread
-    reader_thread = threading.Thread(
-        target=_read_process_output,
-        args=(proc, output_queue),
-        daemon=True
-    )
-    reader_thread.start()
-    
-    # Regex patterns for Robot Framework --console verbose output:
-    # 1. Test header line: "TC 001" or "Generated.TC 001"
-    # 2. Test result: "Generated.TC 077 | PASS |" or "Generated.TC 077 | FAIL | Error message"
-    # 3. Skip detection: "SKIP" keyword in result line
-    test_header_pattern = re.compile(r"^(?:Generated\.)?(\w+[_\s]\d+)\s*$")
-    test_result_pattern = re.compile(r"^(?:Generated\.)?(\w+[_\s]\d+)\s+\|\s+(PASS|FAIL|SKIP)\s+\|(.*)$")
 
-    output_xml_path = out_dir / "output.xml"
+async def run_robot_parallel_streaming(gen_dir: Path, report_dir: Path,
+                                       workers: Optional[int] = None) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Run the tests in parallel robot processes, one per shard (see plan_run_shards), streaming their results as one run.
+
+    Each shard writes to shard_### under the run's timestamp directory; when all
+    have finished, rebot merges them into one output.xml, log.html and
+    report.html there, as a serial run would have written. All processes share
+    the per-host rate limiter.
+
+    Args:
+        workers: Processes at once (None or 0 = default_run_workers)
+
+    Yields:
+        Dicts with 'type' and 'data' as run_robot_streaming ('connect' also gives
+        workers and shards, test events carry their 'shard'), plus 'shard'
+        ({shard, status: 'finished'}) as each process ends
+    """
+    ts = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    out_dir = report_dir / ts
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    workers = workers or default_run_workers(report_dir)
+    shards = plan_run_shards(gen_dir, workers)
+    duplicates = read_duplicates(gen_dir)
+    yield {
+        'type': 'connect',
+        'data': {'status': 'connected', 'message': 'Test execution started',
+                 'workers': min(workers, len(shards)), 'shards': len(shards)}
+    }
 
-    # Read output from queue
-    process_running = True
-    while process_running:
+    # Bounded, so a slow client holds back the robot processes instead of events piling up;
+    # each shard ends with None, also when its robot could not be started
+    events: asyncio.Queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+    slots = asyncio.Semaphore(workers)
+    shard_dirs = [out_dir / f"shard_{shard['shard']:03d}" for shard in shards]
+    closed = False  # the client has gone; nothing more is queued
+
+    async def run_shard(shard: Dict[str, Any], shard_dir: Path):
         try:
-            # Get item from queue with timeout
-            item = await asyncio.get_event_loop().run_in_executor(
-                None,
-                output_queue.get,
-                True,  # block
-                0.1    # timeout
-            )
-
-            msg_type, data = item
-
-            if msg_type == 'done':
-                # Process finished
-                process_running = False
-                break
-            elif msg_type == 'line':
-                # Use errors='replace' to handle non-UTF-8 bytes gracefully
-                # On Windows, subprocess output may contain characters from different encodings
-                line = data.decode('utf-8', errors='replace').rstrip()
-
-                # Check for test result first (has priority)
-                result_match = test_result_pattern.match(line)
-                if result_match:
-                    case_name_raw = result_match.group(1).strip()
-                    # Normalize: "TC 089" → "TC_089"
-                    case_name = case_name_raw.replace(' ', '_')
-                    status = result_match.group(2).upper()  # 'PASS', 'FAIL', or 'SKIP'
-                    console_message = result_match.group(3).strip() if len(result_match.groups()) > 2 else ''
-
-                    # Map to event type
-                    event_type = status.lower()  # 'pass', 'fail', or 'skip'
-
-                    # Use console message directly during streaming
-                    # Note: Don't try to parse output.xml here - it's incomplete while robot is running
-                    message = console_message if console_message else f'Test {status.lower()}'
-
-                    yield {
-                        'type': event_type,
-                        'data': {
-                            'case': case_name,
-                            'status': status.lower(),
-                            'message': message
-                        }
-                    }
-                    continue
-
-                # Check for test start (process state)
-                start_match = test_header_pattern.match(line)
-                if start_match:
-                    case_name_raw = start_match.group(1).strip()
-                    # Normalize: "TC 089" → "TC_089"
-                    case_name = case_name_raw.replace(' ', '_')
-
-                    yield {
-                        'type': 'process',
-                        'data': {
-                            'case': case_name,
-                            'status': 'running',
-                            'message': f'Running {case_name}'
-                        }
-                    }
-        except queue.Empty:
-            # No data available, continue loop
-            # This allows other async tasks to run
-            await asyncio.sleep(0.01)
-            continue
-    
-    # Parse output.xml for final summary
-    summary = parse_output_xml(out_dir / "output.xml")
+            async with slots:
+                args = shard_arguments(gen_dir, shard)
+                cmd = _robot_command(gen_dir, shard_dir, ["--argumentfile", str(_argument_file(shard_dir / "arguments.txt", args))])
+                async for event in _robot_events(cmd, gen_dir):
+                    event['data']['shard'] = shard['shard']
+                    await events.put(event)
+                await events.put({'type': 'shard', 'data': {'shard': shard['shard'], 'status': 'finished'}})
+        finally:
+            if not closed:
+                await events.put(None)
+
+    runners = asyncio.gather(*(run_shard(shard, shard_dir) for shard, shard_dir in zip(shards, shard_dirs)))
+    try:
+        running = len(shards)
+        while running:
+            event = await events.get()
+            if event is None:
+                running -= 1
+                continue
+            yield event
+            if event['type'] in ('pass', 'fail', 'skip'):
+                for duplicate in duplicates.get(event['data']['case'], ()):
+                    yield _duplicate_event(event, duplicate)
+        await runners  # re-raise if robot could not be started
+    finally:
+        closed = True
+        runners.cancel()  # client went away
+        # Collect the outcome, so a cancelled or failed gather is not logged as never retrieved
+        runners.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    await asyncio.get_running_loop().run_in_executor(None, merge_outputs, out_dir, shard_dirs)
+    summary = _run_summary(out_dir, merge_rate_stats(shard_dirs, concurrent=True),
+                           sum(len(names) for names in duplicates.values()))
     yield {
         'type': 'done',
         'data': {
@@ -182,6 +524,154 @@ async def run_robot_streaming(gen_dir: Path, report_dir: Path) -> AsyncGenerator
     }
 
 
+async def compile_and_run_streaming(root: Path, excel_path: Path, report_dir: Path,
+                                    **options) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Compile a workbook into a new version and run its suites while later rows are still compiling.
+
+    The compile hands over suite files in sheet order (see compile_workbook's
+    ready). Whenever robot is idle, everything handed over so far runs in one
+    robot process, into part_### under the run's timestamp directory. Once all
+    parts have run, rebot merges them into one output.xml, log.html and
+    report.html there. The version becomes current when the compile finishes
+    and stays pinned until the last part has run.
+
+    Args:
+        root: Workspace
+        excel_path: Stored workbook
+        options: compile_workbook's keyword arguments (not shards, not "manifest" mode)
+
+    Yields:
+        Dicts with 'type' and 'data': 'connect' ({version}); the compile's 'progress'
+        and 'row_error'; 'compiled' (compile_workbook's result, with counts of cases and
+        duplicates instead of names) or
+        'error' if the compile fails; 'batch' ({batch, files, tests}) as each robot
+        process starts; 'process', 'pass', 'fail' and 'skip' as in run_robot_streaming;
+        then 'done' with the merged summary and timestamp
+    """
+    ts = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    out_dir = report_dir / ts
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    loop = asyncio.get_running_loop()
+    # Bounded, so a slow client holds back robot (and the compile) instead of events piling up; None ends it
+    events: asyncio.Queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+    batches: asyncio.Queue = asyncio.Queue()
+    closed = threading.Event()  # the client has gone; nothing more is queued
+    compiled = {'ok': False}
+
+    def emit(event: Dict[str, Any]):
+        # Called from the compile thread; waits while the queue is full
+        if not closed.is_set():
+            asyncio.run_coroutine_threadsafe(events.put(event), loop).result()
+
+    def on_progress(event: str, data: Dict[str, Any]):
+        emit({'type': event, 'data': data})
+
+    def on_ready(batch: Dict[str, Any]):
+        loop.call_soon_threadsafe(batches.put_nowait, batch)
+
+    part_dirs: List[Path] = []
+    results: Dict[str, Dict[str, Any]] = {}  # result event of each finished test
+    waiting: Dict[str, List[str]] = {}       # duplicates of tests that have not finished yet
+    reported_duplicates = 0
+
+    async def run_batches(gen_dir: Path):
+        nonlocal reported_duplicates
+        finished = False
+        while not finished:
+            batch = await batches.get()
+            if batch is None:
+                return
+            # Take everything handed over meanwhile, so each robot start covers as many suites as possible
+            files, tests, duplicates = list(batch['files']), list(batch['tests']), dict(batch['duplicates'])
+            while not batches.empty():
+                more = batches.get_nowait()
+                if more is None:
+                    finished = True
+                    break
+                files += more['files']
+                tests += more['tests']
+                duplicates.update(more['duplicates'])
+            for duplicate, kept in duplicates.items():
+                if kept in results:
+                    reported_duplicates += 1
+                    await events.put(_duplicate_event(results[kept], duplicate))
+                else:
+                    waiting.setdefault(kept, []).append(duplicate)
+            if not files:
+                continue
+            part_dir = out_dir / f"part_{len(part_dirs) + 1:03d}"
+            part_dirs.append(part_dir)
+            await events.put({'type': 'batch', 'data': {'batch': len(part_dirs), 'files': len(files), 'tests': len(tests)}})
+            async for event in _robot_events(_robot_command(gen_dir, part_dir, [str(gen_dir / f) for f in files]), gen_dir):
+                await events.put(event)
+                if event['type'] != 'process':
+                    results[event['data']['case']] = event
+                    for duplicate in waiting.pop(event['data']['case'], ()):
+                        reported_duplicates += 1
+                        await events.put(_duplicate_event(event, duplicate))
+
+    async def run_and_end(gen_dir: Path):
+        try:
+            await run_batches(gen_dir)
+        finally:
+            if not closed.is_set():
+                await events.put(None)
+
+    with ExitStack() as stack:
+        version, gen_dir = stack.enter_context(new_version(root, MANIFEST_NAME))
+
+        def compile_and_publish():
+            try:
+                result = compile_workbook(excel_path, gen_dir, progress=on_progress, ready=on_ready, **options)
+                publish_version(root, version)
+                compiled['ok'] = True
+                emit({'type': 'compiled', 'data': {**{k: v for k, v in result.items() if k != 'tests'},
+                                                  'cases': len(result['tests']),
+                                                  'duplicates': len(result['duplicates'])}})
+            except Exception as e:
+                emit({'type': 'error', 'data': {'status': 'error', 'message': f"compile error: {e}"}})
+            finally:
+                loop.call_soon_threadsafe(batches.put_nowait, None)  # after the last hand-over
+
+        compile_task = loop.run_in_executor(None, compile_and_publish)
+        runner = asyncio.create_task(run_and_end(gen_dir))
+        try:
+            yield {'type': 'connect', 'data': {'status': 'connected', 'message': 'Compiling and running', 'version': version}}
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            await runner  # re-raise if robot could not be started
+
+            await loop.run_in_executor(None, merge_outputs, out_dir, part_dirs)
+            summary = _run_summary(out_dir, merge_rate_stats(part_dirs), reported_duplicates)
+            yield {
+                'type': 'done',
+                'data': {
+                    'status': 'completed' if compiled['ok'] else 'failed',
+                    'summary': summary,
+                    'timestamp': ts,
+                    'message': f"Completed: {summary['passed']} passed, {summary['failed']} failed, {summary['skipped']} skipped"
+                }
+            }
+        finally:
+            closed.set()
+            runner.cancel()  # client went away
+            if not compile_task.done():
+                # Let a compile blocked on the full queue finish, and keep the version
+                # pinned until the compile thread is done with it
+                drain = asyncio.ensure_future(discard_queue(events))
+                pending = stack.pop_all()
+
+                def compile_done(_):
+                    drain.cancel()
+                    pending.close()
+                compile_task.add_done_callback(compile_done)
+
+
 def parse_output_xml(xml_path: Path) -> Dict[str, int]:
     """
     Parse Robot Framework output.xml to extract test statistics.
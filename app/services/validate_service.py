@@ -0,0 +1,303 @@
+"""
+Pre-run validation of a compiled workspace.
+
+Two checks, both much cheaper than a real run:
+    - a static lint of the source workbook (rawData.xlsx) for operators,
+      [Type:] tags and cell values the compiler would silently misread
+    - `robot --dryrun` over generated/, sharded across processes, which catches
+      syntax, escaping and keyword/argument errors without sending requests
+"""
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Optional
+import asyncio, datetime, math, os, re, secrets, shutil, subprocess, threading, time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import COMPILE_BATCH_ROWS
+from app.core.utils_io import iter_sheet_batches, normalize_cell
+from app.services.compile_service import (ASSERTION_OPERATORS, TYPE_TAG_PATTERN, read_compile_settings, sheet_base_url,
+                                          case_namer)
+from app.services.run_service import EVENT_QUEUE_SIZE, discard_queue, robot_options, robot_env
+from app.services.version_service import pin_generated
+
+# [Type:] tags understood by cast_value, and the cell values it reads as booleans
+KNOWN_TYPES = ("int", "integer", "float", "double", "number", "bool", "boolean", "string")
+BOOL_VALUES = ("1", "0", "true", "false", "yes", "no", "y", "n", "t", "f")
+
+# Columns whose names carry [Type:] tags and, for responses, operators
+TYPED_PREFIXES = ("[Request][Body]", "[Response][Body]", "[Response][Header]")
+ASSERTION_PREFIXES = ("[Response][Body]", "[Response][Header]")
+
+# Generated files per dry-run shard; shards outnumber processes so results arrive as shards finish
+DRYRUN_SHARD_FILES = 200
+
+def _column_meta(column: str):
+    """
+    Parse a workbook column like parse_field_meta, without its silent fallbacks.
+
+    Returns:
+        (op, dtype, errors) where op is the operator as written (None when absent)
+    """
+    errors = []
+    field = column
+    for prefix in TYPED_PREFIXES:
+        if column.startswith(prefix):
+            field = column[len(prefix):]
+    type_match = TYPE_TAG_PATTERN.search(field)
+    dtype = type_match.group(1).strip().lower() if type_match else None
+    core = TYPE_TAG_PATTERN.sub("", field).strip()
+    if dtype is not None and dtype not in KNOWN_TYPES:
+        errors.append(f"unknown type '{dtype}' (use one of: {', '.join(KNOWN_TYPES)})")
+    if re.search(r"\[type\b", core, flags=re.IGNORECASE):
+        errors.append("malformed [Type:] tag (write it as [Type:<type>] at the end of the column name)")
+    op = None
+    if column.startswith(ASSERTION_PREFIXES) and ":" in core:
+        op = core.rsplit(":", 1)[1].strip().lower()
+        if op not in ASSERTION_OPERATORS:
+            errors.append(f"unknown operator '{op}' (it would be compared with eq); "
+                          f"use one of: {', '.join(ASSERTION_OPERATORS)}")
+    return op, dtype, errors
+
+def _int_error(value: Any) -> Optional[str]:
+    """Why a cell checked as [Type:int] is not a whole number, or None (cast_value would cut 5.5 to 5)."""
+    try:
+        number = float(value)
+    except ValueError:
+        return f"'{value}' is not an int"
+    if number.is_integer():
+        return None
+    if math.isfinite(number):
+        return f"'{value}' is not an int (it would be compared as {int(number)})"
+    return f"'{value}' is not an int"
+
+def _value_error(value: Any, op: Optional[str], dtype: Optional[str]) -> Optional[str]:
+    """Why a normalized response-check cell would not compile to the intended check, or None."""
+    if op == "between":
+        bounds = [b.strip() for b in re.split(r"[,;:]", str(value)) if b.strip()]
+        if len(bounds) != 2:
+            return f"between needs two bounds like 'low,high', got '{value}'"
+        for bound in bounds:
+            try:
+                float(bound)
+            except ValueError:
+                return f"between bound '{bound}' is not a number"
+        return None
+    if op in ("gt", "lt"):
+        try:
+            float(value)
+        except ValueError:
+            return f"{op} needs a number, got '{value}'"
+        return _int_error(value) if dtype in ("int", "integer") else None
+    if op == "regex":
+        try:
+            re.compile(str(value))
+        except re.error as e:
+            return f"invalid regex '{value}': {e}"
+        return None
+    if op is None or op in ("eq", "ne"):
+        if dtype in ("int", "integer"):
+            return _int_error(value)
+        if dtype in ("float", "double", "number"):
+            try:
+                float(value)
+            except ValueError:
+                return f"'{value}' is not a number"
+        elif dtype in ("bool", "boolean") and str(value).strip().lower() not in BOOL_VALUES:
+            return f"'{value}' is not a boolean (it would be read as false)"
+    return None
+
+def lint_workbook(excel_path: Path, test_ids: str = "row", all_sheets: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Statically check a workbook for problems the compiler would not report.
+
+    Reads the sheets the way a streamed compile does (see iter_sheet_batches):
+    every sheet with an [API]endpoint column, rows numbered on across sheets,
+    or only the first sheet when all_sheets is False. Each new header's column
+    issues ({"case": None, "row": None, "column", "error"}) come before the cell
+    issues of its rows ({"case", "row", "column", "error"}), where case is the
+    name compile gives the row's test under test_ids (see TEST_ID_MODES).
+    Array ("[]") columns take comma-separated values, so only their names are checked.
+    """
+    headers: Dict[tuple, tuple] = {}  # header -> (checked columns, test namer)
+    reported = set()
+    first_title = base_url = None
+    for title, df in iter_sheet_batches(excel_path, COMPILE_BATCH_ROWS):
+        if first_title is None:
+            first_title, base_url = title, sheet_base_url(df)
+        elif title != first_title and not all_sheets:
+            return
+        columns = tuple(df.columns)
+        if columns not in headers:
+            if "[API]endpoint" not in columns and "[API]endpoint" not in reported:
+                reported.add("[API]endpoint")
+                yield {"case": None, "row": None, "column": "[API]endpoint", "error": "missing [API]endpoint column"}
+            checked = []
+            for pos, column in enumerate(columns):
+                if not column.startswith(TYPED_PREFIXES):
+                    continue
+                op, dtype, errors = _column_meta(column)
+                if column not in reported:
+                    reported.add(column)
+                    for error in errors:
+                        yield {"case": None, "row": None, "column": column, "error": error}
+                if column.startswith(ASSERTION_PREFIXES) and "[]" not in column and (op or dtype):
+                    checked.append((pos, column, op, dtype))
+            headers[columns] = (checked, case_namer(columns, base_url, test_ids))
+
+        checked, namer = headers[columns]
+        if not checked:
+            continue
+        for i, values in zip(df.index, df.itertuples(index=False, name=None)):
+            case_name = None
+            for pos, column, op, dtype in checked:
+                value = normalize_cell(values[pos]) if values[pos] else None
+                if value is None or value == "" or isinstance(value, (list, dict)):
+                    continue  # blank cells and [NULL]/[EMPTY_*] sentinels
+                error = _value_error(value, op, dtype)
+                if not error:
+                    continue
+                if case_name is None:
+                    case_name = namer(int(i), values)
+                yield {"case": case_name, "row": int(i) + 1, "column": column, "error": error}
+
+def _dryrun_shard(gen_dir: Path, files: List[Path], out_dir: Path, index: int) -> Dict[str, Any]:
+    """Run `robot --dryrun` on one shard of generated files and collect its failures."""
+    name = f"shard_{index:03d}"
+    # Data sources go in an argument file: a shard of case files is too long for a Windows command line
+    argfile = out_dir / f"{name}.args"
+    argfile.write_text("\n".join(str(f) for f in files), encoding="utf-8")
+    output = out_dir / f"{name}.xml"
+    # --runemptysuite: a file that fails to parse has no tests, which would otherwise abort the whole shard
+    cmd = ["robot", "--dryrun", "--runemptysuite", *robot_options(gen_dir), "--name", name, "--output", str(output),
+           "--log", "NONE", "--report", "NONE", "--console", "quiet", "--argumentfile", str(argfile)]
+    # Pinned until robot exits, even if the validation stream is closed first
+    release = pin_generated(gen_dir)
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=robot_env())
+    finally:
+        release()
+    result: Dict[str, Any] = {"shard": index, "files": len(files), "tests": 0, "failed": [], "errors": []}
+    try:
+        root = ET.parse(output).getroot()
+    except (OSError, ET.ParseError):
+        text = proc.stdout.decode("utf-8", errors="replace").strip()
+        result["errors"].append(text or f"robot exited with code {proc.returncode}")
+        return result
+    for test in root.iter("test"):
+        result["tests"] += 1
+        status = test.find("status")
+        if status is not None and status.get("status") == "FAIL":
+            result["failed"].append({"case": test.get("name", "").replace(" ", "_"),
+                                     "message": (status.text or "").strip()})
+    for msg in root.findall("errors/msg"):
+        if msg.get("level") == "ERROR":
+            result["errors"].append((msg.text or "").strip())
+    return result
+
+def dryrun_shards(gen_dir: Path, workers: int) -> List[List[Path]]:
+    """Split the generated suites into shards of at most DRYRUN_SHARD_FILES files, at least one per worker."""
+    files = sorted(gen_dir.glob("*.robot"))
+    if not files:
+        return []
+    size = max(1, min(DRYRUN_SHARD_FILES, math.ceil(len(files) / workers)))
+    return [files[i:i + size] for i in range(0, len(files), size)]
+
+def _remove_after(pool: ThreadPoolExecutor, out_dir: Path) -> None:
+    """Delete a validation's dry-run outputs once the shards still running in pool have finished."""
+    pool.shutdown(wait=True)
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+async def _lint_streaming(raw_path: Path, settings: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Run lint_workbook in a worker thread and yield its issues as they are found.
+
+    The queue between them is bounded, so a slow client holds back the lint
+    instead of issues piling up; if the consumer stops early, the lint stops
+    at its next issue.
+    """
+    loop = asyncio.get_running_loop()
+    issues: asyncio.Queue = asyncio.Queue(EVENT_QUEUE_SIZE)  # None ends it
+    closed = threading.Event()  # the consumer has gone; nothing more is queued
+
+    def lint() -> None:
+        try:
+            for issue in lint_workbook(raw_path, settings["test_ids"], all_sheets=settings["stream"]):
+                if closed.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(issues.put(issue), loop).result()
+        finally:
+            if not closed.is_set():
+                asyncio.run_coroutine_threadsafe(issues.put(None), loop).result()
+
+    task = loop.run_in_executor(None, lint)
+    try:
+        while True:
+            issue = await issues.get()
+            if issue is None:
+                break
+            yield issue
+        await task  # re-raises a lint that failed
+    finally:
+        closed.set()
+        if not task.done():
+            # Unblock a lint waiting on the full queue so it can see it was closed
+            drain = asyncio.ensure_future(discard_queue(issues))
+            task.add_done_callback(lambda _: drain.cancel())
+
+async def validate_streaming(root: Path, gen_dir: Path) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Lint the workspace's workbook, then dry-run its generated suites, yielding results as they come.
+
+    Yields {'type', 'data'} events like run_robot_streaming:
+        - lint: one workbook issue (see lint_workbook)
+        - shard: a dry-run shard finished ({shard, files, tests, failed})
+        - fail: a test that failed the dry run ({case, message})
+        - error: a file robot could not parse, or a shard that did not run ({shard, message})
+        - done: {valid, lint_issues, tests, failed, errors, shards, seconds}
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    raw_path = root / "rawData.xlsx"
+
+    lint_issues = 0
+    if raw_path.exists():
+        async for issue in _lint_streaming(raw_path, read_compile_settings(gen_dir)):
+            lint_issues += 1
+            yield {"type": "lint", "data": issue}
+
+    # A directory per validation, so concurrent validations of one workspace keep their own shard outputs
+    out_dir = root / "dryrun" / f"{datetime.datetime.now():%Y-%m-%d_%H-%M-%S}_{secrets.token_hex(3)}"
+    out_dir.mkdir(parents=True)
+    workers = max(1, os.cpu_count() or 1)
+    shards = dryrun_shards(gen_dir, workers)
+    totals = {"tests": 0, "failed": 0, "errors": 0}
+    # Not a with block: its exit would wait on the event loop for every queued shard if the client goes early
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = [loop.run_in_executor(pool, _dryrun_shard, gen_dir, files, out_dir, n)
+               for n, files in enumerate(shards, start=1)]
+    try:
+        for future in asyncio.as_completed(futures):
+            result = await future
+            totals["tests"] += result["tests"]
+            totals["failed"] += len(result["failed"])
+            totals["errors"] += len(result["errors"])
+            for message in result["errors"]:
+                yield {"type": "error", "data": {"shard": result["shard"], "message": message}}
+            for failure in result["failed"]:
+                yield {"type": "fail", "data": failure}
+            yield {"type": "shard", "data": {"shard": result["shard"], "files": result["files"],
+                                             "tests": result["tests"], "failed": len(result["failed"])}}
+    finally:
+        # Shards not started are dropped; running ones finish in the background before their outputs go
+        pool.shutdown(wait=False, cancel_futures=True)
+        if all(f.done() for f in futures):
+            shutil.rmtree(out_dir, ignore_errors=True)
+        else:
+            threading.Thread(target=_remove_after, args=(pool, out_dir), daemon=True).start()
+
+    yield {"type": "done", "data": {
+        "valid": lint_issues == 0 and totals["failed"] == 0 and totals["errors"] == 0,
+        "lint_issues": lint_issues,
+        **totals,
+        "shards": len(shards),
+        "seconds": round(time.perf_counter() - started, 2),
+    }}
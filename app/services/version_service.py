@@ -0,0 +1,283 @@
+"""
+Versioned compile output, so a recompile never touches files a running robot is reading.
+
+Each compile writes a new snapshot, workspace/{testName}/versions/<version>/, holding
+generated/ and that compile's compile_manifest.json. versions/current names the
+snapshot new runs use and is replaced atomically once a compile finishes. Runs
+pin the snapshot they start with; snapshots that are neither current nor pinned
+are deleted. Workspaces compiled before versioning keep using
+workspace/{testName}/generated until their next compile.
+
+Pins are marker files next to the generated/ directory they hold (<version>/.pins/<pid>-<token>),
+so every server worker process sees them. The pinning process keeps a lock on its
+marker until it releases the pin; the OS drops that lock when a process exits,
+so pins of crashed processes are ignored even once their pid is reused.
+Pinning, publishing and collecting take a lock file in the workspace, so a
+snapshot cannot be collected between reading the current pointer and pinning it.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Set, Tuple
+import datetime, logging, os, secrets, shutil, threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "current"
+PINS_DIR = ".pins"
+LOCK_FILE = ".versions.lock"
+
+logger = logging.getLogger(__name__)
+
+# Threads of this process take this before the workspace lock file
+_lock = threading.Lock()
+
+# Pin markers of this process and their open, locked files (changed with the workspace locked)
+_held: Dict[Path, BinaryIO] = {}
+
+# Workspaces waiting for the collector thread, and that thread while it runs
+_collect_lock = threading.Lock()
+_collect_roots: Set[Path] = set()
+_collector: Optional[threading.Thread] = None
+
+def _lock_file(fh: BinaryIO, blocking: bool = True) -> bool:
+    """Lock an open file exclusively; without blocking, False when another holder has it."""
+    try:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+def _unlock_file(fh: BinaryIO) -> None:
+    """Release _lock_file's lock (closing the file releases it too, except on Windows)."""
+    if not fcntl:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def _locked(root: Path) -> Iterator[None]:
+    """Hold the workspace's version lock, across threads and processes."""
+    with _lock:
+        root.mkdir(parents=True, exist_ok=True)
+        with open(root / LOCK_FILE, "a+b") as fh:
+            _lock_file(fh)
+            try:
+                yield
+            finally:
+                _unlock_file(fh)
+
+def workspace_root(gen_dir: Path) -> Path:
+    """Workspace of a generated/ directory, versioned (versions/<version>/generated) or not."""
+    if gen_dir.parent.parent.name == VERSIONS_DIR:
+        return gen_dir.parent.parent.parent
+    return gen_dir.parent
+
+def current_version(root: Path) -> Optional[str]:
+    """Version new runs use, or None if the workspace has not been compiled with versioning."""
+    try:
+        return (root / VERSIONS_DIR / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+def version_dir(root: Path, version: Optional[str]) -> Path:
+    """generated/ of a version; None is the unversioned workspace/{testName}/generated."""
+    if version is None:
+        return root / "generated"
+    return root / VERSIONS_DIR / version / "generated"
+
+def current_generated(root: Path) -> Path:
+    return version_dir(root, current_version(root))
+
+def _link_tree(src: Path, dst: Path) -> None:
+    """Hard-link (or copy, across filesystems) every file under src into dst."""
+    for p in src.rglob("*"):
+        if not p.is_file() or "__pycache__" in p.parts:
+            continue
+        target = dst / p.relative_to(src)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(p, target)
+        except OSError:
+            shutil.copy2(p, target)
+
+def _pin(gen: Path) -> Path:
+    """Add a pin marker for gen and lock it (call with the workspace locked); returns the marker."""
+    pins = gen.parent / PINS_DIR
+    pins.mkdir(parents=True, exist_ok=True)
+    marker = pins / f"{os.getpid()}-{secrets.token_hex(4)}"
+    fh = open(marker, "a+b")
+    try:
+        _lock_file(fh)
+    except BaseException:
+        fh.close()
+        marker.unlink(missing_ok=True)
+        raise
+    _held[marker] = fh
+    return marker
+
+def _release(root: Path, marker: Path) -> None:
+    """Drop a pin, then have the collector delete what is no longer used (a large tree takes a while)."""
+    with _locked(root):
+        fh = _held.pop(marker, None)
+        if fh is not None:
+            _unlock_file(fh)
+            fh.close()
+        marker.unlink(missing_ok=True)
+    _schedule_collect(root)
+
+def _schedule_collect(root: Path) -> None:
+    """Queue a workspace for collect_versions on the one collector thread, starting it if needed."""
+    global _collector
+    with _collect_lock:
+        _collect_roots.add(root)
+        if _collector is None:
+            _collector = threading.Thread(target=_collect_pending, name="version-collector", daemon=True)
+            _collector.start()
+
+def _collect_pending() -> None:
+    """Collector thread: collect queued workspaces until none are left (releases meanwhile queue theirs once)."""
+    global _collector
+    while True:
+        with _collect_lock:
+            if not _collect_roots:
+                _collector = None
+                return
+            root = _collect_roots.pop()
+        try:
+            collect_versions(root)
+        except Exception:
+            logger.exception("Collecting unused versions of %s failed", root)
+
+def _pinned(parent: Path) -> bool:
+    """Whether the generated/ directory in parent is pinned by a live process; stale markers are removed."""
+    pins = parent / PINS_DIR
+    if not pins.is_dir():
+        return False
+    pinned = False
+    for marker in pins.iterdir():
+        if marker in _held:
+            pinned = True
+            continue
+        try:
+            fh = open(marker, "r+b")
+        except FileNotFoundError:
+            continue
+        except OSError:
+            pinned = True  # cannot tell; keep the version
+            continue
+        with fh:
+            if not _lock_file(fh, blocking=False):
+                pinned = True  # its process still holds it
+                continue
+            _unlock_file(fh)
+        marker.unlink(missing_ok=True)  # the process that locked it has exited
+    return pinned
+
+def pin_generated(gen: Path) -> Callable[[], None]:
+    """
+    Pin a generated/ directory that is already pinned, for something that may outlive that pin.
+
+    Robot processes use this: a run stream's pin ends when its client goes
+    away, but the process keeps reading the snapshot (payload files are loaded
+    lazily) until it exits.
+
+    Returns:
+        release(), which drops the pin; calling it again does nothing
+    """
+    root = workspace_root(gen)
+    with _locked(root):
+        marker = _pin(gen)
+    released = threading.Event()
+
+    def release() -> None:
+        if not released.is_set():
+            released.set()
+            _release(root, marker)
+    return release
+
+@contextmanager
+def new_version(root: Path, manifest_name: str) -> Iterator[Tuple[str, Path]]:
+    """
+    Create the next version of a workspace and yield (version, its generated/ directory).
+
+    The new generated/ and manifest start as hard links to the current version's,
+    so an incremental compile only rewrites what changed; compile writers unlink
+    before writing, which leaves the linked files of older versions intact. The
+    version is pinned while the block runs and only becomes current through
+    publish_version; an unpublished version is collected on exit.
+    """
+    version = f"{datetime.datetime.now():%Y-%m-%d_%H-%M-%S}_{secrets.token_hex(3)}"
+    gen = version_dir(root, version)
+    with _locked(root):
+        source = current_generated(root)
+        marker = _pin(gen)
+    try:
+        gen.mkdir()
+        if source.is_dir():
+            _link_tree(source, gen)
+            if (source.parent / manifest_name).is_file():
+                shutil.copy2(source.parent / manifest_name, gen.parent / manifest_name)
+        yield version, gen
+    finally:
+        _release(root, marker)
+
+def publish_version(root: Path, version: str) -> None:
+    """Make version the one new runs use (atomic replace of versions/current)."""
+    pointer = root / VERSIONS_DIR / CURRENT_FILE
+    tmp = pointer.with_name(f"{CURRENT_FILE}.{version}.tmp")
+    tmp.write_text(version, encoding="utf-8")
+    with _locked(root):
+        os.replace(tmp, pointer)
+
+@contextmanager
+def pin_current(root: Path) -> Iterator[Tuple[Optional[str], Path]]:
+    """Pin the current version for the length of a run; yields (version, generated/ directory)."""
+    with _locked(root):
+        version = current_version(root)
+        gen = version_dir(root, version)
+        marker = _pin(gen)
+    try:
+        yield version, gen
+    finally:
+        _release(root, marker)
+
+def collect_versions(root: Path) -> None:
+    """
+    Delete versions that are neither current nor pinned by a compile or run.
+
+    Once a versioned compile is current, the unversioned generated/ directory
+    is removed the same way.
+    """
+    versions = root / VERSIONS_DIR
+    if not versions.is_dir():
+        return
+    with _locked(root):
+        current = current_version(root)
+        doomed = []
+        for entry in versions.iterdir():
+            if entry.is_dir() and not entry.name.startswith(".") and entry.name != current and not _pinned(entry):
+                doomed.append(entry)
+        legacy = version_dir(root, None)
+        if current is not None and legacy.is_dir() and not _pinned(root):
+            doomed.append(legacy)
+        # Move out of the way under the lock; deleting can then happen without it
+        trash = []
+        for entry in doomed:
+            target = versions / f".trash_{entry.name}_{secrets.token_hex(3)}"
+            try:
+                os.replace(entry, target)
+                trash.append(target)
+            except OSError:
+                continue
+    for entry in trash:
+        shutil.rmtree(entry, ignore_errors=True)
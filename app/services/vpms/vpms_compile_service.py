@@ -1,8 +1,7 @@
 from pathlib import Path
 from typing import Tuple
 import re
-import pandas as pd
-from app.core.utils_io import normalize_cell, assign_by_path
+from app.core.utils_io import normalize_cell, assign_by_path, load_sheet
 from app.services.vpms.vpms_auth_service import get_auth_header
 import os
 
@@ -158,7 +157,8 @@ def python_repr_for_robot(value):
     return repr(value)
 
 def generate_robot_cases_from_excel(excel_path: Path, gen_dir: Path):
-    df = pd.read_excel(excel_path, sheet_name=0, dtype=str).fillna("")
+    # Parquet sidecar when available (see write_sheet_sidecar), else the workbook itself
+    df = load_sheet(excel_path)
     tests = []
     
     # Extract base URL from first row's endpoint
@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+# config creates STORAGE_PATH on import; keep test runs out of the repo's workspace/
+os.environ.setdefault("STORAGE_PATH", tempfile.mkdtemp(prefix="testforge-"))
+
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+
+COLUMNS = ["[API]endpoint", "[API]Method", "[Response][API]status",
+           "[Request][Body]name", "[Response][Body]id[Type:int]"]
+
+
+def case_row(n, name=None):
+    return ["http://api.example.com/users", "POST", "201", name or f"user{n}", str(n)]
+
+
+@pytest.fixture
+def write_workbook(tmp_path):
+    """write_workbook(rows, name="rawData.xlsx") -> path of a one-sheet workbook with COLUMNS."""
+    def write(rows, name="rawData.xlsx"):
+        path = tmp_path / name
+        pd.DataFrame(rows, columns=COLUMNS).to_excel(path, index=False)
+        return path
+    return write
@@ -0,0 +1,150 @@
+import json
+
+import pytest
+
+from app.services.compile_service import (MANIFEST_NAME, _expectations, _resolve_compile_options, _shard_entries,
+                                          compile_versions, compile_workbook, compile_workbook_cached, robot_escape)
+from conftest import case_row
+
+
+def test_robot_escape_keeps_cells_literal():
+    assert robot_escape("") == "${EMPTY}"
+    assert robot_escape("a\\b") == "a\\\\b"
+    assert robot_escape("${x} @{y} &{z} %{w}") == "\\${x} \\@{y} \\&{z} \\%{w}"
+    assert robot_escape("a\nb\tc") == "a\\nb\\tc"
+    assert robot_escape("a  b") == "a \\ b"
+    assert robot_escape("#not a comment").startswith("\\#")
+    assert robot_escape(" padded ") == "\\ padded${SPACE}"
+
+
+def test_expectations_split_between_and_cast():
+    case = {
+        "expected_header": {"X-Count:gt": ("3", "int")},
+        "expected_body": {"age:between[Type:int]": ("18, 65", "int"), "name": ("bob", None),
+                          "score[Type:float]": ("1.5", "float")},
+    }
+    assert _expectations(case) == {
+        "headers": [["X-Count", "gt", 3, "int"]],
+        "body": [["age", "between", [18, 65], "int"], ["name", "eq", "bob", None],
+                 ["score", "eq", 1.5, "float"]],
+    }
+
+
+def test_expectations_single_between_bound():
+    case = {"expected_header": {}, "expected_body": {"n:between": ("7", None)}}
+    assert _expectations(case)["body"] == [["n", "between", ["7", "7"], None]]
+
+
+def _compile(path, gen, **options):
+    gen.mkdir(parents=True, exist_ok=True)
+    stats = compile_workbook(path, gen, **options)
+    assert not stats["errors"]
+    return stats
+
+
+def test_incremental_compile_counts(tmp_path, write_workbook):
+    gen = tmp_path / "ws" / "generated"
+    path = write_workbook([case_row(n) for n in range(1, 5)])
+    first = _compile(path, gen)
+    assert (len(first["tests"]), first["added"], first["changed"], first["unchanged"], first["removed"]) == (4, 4, 0, 0, 0)
+    assert (gen.parent / MANIFEST_NAME).is_file()
+
+    again = _compile(path, gen)
+    assert (again["added"], again["changed"], again["unchanged"], again["removed"]) == (0, 0, 4, 0)
+
+    rows = [case_row(1), case_row(2, name="renamed"), case_row(3)]
+    edited = _compile(write_workbook(rows), gen)
+    assert (edited["added"], edited["changed"], edited["unchanged"], edited["removed"]) == (0, 1, 2, 1)
+    assert sorted(p.stem for p in gen.glob("TC_*.robot")) == ["TC_001", "TC_002", "TC_003"]
+
+    grown = _compile(write_workbook(rows + [case_row(9)]), gen)
+    assert (grown["added"], grown["changed"], grown["unchanged"], grown["removed"]) == (1, 0, 3, 0)
+
+
+def test_dedupe_maps_duplicate_rows(tmp_path, write_workbook):
+    gen = tmp_path / "ws" / "generated"
+    stats = _compile(write_workbook([case_row(1), case_row(2), case_row(1)]), gen, dedupe=True)
+    assert stats["tests"] == ["TC_001", "TC_002"]
+    assert stats["duplicates"] == {"TC_003": "TC_001"}
+    assert json.loads((gen / "duplicates.json").read_text(encoding="utf-8")) == {"TC_003": "TC_001"}
+
+
+def test_shard_entries_balance_longest_first():
+    durations = {"TC_001": 9.0, "TC_002": 7.0, "TC_003": 5.0, "TC_004": 4.0, "TC_005": 3.0, "TC_006": 2.0}
+    entries = [(name, None) for name in durations]
+    shards = _shard_entries(entries, 3, durations)
+
+    assert len(shards) == 3
+    assigned = [e[0] for _, group in shards for e in group]
+    assert sorted(assigned) == sorted(durations)
+    for load, group in shards:
+        assert load == sum(durations[e[0]] for e in group)
+        assert [e[0] for e in group] == sorted(e[0] for e in group)  # sheet order kept
+    loads = [load for load, _ in shards]
+    assert max(loads) - min(loads) <= max(durations.values())
+    assert max(loads) == 11.0  # optimal split: 9+2, 7+4, 5+3
+
+
+def test_shard_entries_unknown_tests_use_median():
+    entries = [("TC_001", None), ("TC_002", None), ("TC_003", None)]
+    shards = _shard_entries(entries, 5, {"TC_001": 4.0})
+    assert len(shards) == 3  # no empty shards
+    assert sorted(load for load, _ in shards) == [4.0, 4.0, 4.0]
+
+
+def test_content_ids_survive_inserted_rows(tmp_path, write_workbook):
+    gen = tmp_path / "ws" / "generated"
+    _compile(write_workbook([case_row(n) for n in range(1, 4)]), gen, test_ids="content")
+    before = sorted(p.stem for p in gen.glob("TC_*.robot"))
+    assert len(before) == 3 and all(len(name) == len("TC_") + 12 for name in before)
+
+    inserted = _compile(write_workbook([case_row(1), case_row(7), case_row(2), case_row(3)]), gen, test_ids="content")
+    after = sorted(p.stem for p in gen.glob("TC_*.robot"))
+    assert set(before) < set(after) and len(after) == 4
+    assert (inserted["added"], inserted["changed"], inserted["unchanged"]) == (1, 0, 3)
+
+
+def test_content_ids_follow_case_not_position(tmp_path, write_workbook):
+    names = []
+    for n, rows in enumerate(([case_row(1), case_row(2)], [case_row(2), case_row(1)])):
+        gen = tmp_path / f"ws{n}" / "generated"
+        _compile(write_workbook(rows, name=f"raw{n}.xlsx"), gen, test_ids="content")
+        names.append(sorted(p.stem for p in gen.glob("TC_*.robot")))
+    assert names[0] == names[1]
+
+
+def test_resolve_compile_options_defaults():
+    resolved = _resolve_compile_options(mode=None, test_ids="content", row_tags=True)
+    assert resolved["mode"] == "case" and resolved["shards"] == 0 and resolved["row_tags"] is True
+    assert resolved["dedupe"] is True  # content IDs imply dedupe
+    assert _resolve_compile_options(**resolved) == resolved
+    assert _resolve_compile_options(log_max_chars=-5)["log_max_chars"] == 0
+
+
+@pytest.mark.parametrize("options, message", [
+    ({"mode": "bogus"}, "compile mode"),
+    ({"verbosity": "loud"}, "log verbosity"),
+    ({"test_ids": "uuid"}, "test ID mode"),
+    ({"shards": -1}, "shards"),
+])
+def test_compile_entry_points_reject_bad_settings(tmp_path, write_workbook, options, message):
+    path = write_workbook([case_row(1)])
+    gen = tmp_path / "ws" / "generated"
+    gen.mkdir(parents=True)
+    for compile_fn in (compile_workbook, compile_workbook_cached):
+        with pytest.raises(ValueError, match=message):
+            compile_fn(path, gen, **options)
+    with pytest.raises(ValueError, match=message):
+        compile_versions([(tmp_path / "ws", path)], **options)
+
+
+def test_cached_compile_reuses_outputs(tmp_path, write_workbook):
+    path = write_workbook([case_row(n) for n in range(40, 43)])
+    results = []
+    for n in range(2):
+        gen = tmp_path / f"ws{n}" / "generated"
+        gen.mkdir(parents=True)
+        results.append(compile_workbook_cached(path, gen, mode="suite"))
+    assert [r["cached"] for r in results] == [False, True]
+    assert results[1]["tests"] == results[0]["tests"] and results[1]["added"] == 3
+    assert compile_workbook_cached(path, gen, mode="template")["cached"] is False
@@ -0,0 +1,29 @@
+import json
+
+from app.services.run_service import merge_rate_stats
+
+HOST = "http://api.example.com"
+
+
+def _rates(tmp_path, name, **stats):
+    out_dir = tmp_path / name
+    out_dir.mkdir()
+    (out_dir / "rate_limit.json").write_text(json.dumps({HOST: stats}), encoding="utf-8")
+    return out_dir
+
+
+def test_merge_rate_stats_unlimited_runs(tmp_path):
+    dirs = [_rates(tmp_path, "a", limited=False, requests=10, effectiveRps=4.0),
+            _rates(tmp_path, "b", limited=False, requests=30, effectiveRps=8.0)]
+    assert merge_rate_stats(dirs) == {HOST: {"limited": False, "requests": 40, "effectiveRps": 7.0}}
+    assert merge_rate_stats(dirs, concurrent=True)[HOST]["effectiveRps"] == 12.0
+
+
+def test_merge_rate_stats_keeps_limiter_fields(tmp_path):
+    dirs = [_rates(tmp_path, "a", limited=True, requests=10, effectiveRps=2.0, throttled=1,
+                   waitedSeconds=1.5, finalRps=1.0),
+            _rates(tmp_path, "b", limited=True, requests=10, effectiveRps=2.0, throttled=2,
+                   waitedSeconds=0.5, finalRps=2.0)]
+    merged = merge_rate_stats(dirs)[HOST]
+    assert merged == {"limited": True, "requests": 20, "effectiveRps": 2.0, "throttled": 3,
+                      "waitedSeconds": 2.0, "finalRps": 2.0}
@@ -0,0 +1,95 @@
+import pytest
+
+pytest.importorskip("robot")
+pytest.importorskip("jsonpath_ng")
+pytest.importorskip("requests")
+
+from app.robot_libs import TestForgeLibrary as library  # noqa: E402  (a module import: pytest would collect the Test* class)
+
+
+@pytest.mark.parametrize("actual, expected, dtype, equal", [
+    (5, 5, "int", True),
+    ("5", 5, "int", True),
+    (5.0, 5, "int", True),
+    (5.9, 5, "int", False),
+    ("abc", 5, "int", False),
+    ("1.50", 1.5, "float", True),
+    (True, "yes", "bool", True),
+    (False, "true", "bool", False),
+    ("true", True, "bool", False),
+    ("bob", "bob", None, True),
+    (7, "7", None, False),
+    ("7", "7", None, True),
+    ([1], "[1]", None, False),
+])
+def test_values_equal(actual, expected, dtype, equal):
+    assert library._values_equal(actual, expected, dtype) is equal
+
+
+@pytest.fixture
+def check():
+    return library.TestForgeLibrary()._check
+
+
+def test_check_eq_and_ne(check):
+    assert check(5, "eq", 5, "int") is None
+    assert check(5.9, "eq", 5, "int") == "Expected: 5, but got: 5.9"
+    assert check(5, "ne", 6, "int") is None
+    assert check(5, "ne", 5, "int") is not None
+
+
+def test_check_untyped_eq_is_strict(check):
+    # Sheet cells without a [Type:] tag are text, so a JSON number needs [Type:int] to match
+    assert check(7, "eq", "7", None) == "Expected: 7 (str), but got: 7 (int)"
+    assert check(7, "eq", "7", "int") is None
+    assert check(7, "ne", "7", None) is None
+
+
+def test_check_sentinels(check):
+    assert check([], "eq", [], None) is None
+    assert check({}, "eq", [], None) is not None
+    assert check("", "eq", "", None) is None
+    assert check(None, "eq", None, None) is None
+    assert check(0, "eq", None, None) is not None
+
+
+def test_check_numeric_operators(check):
+    assert check(10, "gt", 3, "int") is None
+    assert check(2, "gt", 3, "int") is not None
+    assert check("2", "lt", 3, None) is None
+    assert check(30, "between", [18, 65], "int") is None
+    assert check(70, "between", [18, 65], "int") is not None
+    assert check("n/a", "gt", 3, None).startswith("Expected: a number gt")
+
+
+def test_check_presence_and_types(check):
+    assert check(None, "is_null", None, None) is None
+    assert check(None, "is_null", None, None, present=False) is not None
+    assert check(1, "eq", 1, None, present=False) == "Expected: 1, but got: field not found"
+    assert check(True, "is_number", None, None) is not None
+    assert check(1.5, "is_number", None, None) is None
+    assert check([1, 2], "contains", 2, None) is None
+    assert check("hello world", "contains", "world", None) is None
+    assert check("abc123", "regex", r"\d+$", None) is None
+
+
+def _summary(monkeypatch, tmp_path, rps):
+    monkeypatch.setenv("RATE_LIMIT_RPS", rps)
+    monkeypatch.setenv("RATE_LIMIT_DIR", str(tmp_path))
+    limiter = library.RateLimiter()
+    for _ in range(3):
+        limiter.acquire("http://api.example.com")
+        limiter.feedback("http://api.example.com", 200)
+    return limiter.summary()["http://api.example.com"]
+
+
+def test_rate_summary_without_limit(monkeypatch, tmp_path):
+    summary = _summary(monkeypatch, tmp_path, "0")
+    assert summary["limited"] is False and summary["requests"] == 3
+    assert not {"throttled", "waitedSeconds", "finalRps"} & set(summary)
+
+
+def test_rate_summary_with_limit(monkeypatch, tmp_path):
+    summary = _summary(monkeypatch, tmp_path, "1000")
+    assert summary["limited"] is True and summary["requests"] == 3
+    assert summary["throttled"] == 0 and summary["finalRps"] == 1000
@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from app.core import utils_io
+from app.core.utils_io import content_digest, iter_sheet_batches, load_sheet, read_sheet_sidecar, sheet_sidecar_path
+from conftest import COLUMNS, case_row
+
+
+def _batched(path, batch_rows):
+    batches = list(iter_sheet_batches(path, batch_rows))
+    assert all(len(df) <= batch_rows for _, df in batches)
+    return pd.concat([df for _, df in batches])
+
+
+@pytest.fixture(autouse=True)
+def sidecar_dir(tmp_path, monkeypatch):
+    # Sidecars are keyed by content: a store per test, so one test's sidecar never feeds another
+    monkeypatch.setattr(utils_io, "SHEET_SIDECAR_DIR", tmp_path / ".sheets")
+
+
+@pytest.fixture
+def workbook(write_workbook):
+    rows = [case_row(n) for n in range(1, 12)]
+    rows[2][3] = ""            # blank cell
+    rows[4][4] = 3.5           # float
+    rows[6] = [""] * 5         # blank row between cases
+    return write_workbook(rows)
+
+
+def test_load_sheet_writes_and_reuses_sidecar(workbook):
+    content = workbook.read_bytes()
+    assert read_sheet_sidecar(content) is None
+    parsed = load_sheet(workbook)
+    assert sheet_sidecar_path(content_digest(content)).exists()
+    pd.testing.assert_frame_equal(read_sheet_sidecar(content), parsed)
+    pd.testing.assert_frame_equal(load_sheet(workbook), parsed)
+    assert parsed.iloc[2]["[Request][Body]name"] == ""
+    assert parsed.iloc[4]["[Response][Body]id[Type:int]"] == "3.5"
+
+
+def test_batches_match_load_sheet(workbook):
+    streamed = _batched(workbook, 4)  # read with openpyxl: no sidecar yet
+    loaded = load_sheet(workbook)
+    pd.testing.assert_frame_equal(streamed, loaded, check_index_type=False)
+    assert list(streamed.index) == list(range(len(loaded)))
+
+    from_sidecar = _batched(workbook, 4)
+    pd.testing.assert_frame_equal(from_sidecar, loaded, check_index_type=False)
+
+
+def test_batches_number_rows_across_case_sheets(tmp_path):
+    path = tmp_path / "multi.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame([case_row(1), case_row(2)], columns=COLUMNS).to_excel(writer, sheet_name="first", index=False)
+        pd.DataFrame([["see the other sheets"]], columns=["notes"]).to_excel(writer, sheet_name="README", index=False)
+        pd.DataFrame([case_row(3)], columns=COLUMNS).to_excel(writer, sheet_name="second", index=False)
+    batches = list(iter_sheet_batches(path, 1))
+    assert [title for title, _ in batches] == ["first", "first", "second"]
+    assert [int(df.index[0]) for _, df in batches] == [0, 1, 2]
+    assert batches[2][1].iloc[0]["[Request][Body]name"] == "user3"
+
+
+def test_batches_read_csv_in_chunks(tmp_path):
+    path = tmp_path / "raw.csv"
+    pd.DataFrame([case_row(n) for n in range(1, 6)], columns=COLUMNS).to_csv(path, index=False)
+    batches = list(iter_sheet_batches(path, 2))
+    assert [len(df) for _, df in batches] == [2, 2, 1]
+    assert list(pd.concat([df for _, df in batches])["[Response][Body]id[Type:int]"]) == ["1", "2", "3", "4", "5"]
+
+
+def test_concurrent_sidecar_writes_publish_one_whole_file(workbook):
+    content = workbook.read_bytes()
+    df = load_sheet(workbook)
+    path = sheet_sidecar_path(content_digest(content))
+    path.unlink()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = set(pool.map(lambda _: utils_io.write_sheet_sidecar(content, df), range(8)))
+    assert paths == {path}
+    assert not list(path.parent.glob("*.tmp"))
+    pd.testing.assert_frame_equal(read_sheet_sidecar(content), df)
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import validate_service
+from app.services.validate_service import _value_error, validate_streaming
+
+
+@pytest.mark.parametrize("value, op, dtype, error", [
+    (5, None, "int", None),
+    (5.0, "eq", "int", None),
+    (5.5, None, "int", "'5.5' is not an int (it would be compared as 5)"),
+    (5.5, "ne", "integer", "'5.5' is not an int (it would be compared as 5)"),
+    (5.5, "gt", "int", "'5.5' is not an int (it would be compared as 5)"),
+    (5.5, "gt", None, None),
+    ("abc", None, "int", "'abc' is not an int"),
+    (float("inf"), None, "int", "'inf' is not an int"),
+    ("abc", "lt", "int", "lt needs a number, got 'abc'"),
+    ("maybe", None, "bool", "'maybe' is not a boolean (it would be read as false)"),
+    ("18,65", "between", "int", None),
+])
+def test_value_error(value, op, dtype, error):
+    assert _value_error(value, op, dtype) == error
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    gen = tmp_path / "generated"
+    gen.mkdir()
+    (tmp_path / "rawData.xlsx").touch()
+    return tmp_path, gen
+
+
+async def _take(stream, count):
+    events = []
+    async for event in stream:
+        events.append(event)
+        if len(events) == count:
+            break
+    await stream.aclose()
+    return events
+
+
+def test_lint_issues_stream_as_found(workspace, monkeypatch):
+    first_sent = threading.Event()
+
+    def lint(*args, **kwargs):
+        yield {"case": "TC_001", "row": 1, "column": "c", "error": "first"}
+        first_sent.wait(5)  # the rest of the sheet is still being linted
+        yield {"case": "TC_002", "row": 2, "column": "c", "error": "second"}
+
+    monkeypatch.setattr(validate_service, "lint_workbook", lint)
+
+    async def main():
+        stream = validate_streaming(*workspace)
+        first = await asyncio.wait_for(stream.__anext__(), 2)
+        first_sent.set()
+        rest = [event async for event in stream]
+        return first, rest
+
+    first, rest = asyncio.run(main())
+    assert first == {"type": "lint", "data": {"case": "TC_001", "row": 1, "column": "c", "error": "first"}}
+    assert rest[0]["data"]["error"] == "second"
+    assert rest[-1]["type"] == "done" and rest[-1]["data"]["lint_issues"] == 2
+
+
+def test_lint_stops_when_stream_closes(workspace, monkeypatch):
+    produced = []
+    finished = threading.Event()
+
+    def lint(*args, **kwargs):
+        try:
+            for n in range(validate_service.EVENT_QUEUE_SIZE * 4):
+                produced.append(n)
+                yield {"case": None, "row": None, "column": f"c{n}", "error": "bad"}
+        finally:
+            finished.set()
+
+    monkeypatch.setattr(validate_service, "lint_workbook", lint)
+
+    async def main():
+        events = await _take(validate_streaming(*workspace), 1)
+        await asyncio.sleep(0)
+        await asyncio.get_running_loop().run_in_executor(None, finished.wait, 5)
+        return events
+
+    assert len(asyncio.run(main())) == 1
+    assert finished.is_set()
+    assert len(produced) < validate_service.EVENT_QUEUE_SIZE * 4
+
+
+def test_closing_stream_does_not_wait_for_queued_shards(workspace, monkeypatch):
+    root, gen = workspace
+    (root / "rawData.xlsx").unlink()
+    for n in range(4):
+        (gen / f"TC_{n:03d}.robot").touch()
+    monkeypatch.setattr(validate_service, "DRYRUN_SHARD_FILES", 1)
+    monkeypatch.setattr(validate_service.os, "cpu_count", lambda: 1)
+    started = []
+
+    def slow_shard(gen_dir, files, out_dir, index):
+        started.append(index)
+        time.sleep(0.3)
+        return {"shard": index, "files": len(files), "tests": 0, "failed": [], "errors": []}
+
+    monkeypatch.setattr(validate_service, "_dryrun_shard", slow_shard)
+
+    async def main():
+        stream = validate_streaming(root, gen)
+        event = await stream.__anext__()
+        begin = time.perf_counter()
+        await stream.aclose()
+        return event, time.perf_counter() - begin
+
+    event, close_seconds = asyncio.run(main())
+    assert event["type"] == "shard"
+    assert close_seconds < 0.2  # the three queued shards would take 0.9s
+    deadline = time.time() + 5
+    while (root / "dryrun").exists() and any((root / "dryrun").iterdir()) and time.time() < deadline:
+        time.sleep(0.05)
+    assert not any((root / "dryrun").iterdir())
+    assert len(started) <= 2  # at most the shard running when the stream closed also ran
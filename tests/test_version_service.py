@@ -0,0 +1,129 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from app.services import version_service
+
+from app.services.version_service import (PINS_DIR, VERSIONS_DIR, collect_versions, current_version, new_version,
+                                          pin_current, pin_generated, publish_version)
+
+MANIFEST = "compile_manifest.json"
+
+
+def _publish(root, content):
+    with new_version(root, MANIFEST) as (version, gen):
+        # Files are hard links to the current version's: replace, as compile writers do
+        (gen / "TC_001.robot").unlink(missing_ok=True)
+        (gen / "TC_001.robot").write_text(content, encoding="utf-8")
+        publish_version(root, version)
+    return version
+
+
+def _versions(root):
+    return sorted(p.name for p in (root / VERSIONS_DIR).iterdir() if p.is_dir() and not p.name.startswith("."))
+
+
+def test_collect_keeps_pinned_versions(tmp_path):
+    first = _publish(tmp_path, "first")
+    with pin_current(tmp_path) as (version, gen):
+        assert version == first
+        second = _publish(tmp_path, "second")
+        collect_versions(tmp_path)
+        assert current_version(tmp_path) == second
+        assert _versions(tmp_path) == sorted([first, second])
+        assert (gen / "TC_001.robot").read_text(encoding="utf-8") == "first"
+    collect_versions(tmp_path)
+    assert _versions(tmp_path) == [second]
+
+
+def test_pin_generated_outlives_the_run_pin(tmp_path):
+    first = _publish(tmp_path, "first")
+    with pin_current(tmp_path) as (_, gen):
+        release = pin_generated(gen)
+    _publish(tmp_path, "second")
+    collect_versions(tmp_path)
+    assert first in _versions(tmp_path)
+    release()
+    release()  # a second call does nothing
+    collect_versions(tmp_path)
+    assert first not in _versions(tmp_path)
+
+
+def test_pins_of_exited_processes_are_ignored(tmp_path):
+    first = _publish(tmp_path, "first")
+    child = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    pins = tmp_path / VERSIONS_DIR / first / PINS_DIR
+    pins.mkdir(exist_ok=True)
+    (pins / f"{child.stdout.strip()}-deadbeef").touch()
+    _publish(tmp_path, "second")
+    collect_versions(tmp_path)
+    assert first not in _versions(tmp_path)
+
+
+def test_new_version_starts_from_current(tmp_path):
+    _publish(tmp_path, "first")
+    with new_version(tmp_path, MANIFEST) as (version, gen):
+        assert (gen / "TC_001.robot").read_text(encoding="utf-8") == "first"
+    collect_versions(tmp_path)
+    assert version not in _versions(tmp_path)  # never published
+
+
+def test_unlocked_pin_with_a_reused_pid_is_ignored(tmp_path):
+    first = _publish(tmp_path, "first")
+    pins = tmp_path / VERSIONS_DIR / first / PINS_DIR
+    pins.mkdir(exist_ok=True)
+    (pins / f"{os.getpid()}-crashed").touch()  # a live pid, but nothing holds the marker's lock
+    _publish(tmp_path, "second")
+    collect_versions(tmp_path)
+    assert first not in _versions(tmp_path)
+
+
+HOLDER = """
+import sys
+from app.services.version_service import _lock_file
+fh = open(sys.argv[1], "a+b")
+_lock_file(fh)
+print("locked", flush=True)
+sys.stdin.read()
+"""
+
+
+def test_pin_held_by_another_process(tmp_path):
+    first = _publish(tmp_path, "first")
+    pins = tmp_path / VERSIONS_DIR / first / PINS_DIR
+    pins.mkdir(exist_ok=True)
+    holder = subprocess.Popen([sys.executable, "-c", HOLDER, str(pins / "1-other")], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True, cwd=Path(__file__).resolve().parents[1])
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        _publish(tmp_path, "second")
+        collect_versions(tmp_path)
+        assert first in _versions(tmp_path)
+    finally:
+        holder.communicate("")
+    collect_versions(tmp_path)
+    assert first not in _versions(tmp_path)
+
+
+def test_releases_share_one_collector_thread(tmp_path, monkeypatch):
+    calls = []
+
+    def collect(root):
+        calls.append(threading.current_thread().name)
+        time.sleep(0.05)
+
+    monkeypatch.setattr(version_service, "collect_versions", collect)
+    _publish(tmp_path, "first")
+    with pin_current(tmp_path) as (_, gen):
+        releases = [pin_generated(gen) for _ in range(10)]
+    for release in releases:
+        release()
+    deadline = time.time() + 5
+    while version_service._collector is not None and time.time() < deadline:
+        time.sleep(0.01)
+    assert version_service._collector is None
+    assert set(calls) == {"version-collector"}
+    assert len(calls) < 10  # queued releases of one workspace are collected together
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Measure run-stream event latency and CPU use with many concurrent runs.
+
+Each run is a child process printing robot-style console lines
+("TC_001 | PASS | <timestamp>") at a fixed interval; the runs are parsed by
+app.services.run_service._robot_events, the same path the run streams use.
+Two line readers are measured:
+    - polling:  the previous reader thread + queue.Queue polled through
+                run_in_executor with a 0.1s timeout and 10ms sleeps
+    - asyncio:  asyncio.create_subprocess_exec + StreamReader.readline (current)
+
+Latency is from the child writing a line to its event reaching the consumer.
+CPU is process_time of this (server-side) process, so the children are not counted.
+
+Usage:
+    python tools/benchmark_run_events.py [--runs 10] [--lines 200] [--interval 0.02]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import queue
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import AsyncGenerator, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.services import run_service  # noqa: E402
+
+EMITTER = """
+import sys, time
+lines, interval = int(sys.argv[1]), float(sys.argv[2])
+for i in range(1, lines + 1):
+    print(f"TC_{i:03d}", flush=True)
+    time.sleep(interval)
+    print(f"TC_{i:03d}    | PASS | {time.time():.6f}", flush=True)
+"""
+
+
+async def _polling_lines(cmd: List[str], env: Dict[str, str], hold=None) -> AsyncGenerator[bytes, None]:
+    """The reader _robot_events used before asyncio subprocesses, kept here as the baseline."""
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    output_queue: queue.Queue = queue.Queue()
+
+    def read():
+        for line in iter(proc.stdout.readline, b''):
+            output_queue.put(('line', line))
+        proc.stdout.close()
+        proc.wait()
+        output_queue.put(('done', proc.returncode))
+
+    threading.Thread(target=read, daemon=True).start()
+    while True:
+        try:
+            msg_type, data = await asyncio.get_event_loop().run_in_executor(None, output_queue.get, True, 0.1)
+        except queue.Empty:
+            await asyncio.sleep(0.01)
+            continue
+        if msg_type == 'done':
+            return
+        yield data
+
+
+async def _consume(cmd: List[str], latencies: List[float]) -> int:
+    events = 0
+    async for event in run_service._robot_events(cmd):
+        events += 1
+        if event['type'] == 'pass':
+            latencies.append(time.time() - float(event['data']['message']))
+    return events
+
+
+async def _bench(runs: int, lines: int, interval: float) -> Dict[str, float]:
+    cmd = [sys.executable, "-c", EMITTER, str(lines), str(interval)]
+    latencies: List[float] = []
+    peak_threads = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.ensure_future(sample_threads())
+    cpu, wall = time.process_time(), time.perf_counter()
+    events = sum(await asyncio.gather(*(_consume(cmd, latencies) for _ in range(runs))))
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    done.set()
+    await sampler
+    latencies.sort()
+    return {
+        "events": events,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "cpu_s": cpu,
+        "wall_s": wall,
+        "threads": peak_threads,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="concurrent runs (default 10)")
+    parser.add_argument("--lines", type=int, default=200, help="tests per run (default 200)")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds per test (default 0.02)")
+    args = parser.parse_args()
+
+    current = run_service._process_lines
+    results = {}
+    for reader, lines_fn in (("polling", _polling_lines), ("asyncio", current)):
+        run_service._process_lines = lines_fn
+        results[reader] = asyncio.run(_bench(args.runs, args.lines, args.interval))
+    run_service._process_lines = current
+
+    print(f"{args.runs} concurrent runs x {args.lines} tests, one test per {args.interval * 1000:.0f}ms\n")
+    print(f"{'reader':<9} {'events':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'cpu s':>7} {'wall s':>7} {'threads':>8}")
+    for reader, r in results.items():
+        print(f"{reader:<9} {r['events']:>7} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['max_ms']:>8.2f} "
+              f"{r['cpu_s']:>7.2f} {r['wall_s']:>7.2f} {r['threads']:>8}")
+
+
+if __name__ == "__main__":
+    main()
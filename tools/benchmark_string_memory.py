@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Measure peak RSS of loading a large sheet with and without Arrow-backed strings.
+
+Each measurement runs in a fresh child process so peak RSS is not shared
+between modes. Two load paths are measured:
+    - read_table:  CSV upload parsed by app.core.utils_io.read_table
+    - load_sheet:  Parquet sidecar read by app.core.utils_io.load_sheet (compile path)
+
+Usage:
+    python tools/benchmark_string_memory.py [--rows 200000] [--cols 80]
+
+Note: uses the `resource` module, so it runs on Linux/macOS only.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _current_rss_mb() -> float:
+    """Resident set size right now (Linux /proc; falls back to peak elsewhere)."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return _peak_rss_mb()
+
+
+def _child(path: str, loader: str, arrow: bool) -> None:
+    """Load the sheet once and print peak RSS as JSON (runs in a child process)."""
+    import gc
+    import time
+    from app.core import utils_io as U
+    baseline = _current_rss_mb()
+    start = time.perf_counter()
+    if loader == "read_table":
+        df = U.read_table(Path(path).read_bytes(), path, allow_different_lengths=True, arrow_strings=arrow)
+    else:
+        df = U.load_sheet(Path(path), arrow_strings=arrow)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    print(json.dumps({
+        "rows": len(df),
+        "dtype": str(df.dtypes.iloc[0]),
+        "baseline_mb": round(baseline, 1),
+        "peak_mb": round(_peak_rss_mb(), 1),
+        "resident_mb": round(_current_rss_mb(), 1),
+        "seconds": round(elapsed, 2),
+    }))
+
+
+def _make_csv(path: Path, rows: int, cols: int) -> None:
+    """Write a compiled-sheet-shaped CSV: short string cells drawn from a few thousand distinct values."""
+    headers = ["[API]endpoint", "[API]Method"] + [f"[Request][Body]data.field{i}" for i in range(cols - 2)]
+    values = ["ML", "O", "true", "false", "25", "1990-01-01", "SG", "Singapore", "", "REF"]
+    with path.open("w", encoding="utf-8") as fh:
+        fh.write(",".join(headers) + "\n")
+        for r in range(rows):
+            cells = ["https://api.example.com/v1/products", "POST"]
+            cells += [f"{values[(r + c) % len(values)]}{(r * 7 + c) % 5000}" for c in range(cols - 2)]
+            fh.write(",".join(cells) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--cols", type=int, default=80)
+    parser.add_argument("--child", nargs=3, metavar=("PATH", "LOADER", "ARROW"), help=argparse.SUPPRESS)
+    parser.add_argument("--prepare", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        from app.core import utils_io as U
+        U.write_sheet_sidecar(Path(args.prepare).read_bytes())
+        return
+    if args.child:
+        path, loader, arrow = args.child
+        _child(path, loader, arrow == "1")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the benchmark sidecar out of the real workspace (children inherit this)
+        os.environ["STORAGE_PATH"] = tmp
+        from app.core import utils_io as U
+        if not U.HAS_PYARROW:
+            sys.exit("pyarrow is not installed; Arrow strings are unavailable")
+
+        csv_path = Path(tmp) / "sheet.csv"
+        print(f"Generating {args.rows} rows x {args.cols} columns ...")
+        _make_csv(csv_path, args.rows, args.cols)
+        # Pre-build the Parquet sidecar so load_sheet measures the sidecar read only.
+        # Done in a child: Linux carries ru_maxrss across exec, so the parent must stay small.
+        subprocess.run([sys.executable, __file__, "--prepare", str(csv_path)], check=True, cwd=ROOT)
+
+        print(f"\n{'Loader':<12} {'Mode':<8} {'dtype':<10} {'Peak RSS':>10} {'Peak delta':>11} {'Resident delta':>15} {'Time':>8}")
+        print("-" * 80)
+        for loader in ("read_table", "load_sheet"):
+            for arrow in (False, True):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", str(csv_path), loader, "1" if arrow else "0"],
+                    capture_output=True, text=True, check=True, cwd=ROOT,
+                )
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                peak_delta = r["peak_mb"] - r["baseline_mb"]
+                resident_delta = r["resident_mb"] - r["baseline_mb"]
+                mode = "arrow" if arrow else "object"
+                print(f"{loader:<12} {mode:<8} {r['dtype']:<10} {r['peak_mb']:>8.1f}MB {peak_delta:>9.1f}MB "
+                      f"{resident_delta:>13.1f}MB {r['seconds']:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
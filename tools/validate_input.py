@@ -15,6 +15,10 @@ from pathlib import Path
 import pandas as pd
 from typing import Dict, List
 
+# Allow running as `python tools/validate_input.py` from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.core.utils_io import read_sheet_sidecar
+
 def validate_file(filepath: str) -> Dict[str, any]:
     """
     Validate input file for combination generation.
@@ -50,10 +54,13 @@ def validate_file(filepath: str) -> Dict[str, any]:
     errors = []
     warnings = []
     
-    # Read file based on extension
+    # Read file based on extension (uploaded workbooks have a Parquet sidecar)
     try:
         ext = path.suffix.lower()
-        if ext == '.csv':
+        sidecar_df = read_sheet_sidecar(path.read_bytes()) if ext in ['.csv', '.xlsx', '.xls'] else None
+        if sidecar_df is not None:
+            df = sidecar_df
+        elif ext == '.csv':
             df = pd.read_csv(filepath, dtype=str, encoding='utf-8-sig')
         elif ext in ['.xlsx', '.xls']:
             df = pd.read_excel(filepath, sheet_name=0, dtype=str, engine='openpyxl')